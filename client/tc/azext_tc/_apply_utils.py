@@ -0,0 +1,334 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+# pylint: disable=too-many-locals, too-many-branches
+
+import json
+import asyncio
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+from ._async_utils import gather_bounded
+from ._model_utils import find_item, find_user, result_data
+from ._status_utils import DEFAULT_STATUS_INTERVAL, StatusPoller, get_status_target
+
+logger = get_logger(__name__)
+
+# actions in a stage are independent and run concurrently, stages run in order and
+# a stage starts once the operations the api accepted (202) in the previous one completed
+STAGE_PREREQUISITES = 1  # templates, scopes, org users, pruned projects
+STAGE_PROJECTS = 2  # projects and project users, pruned templates, scopes and org users
+
+SYMBOLS = {'create': '+', 'update': '~', 'delete': '-'}
+
+
+def load_manifest(file):
+    import yaml  # json is a subset of yaml
+    try:
+        with open(file, 'r', encoding='utf-8') as f:
+            manifest = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        raise CLIError(f'Unable to read manifest {file}: {e}') from e
+
+    if not isinstance(manifest, dict):
+        raise CLIError(f'Manifest {file} must be an object with templates, scopes, users and projects')
+
+    for key in ['templates', 'scopes', 'users', 'projects']:
+        for item in manifest.get(key) or []:
+            if not item.get('identifier' if key == 'users' else 'name'):
+                raise CLIError(f"Every item in '{key}' requires "
+                               f"{'an identifier' if key == 'users' else 'a name'}")
+    for template in manifest.get('templates') or []:
+        if not template.get('repoUrl'):
+            raise CLIError(f"Project template '{template['name']}' requires a repoUrl")
+    return manifest
+
+
+class PlanAction:  # pylint: disable=too-few-public-methods, too-many-instance-attributes
+
+    def __init__(self, stage, action, kind, name, operation, depends_on=None, **kwargs):
+        self.stage = stage
+        self.action = action
+        self.kind = kind
+        self.name = name
+        self.operation = operation
+        self.depends_on = depends_on
+        self.kwargs = kwargs
+        self.state = 'planned'
+        self.error = None
+        self.resource_id = None
+        self.status = None
+
+    def __str__(self):
+        return f"{SYMBOLS[self.action]} {self.action} {self.kind} '{self.name}'"
+
+    def to_dict(self):
+        result = {
+            'action': self.action,
+            'type': self.kind,
+            'name': self.name,
+            'stage': self.stage,
+            'state': self.state
+        }
+        if self.error:
+            result['error'] = self.error
+        return result
+
+
+def _scope_input_data(adapters, scope):
+    from ._input_utils import _process_parameters, _find_missing_parameters, _get_best_match_one_of
+
+    scope_type = scope.get('type', 'AzureResourceManager')
+    adapter = next((a for a in adapters if a.type == scope_type), None)
+    if adapter is None:
+        raise CLIError(f"Adapter not found of type '{scope_type}' for scope '{scope['name']}'")
+
+    parameters = scope.get('parameters') or []
+    if isinstance(parameters, dict):
+        parameters = [f'{k}={v if isinstance(v, str) else json.dumps(v)}' for k, v in parameters.items()]
+
+    input_data_schema = json.loads(adapter.input_data_schema)
+    if input_data_schema.get('oneOf', None) is not None:
+        input_data_schema = _get_best_match_one_of(input_data_schema, [parameters])
+
+    input_data = _process_parameters(input_data_schema, [parameters]) or {}
+    missing = _find_missing_parameters(input_data, input_data_schema)
+    if missing:
+        raise CLIError(f"Missing input parameters for scope '{scope['name']}': {', '.join(sorted(missing.keys()))}")
+
+    return input_data
+
+
+def _user_definition(user, default_role):
+    from .vendored_sdks.teamcloud.models import UserDefinition
+    return UserDefinition(identifier=user['identifier'], role=user.get('role', default_role),
+                          properties=user.get('properties'))
+
+
+async def plan_apply(client, org, manifest, prune=False):
+    """Diffs the manifest against the live org and returns the list of PlanActions"""
+    from .vendored_sdks.teamcloud.models import (ProjectTemplateDefinition, RepositoryDefinition,
+                                                 DeploymentScopeDefinition, ProjectDefinition)
+
+    templates, scopes, users, projects, adapters = await asyncio.gather(
+        client.get_project_templates(org), client.get_deployment_scopes(org), client.get_organization_users(org),
+        client.get_projects(org), client.get_adapters())
+
+    templates = result_data(templates, 'project templates')
+    scopes = result_data(scopes, 'deployment scopes')
+    users = result_data(users, 'organization users')
+    projects = result_data(projects, 'projects')
+    adapters = result_data(adapters, 'adapters')
+
+    plan = []
+
+    # Project Templates
+
+    for template in manifest.get('templates') or []:
+        live = find_item(templates, template['name'])
+        if live is None:
+            repository = RepositoryDefinition(url=template['repoUrl'], version=template.get('repoVersion'),
+                                              token=template.get('repoToken'))
+            plan.append(PlanAction(STAGE_PREREQUISITES, 'create', 'projectTemplate', template['name'],
+                                   'create_project_template', organization_id=org,
+                                   body=ProjectTemplateDefinition(display_name=template['name'],
+                                                                  repository=repository)))
+        else:
+            repo = live.repository
+            if repo is None:
+                raise CLIError(f"Project template '{template['name']}' has no repository")
+            if repo.url != template['repoUrl'] or \
+                    ('repoVersion' in template and repo.version != template['repoVersion']):
+                repo.url = template['repoUrl']
+                repo.version = template.get('repoVersion', repo.version)
+                # the token the api returns may be redacted, sending it back would replace the stored one
+                repo.token = template.get('repoToken')
+                plan.append(PlanAction(STAGE_PREREQUISITES, 'update', 'projectTemplate', template['name'],
+                                       'update_project_template', project_template_id=live.id,
+                                       organization_id=org, body=live))
+
+    # Deployment Scopes
+
+    for scope in manifest.get('scopes') or []:
+        live = find_item(scopes, scope['name'])
+        input_data = _scope_input_data(adapters, scope)
+        if live is None:
+            plan.append(PlanAction(STAGE_PREREQUISITES, 'create', 'deploymentScope', scope['name'],
+                                   'create_deployment_scope', organization_id=org,
+                                   body=DeploymentScopeDefinition(display_name=scope['name'],
+                                                                  type=scope.get('type', 'AzureResourceManager'),
+                                                                  input_data=json.dumps(input_data),
+                                                                  is_default=scope.get('isDefault'))))
+        else:
+            if live.type != scope.get('type', live.type):
+                raise CLIError(f"Deployment scope '{scope['name']}' is of type '{live.type}', "
+                               'the type of an existing scope cannot be changed')
+            is_default = scope.get('isDefault', live.is_default)
+            if json.loads(live.input_data or '{}') != input_data or live.is_default != is_default:
+                live.input_data = json.dumps(input_data)
+                live.is_default = is_default
+                plan.append(PlanAction(STAGE_PREREQUISITES, 'update', 'deploymentScope', scope['name'],
+                                       'update_deployment_scope', organization_id=org,
+                                       deployment_scope_id=live.id, body=live))
+
+    # Organization Users
+
+    for user in manifest.get('users') or []:
+        live = find_user(users, user['identifier'])
+        if live is None:
+            plan.append(PlanAction(STAGE_PREREQUISITES, 'create', 'user', user['identifier'],
+                                   'create_organization_user', organization_id=org,
+                                   body=_user_definition(user, 'Member')))
+        elif 'role' in user and (live.role or '').lower() != user['role'].lower():
+            live.role = user['role']
+            plan.append(PlanAction(STAGE_PREREQUISITES, 'update', 'user', user['identifier'],
+                                   'update_organization_user', user_id=live.id, organization_id=org, body=live))
+
+    # Projects
+
+    existing = []
+    for project in manifest.get('projects') or []:
+        live = find_item(projects, project['name'])
+        if live is None:
+            depends_on = None
+            template = find_item(templates, project['template'])
+            if template is None:
+                depends_on = next((a for a in plan if a.kind == 'projectTemplate' and a.action == 'create' and
+                                   a.name.lower() == str(project['template']).lower()), None)
+                if depends_on is None:
+                    raise CLIError(f"Project template '{project['template']}' for project "
+                                   f"'{project['name']}' not found in org or manifest")
+            plan.append(PlanAction(STAGE_PROJECTS, 'create', 'project', project['name'], 'create_project',
+                                   depends_on=depends_on, organization_id=org,
+                                   body=ProjectDefinition(display_name=project['name'],
+                                                          template=template.id if template else None,
+                                                          template_input=json.dumps(project.get('input') or {}),
+                                                          users=[_user_definition(u, 'Member')
+                                                                 for u in project.get('users') or []])))
+        elif project.get('users'):
+            existing.append((project, live))
+
+    project_users = await asyncio.gather(*(client.get_project_users(org, live.id) for _, live in existing))
+
+    for (project, live), result in zip(existing, project_users):
+        members = result_data(result, f"users of project '{project['name']}'")
+        for user in project['users']:
+            member = find_user(members, user['identifier'])
+            membership = next((m for m in (member.project_memberships or []) if m.project_id == live.id),
+                              None) if member else None
+            name = f"{project['name']}/{user['identifier']}"
+            if member is None or membership is None:
+                plan.append(PlanAction(STAGE_PROJECTS, 'create', 'projectUser', name, 'create_project_user',
+                                       organization_id=org, project_id=live.id,
+                                       body=_user_definition(user, 'Member')))
+            elif 'role' in user and (membership.role or '').lower() != user['role'].lower():
+                membership.role = user['role']
+                plan.append(PlanAction(STAGE_PROJECTS, 'update', 'projectUser', name, 'update_project_user',
+                                       user_id=member.id, organization_id=org, project_id=live.id, body=member))
+
+    if prune:
+        plan.extend(_plan_prune(org, manifest, templates, scopes, users, projects))
+
+    return plan
+
+
+def _plan_prune(org, manifest, templates, scopes, users, projects):
+    # only prune resource types that the manifest declares
+    plan = []
+
+    if 'projects' in manifest:
+        for project in projects:
+            if not any(find_item([project], p['name']) for p in manifest['projects'] or []):
+                plan.append(PlanAction(STAGE_PREREQUISITES, 'delete', 'project', project.display_name,
+                                       'delete_project', project_id=project.id, organization_id=org))
+
+    if 'templates' in manifest:
+        for template in templates:
+            if not any(find_item([template], t['name']) for t in manifest['templates'] or []):
+                plan.append(PlanAction(STAGE_PROJECTS, 'delete', 'projectTemplate', template.display_name,
+                                       'delete_project_template', project_template_id=template.id,
+                                       organization_id=org))
+
+    if 'scopes' in manifest:
+        for scope in scopes:
+            if not any(find_item([scope], s['name']) for s in manifest['scopes'] or []):
+                plan.append(PlanAction(STAGE_PROJECTS, 'delete', 'deploymentScope', scope.display_name,
+                                       'delete_deployment_scope', organization_id=org,
+                                       deployment_scope_id=scope.id))
+
+    if 'users' in manifest:
+        for user in users:
+            if not any(find_user([user], u['identifier']) for u in manifest['users'] or []):
+                plan.append(PlanAction(STAGE_PROJECTS, 'delete', 'user', user.login_name or user.id,
+                                       'delete_organization_user', user_id=user.id, organization_id=org))
+
+    return plan
+
+
+async def _run_action(client, action):
+    if action.depends_on is not None and action.depends_on.state != 'succeeded':
+        action.state = 'skipped'
+        action.error = f'{action.depends_on.kind} {action.depends_on.name} {action.depends_on.state}'
+        return
+
+    from .vendored_sdks.teamcloud.models import ErrorResult
+
+    result = await getattr(client, action.operation)(**action.kwargs)
+
+    if isinstance(result, ErrorResult):
+        action.state = 'failed'
+        action.error = f'{result.code} {result.status}'
+    else:
+        action.state = 'succeeded'
+        action.resource_id = getattr(getattr(result, 'data', None), 'id', None)
+        action.status = get_status_target(result, org=action.kwargs.get('organization_id'))
+
+
+async def _wait_for_stage(client, actions, max_concurrency=None, interval=DEFAULT_STATUS_INTERVAL):
+    tracked = {a.status: a for a in actions if a.status is not None}
+    if not tracked:
+        return
+    logger.warning('Waiting for %d accepted operations to complete', len(tracked))
+    poller = StatusPoller(client, interval=interval, max_concurrency=max_concurrency)
+    for target, result in (await poller.wait(list(tracked))).items():
+        if poller.is_failed(result):
+            tracked[target].state = 'failed'
+            tracked[target].error = getattr(result, 'state_message', None) or getattr(result, 'state', None) \
+                or str(result)
+
+
+async def execute_plan(client, org, plan, max_concurrency=None, status_interval=DEFAULT_STATUS_INTERVAL):
+    stages = sorted({a.stage for a in plan})
+    for stage in stages:
+        actions = [a for a in plan if a.stage == stage]
+
+        # resolve template ids for projects whose template is created by this plan,
+        # templates accepted asynchronously (202) are looked up by name
+        pending = [a for a in actions if a.depends_on is not None and a.depends_on.kind == 'projectTemplate'
+                   and a.depends_on.state == 'succeeded']
+        templates = None
+        if any(a.depends_on.resource_id is None for a in pending):
+            templates = result_data(await client.get_project_templates(org), 'project templates')
+        for action in pending:
+            template_id = action.depends_on.resource_id or \
+                getattr(find_item(templates, action.depends_on.name), 'id', None)
+            if template_id is None:
+                action.depends_on.state = 'pending'
+            else:
+                action.kwargs['body'].template = template_id
+
+        results = await gather_bounded([_run_action(client, a) for a in actions], max_concurrency,
+                                       return_exceptions=True)
+
+        for action, result in zip(actions, results):
+            if isinstance(result, Exception):
+                action.state = 'failed'
+                action.error = str(result)
+
+        # i.e. pruned projects must be gone before the templates and scopes they use are deleted
+        if stage != stages[-1]:
+            await _wait_for_stage(client, actions, max_concurrency=max_concurrency, interval=status_interval)
+
+    return plan
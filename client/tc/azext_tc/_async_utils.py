@@ -0,0 +1,47 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import asyncio
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+def run_async(coro):
+    return asyncio.run(coro)
+
+
+async def gather_bounded(coros, max_concurrency=None, return_exceptions=False, rate_limit=None):
+    """Awaits coros concurrently with at most max_concurrency in flight, and
+    at most rate_limit starting per second, returning results in the order of coros"""
+    from ._rate_limit import RequestLimiter
+
+    semaphore = asyncio.Semaphore(max_concurrency or DEFAULT_MAX_CONCURRENCY)
+    # --rate-limit paces the operations of this command (a project create or task run can take several
+    # requests), while the tc-rate-limit default paces every request the process sends. Both use the
+    # same token bucket, this one only for its rate: the operation holds no slot while it runs.
+    limiter = RequestLimiter(rate_limit) if rate_limit else None
+
+    async def _run(coro):
+        async with semaphore:
+            if limiter:
+                await limiter.acquire_async()
+                limiter.release()
+            return await coro
+
+    return await asyncio.gather(*(_run(c) for c in coros), return_exceptions=return_exceptions)
+
+
+async def fan_out(cli_ctx, base_url, func, max_concurrency=None):
+    """Creates an async client and awaits func(client) which should return
+    an iterable of coroutines to run with gather_bounded"""
+    from ._client_factory import teamcloud_async_client_factory
+
+    async with teamcloud_async_client_factory(cli_ctx, base_url) as client:
+        coros = await func(client)
+        return await gather_bounded(coros, max_concurrency)
@@ -0,0 +1,390 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import re
+import csv
+import json
+import codecs
+import shutil
+from math import floor, ceil, isnan
+from time import time
+from array import array
+from urllib.parse import urlencode
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+from ._async_utils import gather_bounded
+
+logger = get_logger(__name__)
+
+AUDIT_CSV_COLUMNS = ['commandId', 'command', 'organizationId', 'projectId', 'userId', 'parentId', 'componentTask',
+                     'runtimeStatus', 'customStatus', 'created', 'updated', 'errors']
+
+ALL_COMMANDS = '*'
+
+FAILED_STATUSES = {'failed', 'terminated'}
+FINISHED_STATUSES = {'completed', 'failed', 'terminated', 'canceled'}
+PERCENTILES = [50, 90, 99]
+
+_TIMESPAN = re.compile(r'^(?:(\d+)\.)?(\d{1,2}):(\d{2})(?::(\d{2}))?$')
+
+
+def to_timespan(value):
+    """Converts 30d, 12h or 90m to a .NET TimeSpan string, TimeSpan strings are returned as is"""
+    if re.match(r'^(\d+\.)?\d{1,2}:\d{2}(:\d{2})?$', value):
+        return value
+    shorthand = re.match(r'^(\d+)([dhm])$', value.lower())
+    if shorthand is None:
+        return None
+    amount, unit = int(shorthand.group(1)), shorthand.group(2)
+    minutes = amount * {'d': 1440, 'h': 60, 'm': 1}[unit]
+    return f'{minutes // 1440}.{minutes % 1440 // 60:02d}:{minutes % 60:02d}:00'
+
+
+def timespan_seconds(value):
+    """Converts a .NET TimeSpan string to seconds"""
+    days, hours, minutes, seconds = _TIMESPAN.match(value).groups()
+    return int(days or 0) * 86400 + int(hours) * 3600 + int(minutes) * 60 + int(seconds or 0)
+
+
+class JsonRowStream:
+    """Incrementally decodes the items of the data array of a json result from the chunks
+    of the body as they arrive, so only the part of the body not yet decoded is kept"""
+
+    def __init__(self, key='data'):
+        self.key = key
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._state = 'object'
+        self._current = None
+
+    def feed(self, chunk, final=False):
+        """Returns the items completed by chunk"""
+        self._buffer = self._buffer[self._pos:] + self._text.decode(chunk, final=final)
+        self._pos = 0
+        rows = []
+        while self._step(rows, final):
+            pass
+        return rows
+
+    def close(self):
+        self.feed(b'', final=True)
+        if self._state != 'done':
+            raise ValueError(f'the response ended early or is not a json object ({self._state})')
+
+    def _next(self):
+        # skips whitespace, returns the next character or None if more input is needed
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\r\n':
+            self._pos += 1
+        return self._buffer[self._pos] if self._pos < len(self._buffer) else None
+
+    def _decode(self, final):
+        # numbers and literals are only complete once the character after them arrived
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except ValueError:
+            if final:
+                raise
+            return False, None
+        if end == len(self._buffer) and not final:
+            return False, None
+        self._pos = end
+        return True, value
+
+    def _expect(self, char, state):
+        if self._next() != char:
+            raise ValueError(f"expected '{char}' at '{self._buffer[self._pos:self._pos + 20]}'")
+        self._pos += 1
+        self._state = state
+        return True
+
+    def _step(self, rows, final):  # pylint: disable=too-many-return-statements
+        char = self._next()
+        if char is None or self._state == 'done':
+            return False
+        if self._state == 'object':
+            return self._expect('{', 'key')
+        if self._state in ['key', 'next'] and char == '}':
+            self._pos += 1
+            self._state = 'done'
+            return True
+        if self._state == 'next':
+            return self._expect(',', 'key')
+        if self._state == 'key':
+            done, self._current = self._decode(final)
+            self._state = 'colon' if done else 'key'
+            return done
+        if self._state == 'colon':
+            return self._expect(':', 'value')
+        if self._state == 'value':
+            if self._current == self.key and char == '[':
+                return self._expect('[', 'items')
+            done, _ = self._decode(final)
+            self._state = 'next' if done else 'value'
+            return done
+        # items, item and item separators of the data array
+        if char == ']' and self._state in ['items', 'separator']:
+            self._pos += 1
+            self._state = 'next'
+            return True
+        if self._state == 'separator':
+            return self._expect(',', 'item')
+        done, row = self._decode(final)
+        if done:
+            rows.append(row)
+            self._state = 'separator'
+        return done
+
+
+async def iter_audit_rows(client, org, time_range=None, commands=None):
+    """Yields lists of audit entries as plain dicts while the response streams in,
+    skipping msrest model deserialization"""
+    from .vendored_sdks.teamcloud._vendor import _convert_request
+    from .vendored_sdks.teamcloud.operations._team_cloud_client_operations import build_get_audit_entries_request
+
+    request = _convert_request(build_get_audit_entries_request(organization_id=org, time_range=time_range))
+    # the generated request serializes the commands list as a single python list literal,
+    # the api expects the parameter repeated once per command
+    if commands:
+        request.url += ('&' if '?' in request.url else '?') + urlencode([('commands', c) for c in commands])
+    request.url = client._client.format_url(request.url)  # pylint: disable=protected-access
+
+    pipeline = client._client._pipeline  # pylint: disable=protected-access
+    response = (await pipeline.run(request, stream=True)).http_response
+
+    if response.status_code != 200:
+        await response.load_body()
+        raise CLIError(f'Failed to get audit entries ({response.status_code}): {response.text()}')
+
+    rows = JsonRowStream()
+    try:
+        async for chunk in response.stream_download(pipeline):
+            batch = rows.feed(chunk)
+            if batch:
+                yield batch
+        rows.close()
+    except ValueError as ex:
+        raise CLIError(f'Failed to read audit entries: {ex}') from ex
+
+
+async def get_audit_rows(client, org, time_range=None, commands=None):
+    """Gets audit entries as plain dicts, skipping msrest model deserialization"""
+    return [row async for batch in iter_audit_rows(client, org, time_range=time_range, commands=commands)
+            for row in batch]
+
+
+class AuditExportState:
+    """Tracks completed shards in a file next to the export so a failed export can resume. The time range
+    is kept as the absolute window of the first run, and the size of the export after each completed shard
+    so rows a failed run wrote after the last one can be truncated."""
+
+    def __init__(self, file, time_range, commands, output_format):
+        self.file = file + '.state'
+        self.key = {'timeRange': time_range, 'commands': sorted(commands or []), 'format': output_format}
+        self.end = time()
+        self.start = self.end - timespan_seconds(time_range) if time_range else None
+        self.completed = []
+        self.size = 0
+
+    def load(self):
+        try:
+            with open(self.file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if {k: state.get(k) for k in self.key} != self.key or 'size' not in state:
+            return False
+        self.start, self.end = state.get('start'), state['end']
+        self.completed = state.get('completed', [])
+        self.size = state['size']
+        return True
+
+    def complete(self, shard, size):
+        self.completed.append(shard)
+        self.size = size
+        with open(self.file, 'w', encoding='utf-8') as f:
+            json.dump(dict(self.key, start=self.start, end=self.end, completed=self.completed, size=size), f)
+
+    def time_range(self):
+        """Returns the time range to request so the results include the window's start"""
+        return None if self.start is None else to_timespan(f'{ceil((time() - self.start) / 60)}m')
+
+    def includes(self, row):
+        created = _to_epoch(row.get('created'))
+        return isnan(created) or ((self.start is None or created >= self.start) and created <= self.end)
+
+    def remove(self):
+        try:
+            os.remove(self.file)
+        except OSError:
+            pass
+
+
+class AuditRowWriter:
+
+    def __init__(self, stream, output_format, write_header=True):
+        self.stream = stream
+        self.output_format = output_format
+        self.count = 0
+        self.csv = None
+        if output_format == 'csv':
+            self.csv = csv.DictWriter(stream, fieldnames=AUDIT_CSV_COLUMNS, extrasaction='ignore')
+            if write_header:
+                self.csv.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            if self.csv:
+                # errors and other structured columns are written as json so they can be read back
+                self.csv.writerow({k: json.dumps(v) if isinstance(v, (dict, list)) else v for k, v in row.items()})
+            else:
+                self.stream.write(json.dumps(row) + '\n')
+        self.count += len(rows)
+
+    def append(self, stream, count):
+        """Appends the rows another writer wrote to stream and syncs them to disk"""
+        stream.seek(0)
+        shutil.copyfileobj(stream, self.stream)
+        self.stream.flush()
+        os.fsync(self.stream.fileno())
+        self.count += count
+
+
+async def export_audit(client, org, writer, state, commands=None, max_concurrency=None):
+    """Shards the export by command, fetching shards concurrently. Each shard streams to a part file
+    next to the export, which is appended to it in one piece when complete and then recorded in state."""
+    if not commands:
+        result = await client.get_audit_commands(org)
+        commands = getattr(result, 'data', None) or []
+
+    all_shards = commands or [ALL_COMMANDS]
+    shards = [(i, s) for i, s in enumerate(all_shards) if s not in state.completed]
+    if len(shards) < len(all_shards):
+        logger.warning('Resuming audit export, %d of %d shards remaining', len(shards), len(all_shards))
+
+    async def export_shard(index, shard):
+        part = f'{writer.stream.name}.{index}.part'
+        try:
+            with open(part, 'w+', encoding='utf-8', newline='') as f:
+                rows = AuditRowWriter(f, writer.output_format, write_header=False)
+                async for batch in iter_audit_rows(client, org, time_range=state.time_range(),
+                                                   commands=None if shard == ALL_COMMANDS else [shard]):
+                    rows.write([r for r in batch if state.includes(r)])
+                writer.append(f, rows.count)
+        finally:
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+        state.complete(shard, writer.stream.tell())
+        logger.info('Exported %d audit entries for %s', rows.count, shard)
+
+    await gather_bounded([export_shard(i, s) for i, s in shards], max_concurrency)
+
+
+def _to_epoch(value):
+    from ._deserializer import _parse_iso, _Unsupported
+    if not value:
+        return float('nan')
+    # .NET emits up to 7 fractional digits and a Z suffix, which fromisoformat rejects before python 3.11
+    try:
+        return _parse_iso(value).timestamp()
+    except (_Unsupported, ValueError):
+        logger.debug('Ignoring invalid audit timestamp %s', value)
+        return float('nan')
+
+
+def _percentile(values, percent):
+    """Linear interpolation between closest ranks of sorted values"""
+    if not values:
+        return None
+    k = (len(values) - 1) * percent / 100
+    lower, upper = values[floor(k)], values[ceil(k)]
+    return lower + (upper - lower) * (k - floor(k))
+
+
+class AuditTable:
+    """Columnar store of audit entries. Each column is a typed array indexed by row,
+    commands are dictionary encoded, so rows are never kept as dicts or models."""
+
+    def __init__(self):
+        self.commands = []
+        self._command_codes = {}
+        self.command = array('I')
+        self.created = array('d')
+        self.duration = array('d')
+        self.finished = array('b')
+        self.failed = array('b')
+
+    def __len__(self):
+        return len(self.command)
+
+    def append(self, rows):
+        for row in rows:
+            name = row.get('command') or 'Unknown'
+            code = self._command_codes.get(name)
+            if code is None:
+                code = self._command_codes[name] = len(self.commands)
+                self.commands.append(name)
+
+            status = (row.get('runtimeStatus') or '').lower()
+            created = _to_epoch(row.get('created'))
+            finished = status in FINISHED_STATUSES
+
+            self.command.append(code)
+            self.created.append(created)
+            self.duration.append(_to_epoch(row.get('updated')) - created if finished else float('nan'))
+            self.finished.append(finished)
+            self.failed.append(status in FAILED_STATUSES)
+
+    def stats(self):
+        created = [c for c in self.created if not isnan(c)]
+        hours = max((max(created) - min(created)) / 3600, 1) if created else 1
+
+        counts = [0] * len(self.commands)
+        failures = [0] * len(self.commands)
+        durations = [array('d') for _ in self.commands]
+
+        for code, duration, failed in zip(self.command, self.duration, self.failed):
+            counts[code] += 1
+            failures[code] += failed
+            if not isnan(duration):
+                durations[code].append(duration)
+
+        results = []
+        for code, name in enumerate(self.commands):
+            values = sorted(durations[code])
+            result = {
+                'command': name,
+                'count': counts[code],
+                'failed': failures[code],
+                'failureRatio': round(failures[code] / counts[code], 4),
+                'perHour': round(counts[code] / hours, 2)
+            }
+            for percent in PERCENTILES:
+                value = _percentile(values, percent)
+                result[f'p{percent}'] = None if value is None else round(value, 3)
+            results.append(result)
+
+        return sorted(results, key=lambda r: r['count'], reverse=True)
+
+
+async def load_audit_table(client, org, table, time_range=None, commands=None, max_concurrency=None):
+    """Fetches audit entries sharded by command concurrently into table"""
+    if not commands:
+        result = await client.get_audit_commands(org)
+        commands = getattr(result, 'data', None) or []
+
+    async def load_shard(shard):
+        async for batch in iter_audit_rows(client, org, time_range=time_range,
+                                           commands=None if shard == ALL_COMMANDS else [shard]):
+            table.append(batch)
+
+    await gather_bounded([load_shard(s) for s in commands or [ALL_COMMANDS]], max_concurrency)
+    return table
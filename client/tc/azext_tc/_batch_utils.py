@@ -0,0 +1,144 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import shlex
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import monotonic
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+logger = get_logger(__name__)
+
+# a line with only this keyword waits for all preceding operations to finish
+BATCH_BARRIER = 'wait'
+
+# commands that can't run inside a batch
+_EXCLUDED_COMMANDS = ['batch', 'daemon', 'deploy', 'update']
+
+
+class BatchOperation:  # pylint: disable=too-few-public-methods
+
+    def __init__(self, line, text, argv):
+        self.line = line
+        self.text = text
+        self.argv = argv
+        self.status = 'planned'
+        self.result = None
+        self.error = None
+        self.duration = None
+
+    def to_dict(self):
+        result = {'line': self.line, 'command': self.text, 'status': self.status}
+        if self.duration is not None:
+            result['duration'] = round(self.duration, 3)
+        if self.result is not None:
+            result['result'] = self.result
+        if self.error:
+            result['error'] = self.error
+        return result
+
+
+def load_operations(file):
+    """Reads a batch file of tc commands, one per line, with or without the leading `az tc`.
+    Blank lines and # comments are ignored. Returns the operations in groups separated by
+    `wait` lines, operations within a group are independent of each other."""
+    groups = [[]]
+    try:
+        with open(file, 'r', encoding='utf-8') as f:
+            lines = list(f)
+    except OSError as e:
+        raise CLIError(f'Unable to read {file}: {e}') from e
+
+    for number, line in enumerate(lines, 1):
+        try:
+            argv = shlex.split(line, comments=True)
+        except ValueError as e:
+            raise CLIError(f'{file}:{number}: {e}') from e
+
+        if not argv:
+            continue
+        if argv == [BATCH_BARRIER]:
+            groups.append([])
+            continue
+
+        if argv[0] == 'az':
+            argv = argv[1:]
+        if argv[:1] == ['tc']:
+            argv = argv[1:]
+        if not argv or argv[0] in _EXCLUDED_COMMANDS:
+            raise CLIError(f"{file}:{number}: 'tc {' '.join(argv[:1])}' can't run in a batch")
+
+        groups[-1].append(BatchOperation(number, 'tc ' + ' '.join(shlex.quote(a) for a in argv), argv))
+
+    return [g for g in groups if g]
+
+
+class BatchRunner:
+    """Runs operations in-process. Each worker thread invokes commands on its own az cli
+    instance, but all of them share the TeamCloud clients (and so the token and http session)
+    through the client cache in cli_ctx.data."""
+
+    def __init__(self, clients, parallel=1, continue_on_error=False, on_result=None):
+        self.clients = clients
+        self.parallel = max(parallel or 1, 1)
+        self.continue_on_error = continue_on_error
+        self.on_result = on_result
+        self.stopped = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _get_cli(self):
+        cli = getattr(self._local, 'cli', None)
+        if cli is None:
+            from azure.cli.core import get_default_cli
+            cli = self._local.cli = get_default_cli()
+            cli.data['tc_clients'] = self.clients
+        return cli
+
+    def _execute(self, operation):
+        if self.stopped:
+            operation.status = 'skipped'
+        else:
+            cli = self._get_cli()
+            started = monotonic()
+            try:
+                cli.invocation = cli.invocation_cls(cli_ctx=cli, parser_cls=cli.parser_cls,
+                                                    commands_loader_cls=cli.commands_loader_cls,
+                                                    help_cls=cli.help_cls)
+                result = cli.invocation.execute(['tc'] + operation.argv)
+                operation.result = result.result
+                operation.status = 'failed' if result.exit_code else 'succeeded'
+            except SystemExit as ex:  # argparse exits on invalid arguments
+                operation.status = 'failed'
+                operation.error = f'invalid arguments (exit code {ex.code})'
+            except Exception as ex:  # pylint: disable=broad-except
+                operation.status = 'failed'
+                operation.error = str(ex) or type(ex).__name__
+            operation.duration = monotonic() - started
+
+            if operation.status == 'failed' and not self.continue_on_error:
+                self.stopped = True
+
+        if self.on_result:
+            with self._lock:
+                self.on_result(operation)
+        return operation
+
+    def run(self, groups):
+        """Runs each group in turn, the operations of a group on up to `parallel` threads"""
+        operations = [o for g in groups for o in g]
+        if self.parallel == 1:
+            for operation in operations:
+                self._execute(operation)
+            return operations
+
+        # one pool for the whole batch so worker clis are reused across groups
+        with ThreadPoolExecutor(max_workers=self.parallel) as executor:
+            for group in groups:
+                for future in as_completed([executor.submit(self._execute, o) for o in group]):
+                    future.result()
+        return operations
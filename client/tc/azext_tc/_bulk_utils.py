@@ -0,0 +1,240 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import csv
+import json
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+from ._async_utils import gather_bounded
+from ._model_utils import find_item
+
+logger = get_logger(__name__)
+
+DEFAULT_PROJECT_USER_ROLE = 'Member'
+
+_JSON_TYPES = {
+    'string': (str,),
+    'integer': (int,),
+    'number': (int, float),
+    'boolean': (bool,),
+    'object': (dict,),
+    'array': (list,)
+}
+
+
+def load_project_rows(file):
+    """Reads projects from a csv file or a yaml/json list. Csv rows have name and template columns,
+    input as a json object column or one input.<key> column per parameter, and users as
+    semicolon-separated identifier[:role] entries."""
+    import yaml  # json is a subset of yaml
+    try:
+        with open(file, 'r', encoding='utf-8', newline='') as f:
+            if os.path.splitext(file)[1].lower() == '.csv':
+                rows = [_from_csv(r) for r in csv.DictReader(f)]
+            else:
+                rows = yaml.safe_load(f) or []
+                rows = (rows.get('projects') or []) if isinstance(rows, dict) else rows
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        raise CLIError(f'Unable to read {file}: {e}') from e
+
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        raise CLIError(f'{file} must contain a list of projects')
+    return rows
+
+
+def _from_csv(row):
+    input_data = (row.get('input') or '').strip() or {}
+    if input_data:
+        try:
+            input_data = json.loads(input_data)
+        except ValueError:
+            pass  # prepare_projects reports the row as invalid
+    if isinstance(input_data, dict):
+        for key, value in row.items():
+            if key and key.startswith('input.') and value not in [None, '']:
+                input_data[key[len('input.'):]] = value
+
+    users = []
+    for user in (row.get('users') or '').split(';'):
+        identifier, _, role = user.strip().partition(':')
+        if identifier:
+            users.append({'identifier': identifier, 'role': role or DEFAULT_PROJECT_USER_ROLE})
+
+    return {'name': row.get('name'), 'template': row.get('template'), 'input': input_data, 'users': users}
+
+
+def validate_input(input_data, schema):
+    """Coerces string values and checks input against the template's input json schema,
+    returning the input and a list of errors"""
+    from ._input_utils import _find_missing_parameters
+
+    if not schema:
+        return input_data, []
+
+    errors = []
+    properties = schema.get('properties') or {}
+    result = {}
+
+    for key, value in input_data.items():
+        property_schema = properties.get(key)
+        if property_schema is None:
+            if not schema.get('additionalProperties', False):
+                errors.append(f"unrecognized input '{key}'")
+            result[key] = value
+            continue
+
+        property_type = property_schema.get('type')
+        if isinstance(property_type, list):
+            property_type = next((t for t in property_type if t != 'null'), None)
+        try:
+            value = _coerce(value, property_type)
+        except ValueError:
+            errors.append(f"input '{key}' must be of type {property_type}")
+            continue
+
+        if 'enum' in property_schema and value not in property_schema['enum']:
+            errors.append(f"input '{key}' must be one of {', '.join(map(str, property_schema['enum']))}")
+        result[key] = value
+
+    for key, property_schema in properties.items():
+        if key not in result and 'default' in property_schema:
+            result[key] = property_schema['default']
+
+    missing = _find_missing_parameters(result, schema)
+    if missing:
+        errors.append(f"missing required input: {', '.join(missing.keys())}")
+
+    return result, errors
+
+
+def _input_object(value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError as ex:
+            raise ValueError(f'input is not valid json: {ex}') from ex
+    if not isinstance(value, dict):
+        raise ValueError('input must be an object')
+    return value
+
+
+def _coerce(value, property_type):
+    if property_type not in _JSON_TYPES:
+        return value
+    if isinstance(value, str) and property_type != 'string':
+        if property_type == 'boolean':
+            if value.lower() not in ['true', 'false']:
+                raise ValueError(value)
+            return value.lower() == 'true'
+        value = json.loads(value) if property_type in ['object', 'array'] else \
+            int(value) if property_type == 'integer' else float(value)
+    if not isinstance(value, _JSON_TYPES[property_type]) or \
+            (isinstance(value, bool) and property_type != 'boolean'):
+        raise ValueError(value)
+    return value
+
+
+class BulkProject:  # pylint: disable=too-few-public-methods
+
+    def __init__(self, index, row):
+        self.index = index
+        self.name = row.get('name')
+        self.definition = None
+        self.state = 'planned'
+        self.id = None
+        self.tracking_id = None
+        self.result = None
+        self.errors = []
+
+    def to_dict(self):
+        result = {'row': self.index, 'name': self.name, 'state': self.state}
+        if self.id:
+            result['id'] = self.id
+        if self.tracking_id:
+            result['trackingId'] = self.tracking_id
+        if self.errors:
+            result['errors'] = self.errors
+        return result
+
+
+def prepare_projects(rows, templates):
+    """Validates every row against its template's input schema, building the
+    ProjectDefinition for valid rows. No requests are made."""
+    from .vendored_sdks.teamcloud.models import ProjectDefinition, UserDefinition
+
+    projects = []
+    names = set()
+    for index, row in enumerate(rows, 1):
+        project = BulkProject(index, row)
+        projects.append(project)
+
+        if not project.name:
+            project.errors.append('name is required')
+        elif project.name.lower() in names:
+            project.errors.append(f"duplicate project name '{project.name}'")
+        else:
+            names.add(project.name.lower())
+
+        template = find_item(templates, row.get('template')) if row.get('template') \
+            else next((t for t in templates if t.is_default), None)
+        if template is None:
+            project.errors.append(f"project template '{row.get('template') or '(default)'}' not found")
+        else:
+            try:
+                input_data = _input_object(row.get('input') or {})
+            except ValueError as ex:
+                project.errors.append(str(ex))
+            else:
+                schema = json.loads(template.input_json_schema) if template.input_json_schema else None
+                input_data, errors = validate_input(input_data, schema)
+                project.errors.extend(errors)
+
+        users = row.get('users') or []
+        if any(not isinstance(u, dict) or not u.get('identifier') for u in users):
+            project.errors.append('every user requires an identifier')
+
+        if project.errors:
+            project.state = 'invalid'
+            continue
+
+        project.definition = ProjectDefinition(
+            display_name=project.name, template=template.id, template_input=json.dumps(input_data),
+            users=[UserDefinition(identifier=u['identifier'], role=u.get('role', DEFAULT_PROJECT_USER_ROLE),
+                                  properties=u.get('properties')) for u in users])
+
+    return projects
+
+
+async def create_projects(client, org, projects, max_concurrency=None, rate_limit=None, on_result=None):
+    """Creates all valid projects concurrently, calling on_result as each one finishes"""
+    from .vendored_sdks.teamcloud.models import ErrorResult, StatusResult
+
+    async def _create(project):
+        try:
+            result = await client.create_project(org, project.definition)
+        except Exception as ex:  # pylint: disable=broad-except
+            result = None
+            project.errors.append(str(ex))
+
+        project.result = result
+        if isinstance(result, ErrorResult):
+            project.errors.extend([e.message for e in result.errors or []] or [result.status])
+        elif isinstance(result, StatusResult):
+            project.state = 'accepted'
+            project.tracking_id = result.tracking_id
+        elif result is not None:
+            project.state = 'created'
+            project.id = getattr(result.data, 'id', None)
+
+        if project.errors:
+            project.state = 'failed'
+        if on_result:
+            on_result(project)
+
+    await gather_bounded([_create(p) for p in projects if p.definition], max_concurrency, rate_limit=rate_limit)
+    return projects
@@ -0,0 +1,378 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import re
+import json
+import base64
+import hashlib
+from time import time
+
+from knack.log import get_logger
+from azure.core.pipeline import PipelineResponse
+from azure.core.pipeline.policies import HTTPPolicy
+from azure.core.pipeline.transport import HttpResponse
+from azure.core.utils import case_insensitive_dict
+
+logger = get_logger(__name__)
+
+DEFAULT_RESPONSE_CACHE_SIZE_MB = 50
+DEFAULT_ORG_CACHE_TTL = 3600
+DEFAULT_TOKEN_REFRESH_SECONDS = 300
+
+# get_organizations, get_adapters, get_project_templates, get_deployment_scopes
+CACHEABLE_PATHS = re.compile(r'/(?:orgs|adapters|orgs/[^/]+/templates|orgs/[^/]+/scopes)/?$', re.IGNORECASE)
+
+
+def get_cache_dir(cli_ctx, *paths):
+    return os.path.join(cli_ctx.config.config_dir, 'tc', *paths)
+
+
+def get_response_cache_policy(cli_ctx, no_cache=False):
+    if no_cache or not cli_ctx.config.getboolean('tc', 'cache', fallback=False):
+        return None
+
+    size_mb = cli_ctx.config.getint('tc', 'cache_size_mb', fallback=DEFAULT_RESPONSE_CACHE_SIZE_MB)
+    cache = ResponseCache(get_cache_dir(cli_ctx, 'responses'), max_size=size_mb * 1024 * 1024)
+    return ResponseCachePolicy(cache)
+
+
+def get_org_id_cache(cli_ctx):
+    ttl = cli_ctx.config.getint('tc', 'org_cache_ttl', fallback=DEFAULT_ORG_CACHE_TTL)
+    return OrgIdCache(get_cache_dir(cli_ctx, 'orgs.json'), ttl=ttl)
+
+
+def get_cached_credential(cli_ctx, credential, tenant_id=None):
+    """Wraps credential with the persistent token cache if enabled with `az config set tc.token_cache=true`"""
+    if not cli_ctx.config.getboolean('tc', 'token_cache', fallback=False):
+        return credential
+
+    from azure.cli.core._profile import Profile
+    identity = f'{tenant_id}/{Profile(cli_ctx=cli_ctx).get_current_account_user()}'
+    refresh = cli_ctx.config.getint('tc', 'token_refresh_seconds', fallback=DEFAULT_TOKEN_REFRESH_SECONDS)
+    return CachedTokenCredential(credential, TokenCache(get_cache_dir(cli_ctx, 'tokens')), identity, refresh=refresh)
+
+
+def _write_json(file, data):
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    tmp = f'{file}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, file)
+
+
+def _get_identity(http_request):
+    """Returns a stable identity for the caller using the tenant and object id
+    claims of the bearer token, falling back to a hash of the header
+    """
+    auth = http_request.headers.get('Authorization', '')
+    try:
+        payload = auth.split(' ', 1)[-1].split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return f"{claims.get('tid')}/{claims.get('oid') or claims.get('sub')}"
+    except (IndexError, ValueError, AttributeError):
+        return hashlib.sha256(auth.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """File-backed store of GET responses with LRU eviction once the
+    total size exceeds max_size bytes. File mtime is used as last access time.
+    """
+
+    def __init__(self, path, max_size=DEFAULT_RESPONSE_CACHE_SIZE_MB * 1024 * 1024):
+        self.path = path
+        self.max_size = max_size
+
+    @staticmethod
+    def key(url, identity):
+        return hashlib.sha256(f'{identity}\n{url}'.encode('utf-8')).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.json')
+
+    def get(self, key):
+        file = self._file(key)
+        try:
+            with open(file, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(file)
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, entry):
+        try:
+            _write_json(self._file(key), entry)
+            self._evict()
+        except OSError as ex:
+            logger.debug('Failed to write response cache entry: %s', ex)
+
+    def remove(self, key):
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in self._entries():
+            self.remove(name[:-len('.json')])
+
+    def _entries(self):
+        try:
+            return [n for n in os.listdir(self.path) if n.endswith('.json')]
+        except OSError:
+            return []
+
+    def _evict(self):
+        entries = []
+        for name in self._entries():
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+            except OSError:
+                continue
+
+        total = sum(e[1] for e in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_size:
+                break
+            self.remove(name[:-len('.json')])
+            total -= size
+
+
+class OrgIdCache:
+    """Persistent org name to id resolution keyed by TeamCloud url.
+    Entries expire after ttl seconds, a ttl of 0 disables the cache.
+    """
+
+    def __init__(self, file, ttl=DEFAULT_ORG_CACHE_TTL):
+        self.file = file
+        self.ttl = ttl
+
+    @staticmethod
+    def _url(base_url):
+        return (base_url or '').rstrip('/').lower()
+
+    def _load(self):
+        try:
+            with open(self.file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, data):
+        try:
+            _write_json(self.file, data)
+        except OSError as ex:
+            logger.debug('Failed to write org cache: %s', ex)
+
+    def get(self, base_url, name):
+        if self.ttl <= 0:
+            return None
+        entry = self._load().get(self._url(base_url), {}).get(name.lower())
+        if entry is None or entry['expires'] < time():
+            return None
+        return entry['id']
+
+    def set(self, base_url, name, org_id):
+        if self.ttl <= 0:
+            return
+        data = self._load()
+        now = time()
+        orgs = {k: v for k, v in data.get(self._url(base_url), {}).items() if v['expires'] >= now}
+        orgs[name.lower()] = {'id': org_id, 'expires': now + self.ttl}
+        data[self._url(base_url)] = orgs
+        self._save(data)
+
+    def invalidate(self, base_url, name=None, org_id=None):
+        data = self._load()
+        orgs = data.get(self._url(base_url))
+        if not orgs:
+            return
+        if name is None and org_id is None:
+            del data[self._url(base_url)]
+        else:
+            data[self._url(base_url)] = {k: v for k, v in orgs.items()
+                                         if k != (name or '').lower() and v['id'] != org_id}
+        self._save(data)
+
+
+class CachedHttpResponse(HttpResponse):
+    """HttpResponse rebuilt from a cache entry, returned in place of a 304"""
+
+    def __init__(self, request, entry):
+        super().__init__(request, None)
+        self.status_code = entry['status']
+        self.reason = 'OK'
+        self.headers = case_insensitive_dict(entry['headers'])
+        self.content_type = self.headers.get('Content-Type')
+        self._body = entry['body'].encode('utf-8')
+
+    def body(self):
+        return self._body
+
+
+class ResponseCachePolicy(HTTPPolicy):
+    """Revalidates cached GET responses with If-None-Match and serves 304s
+    from the local copy. Must run after the authentication policy so the
+    cache can be keyed by the caller's identity.
+    """
+
+    def __init__(self, cache, paths=CACHEABLE_PATHS):
+        super().__init__()
+        self.cache = cache
+        self.paths = paths
+
+    def send(self, request):
+        http_request = request.http_request
+
+        if http_request.method != 'GET' or not self.paths.search(http_request.url.split('?', 1)[0]):
+            return self.next.send(request)
+
+        key = ResponseCache.key(http_request.url, _get_identity(http_request))
+        entry = self.cache.get(key)
+
+        if entry and 'If-None-Match' not in http_request.headers:
+            http_request.headers['If-None-Match'] = entry['etag']
+
+        response = self.next.send(request)
+        http_response = response.http_response
+
+        if http_response.status_code == 304 and entry:
+            logger.debug('Serving %s from response cache', http_request.url)
+            return PipelineResponse(http_request, CachedHttpResponse(http_request, entry), response.context)
+
+        etag = http_response.headers.get('ETag')
+        if http_response.status_code == 200 and etag:
+            self.cache.set(key, {
+                'url': http_request.url,
+                'etag': etag,
+                'status': http_response.status_code,
+                'headers': {'Content-Type': http_response.headers.get('Content-Type', 'application/json')},
+                'body': http_response.text()
+            })
+        elif entry:
+            self.cache.remove(key)
+
+        return response
+
+
+class TokenCache:
+    """Stores access tokens in files readable only by the current user, encrypted with a Fernet key.
+    The key is kept in the OS's encrypted storage (DPAPI, the macOS Keychain or libsecret) through
+    msal-extensions when available. Otherwise it is stored in a file next to the tokens, and the
+    encryption adds nothing: the tokens are only protected by the directory's permissions."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fernet = None
+
+    @staticmethod
+    def key(identity, scopes):
+        return hashlib.sha256('\n'.join([identity] + sorted(scopes)).encode('utf-8')).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.bin')
+
+    def _get_fernet(self):
+        if self._fernet is None:
+            from cryptography.fernet import Fernet
+            os.makedirs(self.path, mode=0o700, exist_ok=True)
+            self._fernet = Fernet(self._load_protected_key() or self._load_key())
+        return self._fernet
+
+    def _load_protected_key(self):
+        # on linux this needs libsecret (PyGObject), which is often missing
+        try:
+            from msal_extensions import build_encrypted_persistence
+            from msal_extensions.persistence import PersistenceNotFound
+            persistence = build_encrypted_persistence(os.path.join(self.path, '.protected_key'))
+            try:
+                return persistence.load().encode('utf-8')
+            except PersistenceNotFound:
+                from cryptography.fernet import Fernet
+                persistence.save(Fernet.generate_key().decode('utf-8'))
+                # another process may have saved its key first
+                return persistence.load().encode('utf-8')
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.debug('OS encrypted storage unavailable, the token cache key is stored in a file: %s',
+                         str(ex).strip().split('\n', 1)[0])
+            return None
+
+    def _load_key(self):
+        from cryptography.fernet import Fernet
+        key_file = os.path.join(self.path, '.key')
+        try:
+            fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(Fernet.generate_key())
+        except FileExistsError:
+            pass
+        with open(key_file, 'rb') as f:
+            return f.read()
+
+    def get(self, key):
+        from cryptography.fernet import InvalidToken
+        try:
+            with open(self._file(key), 'rb') as f:
+                return json.loads(self._get_fernet().decrypt(f.read()))
+        except (OSError, ValueError, InvalidToken):
+            return None
+
+    def set(self, key, token, expires_on):
+        try:
+            data = self._get_fernet().encrypt(json.dumps({'token': token, 'expires_on': expires_on}).encode('utf-8'))
+            tmp = f'{self._file(key)}.{os.getpid()}.tmp'
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self._file(key))
+        except OSError as ex:
+            logger.debug('Failed to write token cache entry: %s', ex)
+
+    def clear(self):
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith('.bin'):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+
+class CachedTokenCredential:
+    """TokenCredential that serves tokens from the persistent TokenCache, keyed by
+    tenant, account and scopes. Tokens expiring within refresh seconds are
+    acquired again from the wrapped credential before they are used."""
+
+    def __init__(self, credential, cache, identity, refresh=DEFAULT_TOKEN_REFRESH_SECONDS):
+        self._credential = credential
+        self._cache = cache
+        self._identity = identity
+        self._refresh = refresh
+        self._tokens = {}
+
+    def get_token(self, *scopes, **kwargs):
+        from azure.core.credentials import AccessToken
+
+        # claims challenges and similar requests must always go to the identity provider
+        if kwargs.get('claims'):
+            return self._credential.get_token(*scopes, **kwargs)
+
+        key = TokenCache.key(self._identity, scopes)
+        entry = self._tokens.get(key) or self._cache.get(key)
+        if entry and entry['expires_on'] - time() > self._refresh:
+            self._tokens[key] = entry
+            return AccessToken(entry['token'], entry['expires_on'])
+
+        token = self._credential.get_token(*scopes, **kwargs)
+        entry = {'token': token.token, 'expires_on': token.expires_on}
+        self._tokens[key] = entry
+        self._cache.set(key, token.token, token.expires_on)
+        logger.debug('Cached access token for %s until %s', ' '.join(scopes), token.expires_on)
+        return token
@@ -3,53 +3,160 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
-import json
-from msrest.serialization import Serializer
-from azure.core.pipeline.policies import SansIOHTTPPolicy
+import threading
+from knack.util import CLIError
 from azure.cli.core.profiles import ResourceType
 from azure.cli.core.commands.client_factory import get_mgmt_service_client
 
+_clients_lock = threading.Lock()
 
-class JsonCTemplate:  # pylint: disable=too-few-public-methods
-    def __init__(self, template_as_bytes):
-        self.template_as_bytes = template_as_bytes
 
+def _compact_models(cli_ctx):
+    # list results hold compact (__slots__) models, `az config set tc.compact_models=false` to opt out
+    return cli_ctx.config.getboolean('tc', 'compact_models', fallback=True)
 
-class JSONSerializer(Serializer):
-    def body(self, data, data_type, **kwargs):
-        if data_type in ('Deployment', 'ScopedDeployment', 'DeploymentWhatIf', 'ScopedDeploymentWhatIf'):
-            # Be sure to pass a DeploymentProperties
-            template = data.properties.template
-            if template:
-                data_as_dict = data.serialize()
-                data_as_dict["properties"]["template"] = JsonCTemplate(template)
 
-                return data_as_dict
-        return super().body(data, data_type, **kwargs)
+class OfflineClient:  # pylint: disable=too-few-public-methods
+    """Stands in for the client of commands run with --offline, which read from the local mirror"""
 
+    def __getattr__(self, name):
+        raise CLIError(f"--offline reads from the local mirror and can't call {name}")
 
-class JsonCTemplatePolicy(SansIOHTTPPolicy):
 
-    def on_request(self, request):
-        http_request = request.http_request
-        if (getattr(http_request, 'data', {}) or {}).get('properties', {}).get('template'):
-            template = http_request.data["properties"]["template"]
-            if not isinstance(template, JsonCTemplate):
-                raise ValueError()
+def teamcloud_client_factory(cli_ctx, command_args):
+    """Returns the TeamCloud client for the command's --base-url. Clients are cached in
+    cli_ctx.data, so the validators, completers and the command share one instance"""
+    # command_args has no default so azure-cli passes it, it calls factories without it when it can
+    # --no-cache is registered as an extra argument and consumed here
+    no_cache = command_args.pop('no_cache', False)
+    base_url = command_args.get('base_url')
+    # --offline commands don't need a client, or a login
+    if command_args.get('offline'):
+        return OfflineClient()
 
-            del http_request.data["properties"]["template"]
-            # templateLink nad template cannot exist at the same time in deployment_dry_run mode
-            if "templateLink" in http_request.data["properties"].keys():
-                del http_request.data["properties"]["templateLink"]
-            partial_request = json.dumps(http_request.data)
+    # tc batch passes its cache to the cli instance of each worker thread
+    clients = cli_ctx.data.setdefault('tc_clients', {})
+    key = (base_url, no_cache)
+    if key not in clients:
+        with _clients_lock:
+            if key not in clients:
+                clients[key] = _create_teamcloud_client(cli_ctx, base_url, no_cache)
+    return clients[key]
 
-            http_request.data = partial_request[:-2] + ", template:" + template.template_as_bytes + r"}}"
-            http_request.data = http_request.data.encode('utf-8')
 
-
-def teamcloud_client_factory(cli_ctx, *_):
+def _create_teamcloud_client(cli_ctx, base_url, no_cache):
+    from azure.cli.core._profile import Profile
     from .vendored_sdks.teamcloud import TeamCloudClient
-    return get_mgmt_service_client(cli_ctx, TeamCloudClient, subscription_bound=False, base_url_bound=False)
+    from ._cache import get_response_cache_policy, get_cached_credential
+    from ._deserializer import use_fast_deserializer
+    from ._transport import get_shared_transport
+    from ._retry import AdaptiveRetryPolicy
+    from ._rate_limit import get_rate_limiter, RateLimitPolicy
+    from ._coalesce import get_coalesce_window, SingleFlightPolicy
+
+    # all clients in the process share one connection pool, retry budget and circuit breakers
+    kwargs = {'transport': get_shared_transport(cli_ctx), 'retry_policy': AdaptiveRetryPolicy()}
+    if base_url:
+        kwargs['base_url'] = base_url
+    per_retry_policies = []
+    cache_policy = get_response_cache_policy(cli_ctx, no_cache)
+    if cache_policy:
+        per_retry_policies.append(cache_policy)
+    # after the cache so cached responses don't count against the limit
+    limiter = get_rate_limiter(cli_ctx)
+    if limiter:
+        per_retry_policies.append(RateLimitPolicy(limiter))
+    if per_retry_policies:
+        kwargs['per_retry_policies'] = per_retry_policies
+    # identical GETs made while validating, completing and running the command share one call
+    window = get_coalesce_window(cli_ctx)
+    if window > 0 and not no_cache:
+        kwargs['per_call_policies'] = [SingleFlightPolicy(window)]
+
+    credential, subscription_id, tenant_id = Profile(cli_ctx=cli_ctx).get_login_credentials()
+    credential = get_cached_credential(cli_ctx, credential, tenant_id)
+
+    client = get_mgmt_service_client(cli_ctx, TeamCloudClient, subscription_bound=False, base_url_bound=False,
+                                     credential=credential, subscription_id=subscription_id, **kwargs)
+    return use_fast_deserializer(client, compact=_compact_models(cli_ctx))
+
+
+class AsyncCredentialAdapter:
+    """Exposes a synchronous az cli credential as an AsyncTokenCredential
+    by acquiring tokens on the default executor"""
+
+    def __init__(self, credential):
+        self._credential = credential
+
+    async def get_token(self, *scopes, **kwargs):
+        import asyncio
+        from functools import partial
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(self._credential.get_token, *scopes, **kwargs))
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_details):
+        pass
+
+
+def _get_async_transport():
+    # prefer aiohttp when it's installed, otherwise fall back to requests on a thread pool
+    try:
+        import aiohttp  # noqa: F401 pylint: disable=unused-import
+        from azure.core.pipeline.transport import AioHttpTransport
+        return AioHttpTransport()
+    except ImportError:
+        from azure.core.pipeline.transport import AsyncioRequestsTransport
+        return AsyncioRequestsTransport()
+
+
+def teamcloud_async_client_factory(cli_ctx, base_url):
+    from azure.cli.core._profile import Profile
+    from azure.cli.core.auth.util import resource_to_scopes
+    from .vendored_sdks.teamcloud.aio import TeamCloudClient
+    from ._cache import get_cached_credential
+    from ._deserializer import use_fast_deserializer
+    from ._retry import AsyncAdaptiveRetryPolicy
+    from ._rate_limit import get_rate_limiter, AsyncRateLimitPolicy
+    from ._coalesce import get_coalesce_window, AsyncSingleFlightPolicy
+
+    credential, _, tenant_id = Profile(cli_ctx=cli_ctx).get_login_credentials()
+    credential = get_cached_credential(cli_ctx, credential, tenant_id)
+    scopes = resource_to_scopes(cli_ctx.cloud.endpoints.active_directory_resource_id)
+    limiter = get_rate_limiter(cli_ctx)
+    coalesce = get_coalesce_window(cli_ctx) > 0
+
+    return use_fast_deserializer(TeamCloudClient(
+        AsyncCredentialAdapter(credential), base_url=base_url, credential_scopes=scopes,
+        transport=_get_async_transport(), retry_policy=AsyncAdaptiveRetryPolicy(),
+        per_call_policies=[AsyncSingleFlightPolicy()] if coalesce else [],
+        per_retry_policies=[AsyncRateLimitPolicy(limiter)] if limiter else [],
+        **_async_client_kwargs(cli_ctx)), compact=_compact_models(cli_ctx))
+
+
+def _async_client_kwargs(cli_ctx):
+    """The user agent, headers, ssl verification and network logging az cli configures for the
+    clients get_mgmt_service_client creates, built from public settings"""
+    import os
+    from azure.cli.core.util import get_az_user_agent
+    from azure.cli.core.sdk.policies import SafeNetworkTraceLoggingPolicy
+
+    headers = dict(cli_ctx.data.get('headers') or {})
+    if cli_ctx.data.get('command'):
+        headers['CommandName'] = cli_ctx.data['command']
+    # redacts the Authorization header from --debug output
+    kwargs = {'user_agent': get_az_user_agent(), 'headers': headers, 'logging_policy': SafeNetworkTraceLoggingPolicy()}
+    if os.environ.get('AZURE_CLI_DISABLE_CONNECTION_VERIFICATION'):
+        kwargs['connection_verify'] = False
+    elif os.environ.get('REQUESTS_CA_BUNDLE'):
+        # requests reads it itself, aiohttp doesn't
+        kwargs['connection_verify'] = os.environ['REQUESTS_CA_BUNDLE']
+    return kwargs
 
 
 def storage_client_factory(cli_ctx, **_):
@@ -74,6 +181,8 @@ def deployment_client_factory(cli_ctx, plug_pipeline=True):
     if not plug_pipeline:
         return deployment_client
 
+    from ._deployment_pipeline import JSONSerializer, JsonCTemplatePolicy
+
     deployment_client._serialize = JSONSerializer(
         deployment_client._serialize.dependencies
     )
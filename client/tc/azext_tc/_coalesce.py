@@ -0,0 +1,167 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import abc
+import asyncio
+import threading
+from time import monotonic
+
+from knack.log import get_logger
+from azure.core.pipeline.policies import HTTPPolicy, AsyncHTTPPolicy
+
+logger = get_logger(__name__)
+
+# seconds a completed GET is shared with identical requests, `az config set tc.coalesce_window=0` to disable
+DEFAULT_COALESCE_WINDOW = 2
+
+# response context key holding the models deserialized from a shared response, see FastDeserializer
+SHARED_RESULTS = 'tc_shared_results'
+
+# headers that differ between otherwise identical requests
+_IGNORED_HEADERS = ['x-ms-client-request-id', 'x-ms-request-id']
+
+
+def _request_key(request):
+    http_request = request.http_request
+    if http_request.method != 'GET':
+        return None
+    headers = tuple(sorted((k.lower(), v) for k, v in http_request.headers.items()
+                           if k.lower() not in _IGNORED_HEADERS))
+    return http_request.url, headers
+
+
+class _Flight:  # pylint: disable=too-few-public-methods
+
+    def __init__(self, done):
+        self.done = done
+        self.response = None
+        self.error = None
+        self.finished = None
+
+
+class _SingleFlight(abc.ABC):
+    """GETs with the same url and headers that overlap, or follow a successful one within
+    window seconds, get its response. Other methods always go out, and forget completed
+    GETs since the write may have changed what they returned."""
+
+    def __init__(self, window):
+        self.window = window
+        self.flights = {}
+        self.shared = 0
+        self._lock = threading.Lock()
+
+    def _join(self, key):
+        # returns (flight, True) for the caller that should send the request
+        with self._lock:
+            flight = self.flights.get(key)
+            if flight is not None and flight.finished is not None and monotonic() - flight.finished > self.window:
+                flight = None
+            if flight is None:
+                flight = self.flights[key] = self._new_flight()
+                return flight, True
+            self.shared += 1
+            return flight, False
+
+    def _forget_completed(self):
+        with self._lock:
+            for key in [k for k, f in self.flights.items() if f.finished is not None]:
+                del self.flights[key]
+
+    def _finish(self, key, flight, response, error):
+        flight.response, flight.error = response, error
+        with self._lock:
+            flight.finished = monotonic()
+            # only successful responses are shared after the call returns
+            if error is not None or response.http_response.status_code >= 400:
+                self.flights.pop(key, None)
+        if response is not None:
+            response.context[SHARED_RESULTS] = {}
+
+    @staticmethod
+    def _result(flight):
+        if flight.error is not None:
+            raise flight.error
+        return flight.response
+
+    @abc.abstractmethod
+    def _new_flight(self):
+        """Returns a _Flight whose done event the policy's callers can wait on"""
+
+
+class SingleFlightPolicy(_SingleFlight, HTTPPolicy):
+    """Per call policy coalescing identical GETs made by one client, from any thread"""
+
+    def __init__(self, window=DEFAULT_COALESCE_WINDOW):
+        _SingleFlight.__init__(self, window)
+        HTTPPolicy.__init__(self)
+
+    def _new_flight(self):
+        return _Flight(threading.Event())
+
+    def send(self, request):
+        if request.context.options.get('stream'):
+            # a streamed body can only be read once
+            return self.next.send(request)
+        key = _request_key(request)
+        if key is None:
+            self._forget_completed()
+            return self.next.send(request)
+
+        flight, leader = self._join(key)
+        if not leader:
+            logger.debug('Sharing the response of an identical request to %s', key[0])
+            flight.done.wait()
+            return self._result(flight)
+        response = error = None
+        try:
+            response = self.next.send(request)
+            return response
+        except BaseException as ex:
+            error = ex
+            raise
+        finally:
+            self._finish(key, flight, response, error)
+            flight.done.set()
+
+
+class AsyncSingleFlightPolicy(_SingleFlight, AsyncHTTPPolicy):
+    """Per call policy coalescing identical GETs made by one async client. By default only
+    overlapping ones, as the async clients poll status and tasks by repeating GETs."""
+
+    def __init__(self, window=0):
+        _SingleFlight.__init__(self, window)
+        AsyncHTTPPolicy.__init__(self)
+
+    def _new_flight(self):
+        return _Flight(asyncio.Event())
+
+    async def send(self, request):
+        if request.context.options.get('stream'):
+            # a streamed body can only be read once
+            return await self.next.send(request)
+        key = _request_key(request)
+        if key is None:
+            self._forget_completed()
+            return await self.next.send(request)
+
+        flight, leader = self._join(key)
+        if not leader:
+            logger.debug('Sharing the response of an identical request to %s', key[0])
+            await flight.done.wait()
+            return self._result(flight)
+        response = error = None
+        try:
+            response = await self.next.send(request)
+            return response
+        except BaseException as ex:
+            error = ex
+            raise
+        finally:
+            self._finish(key, flight, response, error)
+            flight.done.set()
+
+
+def get_coalesce_window(cli_ctx):
+    return cli_ctx.config.getfloat('tc', 'coalesce_window', fallback=DEFAULT_COALESCE_WINDOW)
@@ -0,0 +1,161 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+from knack.log import get_logger
+from msrest import Deserializer
+
+from ._deserializer import _Unsupported, _attribute_order, _get_compiler, _is_supported
+
+logger = get_logger(__name__)
+
+# scalar attributes are stored as decoded, everything else (timestamps, nested models,
+# lists and dicts) is kept as json and converted the first time it's read
+_EAGER_TYPES = ['str', 'int', 'bool', 'float']
+
+# model class -> compact subclass, or None if the model isn't supported
+_compact = {}
+
+
+class CompactRecord:
+    """Mixin for the compact subclasses of sdk models. Instances keep their attributes in
+    __slots__ instead of a per-instance __dict__, so a list of 20k audit entries or tasks
+    takes a fraction of the memory. They are still instances of the model, serialize the
+    same way and produce the same az cli output through _asdict."""
+
+    __slots__ = ()
+
+    def _asdict(self):
+        # what az cli's todict builds from a model's __dict__, with additional properties flattened
+        result = {key: getattr(self, attr) for attr, key in self._output_keys}
+        result.update(self.additional_properties)
+        return result
+
+    def __eq__(self, other):
+        if not isinstance(other, self._model):
+            return False
+        return all(getattr(self, a) == getattr(other, a) for a in self._model._attribute_map) \
+            and self.additional_properties == other.additional_properties
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __str__(self):
+        return str(self._asdict())
+
+    def __reduce_ex__(self, protocol):
+        # pickles and copies as the regular model
+        return _new_model, (self._model,), self.to_model().__dict__
+
+    @property
+    def additional_properties(self):
+        if self._additional is None:
+            self._additional = {}
+        return self._additional
+
+    @additional_properties.setter
+    def additional_properties(self, value):
+        self._additional = value
+
+    def to_model(self):
+        """Returns a regular sdk model with the same values"""
+        model = self._model.__new__(self._model)
+        model.additional_properties = dict(self.additional_properties)
+        for attr, _ in self._output_keys:
+            setattr(model, attr, getattr(self, attr))
+        return model
+
+
+def _new_model(model):
+    return model.__new__(model)
+
+
+def _lazy_property(attr, bit, convert):
+    slot = f'_{attr}_json'
+
+    def _get(self):
+        value = getattr(self, slot)
+        if not self._materialized & bit:
+            if value is not None:
+                value = convert(value)
+            setattr(self, slot, value)
+            self._materialized |= bit
+        return value
+
+    def _set(self, value):
+        setattr(self, slot, value)
+        self._materialized |= bit
+
+    return slot, property(_get, _set)
+
+
+def _lazy_converter(compiler, data_type, msrest):
+    """Converts json to data_type with the generated functions, falling back to msrest"""
+    name = compiler.converter(data_type)
+
+    def _convert(value):
+        try:
+            return compiler.namespace[name](value)
+        except (_Unsupported, ValueError, TypeError, AttributeError, KeyError):
+            return msrest.deserialize_data(value, data_type)
+    return _convert
+
+
+def _build(model, compiler):
+    from azure.cli.core.util import to_camel_case
+
+    if not _is_supported(model):
+        return None
+
+    order = _attribute_order(model)
+    msrest = Deserializer(compiler.dependencies)
+    namespace = {'__slots__': ('_materialized', '_additional'), '__module__': model.__module__,
+                 '__doc__': model.__doc__, '_model': model,
+                 '_output_keys': tuple((a, to_camel_case(a)) for a in order)}
+
+    slots, lines, lazy = [], [], 0
+    for attr in order:
+        attr_map = model._attribute_map[attr]
+        lines.append(f"    value = data.get({attr_map['key']!r})")
+        if attr_map['type'] in _EAGER_TYPES:
+            slots.append(attr)
+            lines.append(f"    if value is not None and value.__class__ is not {attr_map['type']}:")
+            lines.append('        raise _Unsupported(value)')
+            lines.append(f'    obj.{attr} = value')
+        else:
+            slot, namespace[attr] = _lazy_property(attr, 1 << lazy, _lazy_converter(compiler, attr_map['type'], msrest))
+            lazy += 1
+            slots.append(slot)
+            lines.append(f'    obj.{slot} = value')
+    namespace['__slots__'] += tuple(slots)
+
+    cls = type(model.__name__, (CompactRecord, model), namespace)
+
+    source = '\n'.join([
+        'def from_dict(data):',
+        '    if data.__class__ is not dict:',
+        '        raise _Unsupported(data)',
+        '    obj = _new(_cls)',
+        '    obj._materialized = 0',
+        '    extra = data.keys() - _known',
+        '    obj._additional = {k: data[k] for k in extra} if extra else None'] + lines + ['    return obj'])
+    scope = {'_Unsupported': _Unsupported, '_new': object.__new__, '_cls': cls,
+             '_known': frozenset(d['key'] for d in model._attribute_map.values())}
+    exec(source, scope)  # pylint: disable=exec-used
+    cls.from_json = staticmethod(scope['from_dict'])
+    return cls
+
+
+def get_compact_model(model, dependencies):
+    """Returns the compact subclass of the model, generated from its _attribute_map,
+    or None if the model isn't supported"""
+    if model not in _compact:
+        try:
+            _compact[model] = _build(model, _get_compiler(dependencies))
+        except (_Unsupported, TypeError) as ex:
+            logger.debug('No compact model for %s: %s', model.__name__, ex)
+            _compact[model] = None
+    return _compact[model]
@@ -10,14 +10,9 @@ from ._client_factory import teamcloud_client_factory
 logger = get_logger(__name__)
 
 
-def _ensure_base_url(client, base_url):
-    client._client._base_url = base_url  # pylint: disable=protected-access
-
-
 @Completer
 def get_org_completion_list(cmd, prefix, namespace, **kwargs):  # pylint: disable=unused-argument
-    client = teamcloud_client_factory(cmd.cli_ctx)
-    _ensure_base_url(client, namespace.base_url)
+    client = teamcloud_client_factory(cmd.cli_ctx, {'base_url': namespace.base_url})
 
     result = client.get_organizations()
 
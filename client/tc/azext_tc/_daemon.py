@@ -0,0 +1,210 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import io
+import os
+import sys
+import socket
+import logging
+import argparse
+import socketserver
+from time import time
+
+from ._daemon_client import send_frame, read_frames, get_config_dir
+
+DEFAULT_IDLE_TIMEOUT = 3600
+
+
+class _StreamProxy:
+    """Stands in for sys.stdout/sys.stderr for the lifetime of the daemon, writing to
+    the connection of the request being served. Log handlers and the cli capture this
+    object once, so output always follows the current request."""
+
+    def __init__(self, fd, fallback):
+        self.fd = fd
+        self.fallback = fallback
+        self.connection = None
+
+    def write(self, data):
+        if self.connection is None:
+            return self.fallback.write(data)
+        if data:
+            try:
+                send_frame(self.connection, {'fd': self.fd, 'data': data})
+            except OSError:
+                pass
+        return len(data)
+
+    def flush(self):
+        if self.connection is None:
+            self.fallback.flush()
+
+    def isatty(self):
+        return False
+
+    @property
+    def encoding(self):
+        return 'utf-8'
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        try:
+            self._handle()
+        except OSError as ex:  # the client went away
+            logging.getLogger(__name__).debug('tc daemon client disconnected: %s', ex)
+
+    def _handle(self):
+        server = self.server
+        server.last_request = time()
+
+        frame = next(read_frames(self.request), None)
+        if frame is None:
+            return
+
+        if frame.get('command') == 'ping':
+            send_frame(self.request, {'pid': os.getpid(), 'started': server.started, 'requests': server.requests})
+            return
+        if frame.get('command') == 'shutdown':
+            send_frame(self.request, {'pid': os.getpid()})
+            server.stopping = True
+            return
+
+        argv = frame.get('argv') or []
+        error = 'the tc daemon only runs tc commands' if argv[:1] != ['tc'] else \
+            'run az tc daemon commands directly, not through the daemon' if argv[1:2] == ['daemon'] else None
+        if not error and not _same_path(frame.get('configDir') or get_config_dir(), server.cli.config.config_dir):
+            error = f'the tc daemon serves AZURE_CONFIG_DIR {server.cli.config.config_dir}, run az tc directly'
+        if error:
+            send_frame(self.request, {'fd': 2, 'data': f'ERROR: {error}\n'})
+            send_frame(self.request, {'exit': 2})
+            return
+
+        server.requests += 1
+        send_frame(self.request, {'exit': server.invoke(argv, frame.get('cwd'), self.request, env=frame.get('env'))})
+
+
+def _same_path(path, other):
+    return os.path.normcase(os.path.realpath(path)) == os.path.normcase(os.path.realpath(other))
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """Serves az tc commands one at a time from a single warm az cli instance"""
+
+    def __init__(self, path, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        from azure.cli.core import get_default_cli
+
+        self.stdout = sys.stdout = _StreamProxy(1, sys.stdout)
+        self.stderr = sys.stderr = _StreamProxy(2, sys.stderr)
+        # commands can't prompt the client, an empty stdin that isn't a tty makes them fail instead of
+        # waiting on the terminal the daemon may have been started from
+        sys.stdin = io.StringIO()
+        self.cli = get_default_cli()
+        # the login and AZURE_* variables the cached clients were created with
+        self.client_key = None
+
+        self.started = time()
+        self.last_request = self.started
+        self.requests = 0
+        self.stopping = False
+        self.idle_timeout = idle_timeout
+        self.timeout = 10
+
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o600)
+
+    def _reset_logging(self):
+        # knack configures logging once per process, remove its handlers so invoke
+        # configures them again with the --debug/--verbose flags of each request
+        from knack.log import cli_logger_names
+        for logger in [logging.getLogger()] + [logging.getLogger(n) for n in cli_logger_names]:
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+                handler.close()
+        self.cli.only_show_errors = self.cli.config.getboolean('core', 'only_show_errors', fallback=False)
+
+    def _login(self):
+        from azure.cli.core._profile import Profile
+        try:
+            account = Profile(cli_ctx=self.cli).get_subscription()
+        except Exception:  # pylint: disable=broad-except
+            return None  # not logged in
+        return account.get('tenantId'), account.get('id'), (account.get('user') or {}).get('name')
+
+    def _reuse_clients(self, env):
+        # clients hold the credential of a login and settings read when they were created,
+        # keep them while neither changes
+        key = (self._login(), sorted(env.items()))
+        if key != self.client_key:
+            self.cli.data.pop('tc_clients', None)
+            self.client_key = key
+            return
+
+        # a kept client shares completed GETs for a while, they may be stale in the next command
+        from ._coalesce import SingleFlightPolicy
+        for client in (self.cli.data.get('tc_clients') or {}).values():
+            pipeline = getattr(getattr(client, '_client', None), '_pipeline', None)
+            for policy in getattr(pipeline, '_impl_policies', []):
+                if isinstance(policy, SingleFlightPolicy):
+                    policy._forget_completed()  # pylint: disable=protected-access
+
+    def invoke(self, argv, cwd, connection, env=None):
+        env = {k: v for k, v in (env or {}).items() if k.startswith('AZURE_')}
+        previous = {k: v for k, v in os.environ.items() if k.startswith('AZURE_')}
+        self.stdout.connection = self.stderr.connection = connection
+        try:
+            if cwd:
+                os.chdir(cwd)
+            # run with the client's AZURE_* variables instead of the daemon's
+            for key in previous:
+                del os.environ[key]
+            os.environ.update(env)
+            self._reset_logging()
+            self._reuse_clients(env)
+            try:
+                exit_code = self.cli.invoke(argv, out_file=self.stdout)
+            except SystemExit as ex:
+                exit_code = ex.code
+            return exit_code if isinstance(exit_code, int) else int(bool(exit_code))
+        finally:
+            self.stdout.connection = self.stderr.connection = None
+            for key in [k for k in os.environ if k.startswith('AZURE_')]:
+                del os.environ[key]
+            os.environ.update(previous)
+
+    def handle_timeout(self):
+        if self.idle_timeout and time() - self.last_request > self.idle_timeout:
+            self.stopping = True
+
+    def serve(self):
+        try:
+            while not self.stopping:
+                self.handle_request()
+        finally:
+            self.server_close()
+            try:
+                os.remove(self.server_address)
+            except OSError:
+                pass
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m azext_tc._daemon')
+    parser.add_argument('--socket', required=True)
+    parser.add_argument('--idle-timeout', type=int, default=DEFAULT_IDLE_TIMEOUT)
+    args = parser.parse_args(args)
+
+    if not hasattr(socket, 'AF_UNIX'):
+        sys.exit('The tc daemon requires Unix domain sockets')
+
+    DaemonServer(args.socket, idle_timeout=args.idle_timeout).serve()
+
+
+if __name__ == '__main__':
+    main()
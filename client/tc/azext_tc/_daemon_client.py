@@ -0,0 +1,81 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+# Thin client for the tc daemon. Run it by path, i.e. `python _daemon_client.py org list`, so only
+# the standard library is imported. Falls back to `az tc ...` when the daemon isn't running.
+
+import os
+import sys
+import json
+import socket
+
+# frames are newline-delimited json objects
+ENCODING = 'utf-8'
+
+
+def get_config_dir():
+    return os.environ.get('AZURE_CONFIG_DIR') or os.path.join(os.path.expanduser('~'), '.azure')
+
+
+def get_socket_path():
+    return os.environ.get('TC_DAEMON_SOCKET') or os.path.join(get_config_dir(), 'tc', 'daemon', 'daemon.sock')
+
+
+def send_frame(sock, frame):
+    sock.sendall((json.dumps(frame) + '\n').encode(ENCODING))
+
+
+def read_frames(sock):
+    buffer = b''
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return
+        buffer += chunk
+        while b'\n' in buffer:
+            line, buffer = buffer.split(b'\n', 1)
+            yield json.loads(line.decode(ENCODING))
+
+
+def connect(path=None, timeout=None):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path or get_socket_path())
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def request(frame, path=None, timeout=None):
+    """Sends a control frame (ping or shutdown) and returns the response frame"""
+    with connect(path, timeout) as sock:
+        send_frame(sock, frame)
+        return next(read_frames(sock), None)
+
+
+def run(argv, path=None):
+    """Runs `az tc <argv>` in the daemon, streaming its output. Returns the exit code."""
+    try:
+        sock = connect(path)
+    except OSError:
+        os.execvp('az', ['az', 'tc'] + argv)
+
+    with sock:
+        # az reads settings like core.output from AZURE_* variables, the daemon applies them to the command
+        env = {k: v for k, v in os.environ.items() if k.startswith('AZURE_')}
+        send_frame(sock, {'argv': ['tc'] + argv, 'cwd': os.getcwd(), 'env': env, 'configDir': get_config_dir()})
+        for frame in read_frames(sock):
+            if 'exit' in frame:
+                return frame['exit']
+            stream = sys.stderr if frame.get('fd') == 2 else sys.stdout
+            stream.write(frame.get('data', ''))
+            stream.flush()
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(run(sys.argv[1:]))
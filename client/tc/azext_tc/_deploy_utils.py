@@ -18,6 +18,7 @@ from azure.cli.core.util import (can_launch_browser, open_page_in_browser, in_cl
 
 
 from ._client_factory import (deployment_client_factory, resource_client_factory)
+from ._retry import decorrelated_jitter, retry_get
 
 
 ERR_TMPL_INDEX = 'Unable to get provider index.\n'
@@ -39,7 +40,7 @@ def get_github_release(repo, org='microsoft', version=None, prerelease=False):
     url = f'https://api.github.com/repos/{org}/{repo}/releases'
 
     if prerelease:
-        version_res = requests.get(url, verify=not should_disable_connection_verify())
+        version_res = retry_get(url, verify=not should_disable_connection_verify())
         version_json = version_res.json()
 
         version_prerelease = next((v for v in version_json if v['prerelease']), None)
@@ -50,7 +51,7 @@ def get_github_release(repo, org='microsoft', version=None, prerelease=False):
 
     url += (f'/tags/{version}' if version else '/latest')
 
-    version_res = requests.get(url, verify=not should_disable_connection_verify())
+    version_res = retry_get(url, verify=not should_disable_connection_verify())
 
     if version_res.status_code == 404:
         raise CLIError(
@@ -68,14 +69,15 @@ def get_github_latest_release_version(repo, org='microsoft', prerelease=False):
 
 def github_release_version_exists(version, repo, org='microsoft'):
     version_url = f'https://api.github.com/repos/{org}/{repo}/releases/tags/{version}'
-    version_res = requests.get(version_url, verify=not should_disable_connection_verify())
+    version_res = retry_get(version_url, verify=not should_disable_connection_verify())
     return version_res.status_code < 400
 
 
 def get_index(index_url):
+    delay = 0
     for try_number in range(TRIES):
         try:
-            response = requests.get(index_url, verify=(not should_disable_connection_verify()))
+            response = retry_get(index_url, verify=(not should_disable_connection_verify()))
             if response.status_code == 200:
                 return response.json()
             msg = ERR_TMPL_NON_200.format(response.status_code, index_url)
@@ -89,7 +91,8 @@ def get_index(index_url):
                 msg = ERR_TMPL_BAD_JSON.format(str(err))
                 raise CLIError(msg) from err
             import time
-            time.sleep(0.5)
+            delay = decorrelated_jitter(delay, base=0.5)
+            time.sleep(delay)
             continue
 
 
@@ -182,6 +185,7 @@ def deploy_arm_template_at_resource_group(cmd, resource_group_name=None, templat
 
     deployment_client = deployment_client_factory(cmd.cli_ctx, plug_pipeline=(template_uri is None))
 
+    delay = 0
     for try_number in range(TRIES):
         try:
             deployment_name = random_string(length=14, force_lower=True) + str(try_number)
@@ -208,7 +212,8 @@ def deploy_arm_template_at_resource_group(cmd, resource_group_name=None, templat
             except:
                 raise err from err
             import time
-            time.sleep(5)
+            delay = decorrelated_jitter(delay, base=5)
+            time.sleep(delay)
             continue
 
 
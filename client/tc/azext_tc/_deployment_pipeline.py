@@ -0,0 +1,45 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+from msrest.serialization import Serializer
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+
+
+class JsonCTemplate:  # pylint: disable=too-few-public-methods
+    def __init__(self, template_as_bytes):
+        self.template_as_bytes = template_as_bytes
+
+
+class JSONSerializer(Serializer):
+    def body(self, data, data_type, **kwargs):
+        if data_type in ('Deployment', 'ScopedDeployment', 'DeploymentWhatIf', 'ScopedDeploymentWhatIf'):
+            # Be sure to pass a DeploymentProperties
+            template = data.properties.template
+            if template:
+                data_as_dict = data.serialize()
+                data_as_dict["properties"]["template"] = JsonCTemplate(template)
+
+                return data_as_dict
+        return super().body(data, data_type, **kwargs)
+
+
+class JsonCTemplatePolicy(SansIOHTTPPolicy):
+
+    def on_request(self, request):
+        http_request = request.http_request
+        if (getattr(http_request, 'data', {}) or {}).get('properties', {}).get('template'):
+            template = http_request.data["properties"]["template"]
+            if not isinstance(template, JsonCTemplate):
+                raise ValueError()
+
+            del http_request.data["properties"]["template"]
+            # templateLink nad template cannot exist at the same time in deployment_dry_run mode
+            if "templateLink" in http_request.data["properties"].keys():
+                del http_request.data["properties"]["templateLink"]
+            partial_request = json.dumps(http_request.data)
+
+            http_request.data = partial_request[:-2] + ", template:" + template.template_as_bytes + r"}}"
+            http_request.data = http_request.data.encode('utf-8')
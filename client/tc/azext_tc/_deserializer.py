@@ -0,0 +1,303 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import re
+import copy
+import threading
+from datetime import datetime
+from itertools import count
+
+from knack.log import get_logger
+from msrest import Deserializer
+from msrest.serialization import Model
+
+from ._coalesce import SHARED_RESULTS
+
+logger = get_logger(__name__)
+
+# the canonical form the api returns, anything else goes through msrest (and isodate)
+_ISO_8601 = re.compile(r'(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)?$')
+
+# scalar msrest types that need no conversion when the json value already has the right type
+_SCALAR_TYPES = {'str': str, 'int': int, 'bool': bool, 'float': float}
+
+# model class -> generated from_dict function, or None if the model isn't supported
+_compiled = {}
+_compiler = None
+_lock = threading.Lock()
+
+# the sdk's model classes by name and the (de)serializers every client shares, built once per process
+_client_models = None
+_serializer = None
+_deserializers = {}
+
+
+class _Unsupported(Exception):
+    """Raised by generated functions for data they don't handle, falls back to msrest"""
+
+
+def _parse_iso(value):
+    match = _ISO_8601.match(value) if value.__class__ is str else None
+    if not match:
+        raise _Unsupported(value)
+    base, fraction, offset = match.groups()
+    # msrest truncates to microseconds, fromisoformat only accepts 3 or 6 digits before python 3.11
+    fraction = f'.{(fraction + "000000")[:6]}' if fraction else ''
+    offset = '+00:00' if offset == 'Z' else offset or ''
+    return datetime.fromisoformat(base + fraction + offset)
+
+
+def _list(value, item):
+    if value.__class__ is not list:
+        raise _Unsupported(value)
+    return [None if i is None else item(i) for i in value]
+
+
+def _dict(value, item):
+    if value.__class__ is not dict:
+        raise _Unsupported(value)
+    return {k: None if i is None else item(i) for k, i in value.items()}
+
+
+def _scalar(cls):
+    def _check(value):
+        if value.__class__ is not cls:
+            raise _Unsupported(value)
+        return value
+    return _check
+
+
+def _is_supported(model):
+    if getattr(model, '_subtype_map', None):
+        return False
+    if any(v.get('constant') for v in getattr(model, '_validation', {}).values()):
+        return False
+    # flattened (a.b) and catch-all ('') keys need msrest's key extractors
+    return all(d['key'] and '.' not in d['key'] for d in model._attribute_map.values())
+
+
+def _attribute_order(model):
+    """Attributes in the order the generated __init__ assigns them, so instances (and their
+    __dict__, which az cli output is built from) match the ones msrest creates"""
+    import inspect
+    required = {name: None for name, p in inspect.signature(model.__init__).parameters.items()
+                if p.kind == p.KEYWORD_ONLY and p.default is p.empty}
+    template = model.__new__(model)
+    model.__init__(template, **required)
+    order = [a for a in template.__dict__ if a in model._attribute_map]
+    return order + [a for a in model._attribute_map if a not in order]
+
+
+class _Compiler:
+    """Generates from_dict functions into a shared namespace. Functions generated by one call are
+    executed and registered together once all of them compiled, so a model that turns out to be
+    unsupported never leaves behind names (or functions referring to names) that don't exist."""
+
+    def __init__(self, dependencies):
+        self.dependencies = dependencies
+        self.namespace = {'_Unsupported': _Unsupported, '_new': object.__new__, '_parse_iso': _parse_iso,
+                          '_list': _list, '_dict': _dict, '_object': Deserializer().deserialize_object}
+        self.names = {}
+        self._ids = count()
+        self._lock = threading.Lock()
+        self._pending = None  # names and sources of the functions the current call generates
+
+    def _run(self, build, arg):
+        with self._lock:
+            names, sources = self._pending = {}, []
+            try:
+                result = build(arg)
+                exec('\n\n'.join(sources), self.namespace)  # pylint: disable=exec-used
+            finally:
+                self._pending = None
+            self.names.update(names)
+            return result
+
+    def converter(self, data_type):
+        """Returns the name of a callable in the namespace converting a (non-null) json value to data_type"""
+        return self._run(self._converter, data_type)
+
+    def compile(self, model):
+        """Returns the generated from_dict function of the model, or None if the model isn't supported"""
+        try:
+            return self.namespace[self._run(self._compile, model)]
+        except (_Unsupported, TypeError, SyntaxError) as ex:
+            logger.debug('Using msrest to deserialize %s: %s', model.__name__, ex)
+            return None
+
+    def _converter(self, data_type):
+        if data_type in _SCALAR_TYPES:
+            name = f'_{data_type}'
+            self.namespace.setdefault(name, _scalar(_SCALAR_TYPES[data_type]))
+            return name
+        if data_type == 'iso-8601':
+            return '_parse_iso'
+        if data_type == 'object':
+            return '_object'
+        if data_type[:1] + data_type[-1:] in ['[]', '{}']:
+            item = self._converter(data_type[1:-1])
+            container = '_list' if data_type[0] == '[' else '_dict'
+            name = f'{container}_{next(self._ids)}'
+            self._pending[1].append(f'def {name}(value):\n    return {container}(value, {item})')
+            return name
+        model = self.dependencies.get(data_type)
+        if isinstance(model, type) and issubclass(model, Model):
+            return self._compile(model)
+        raise _Unsupported(data_type)
+
+    def _compile(self, model):
+        names, sources = self._pending
+        name = self.names.get(model) or names.get(model)
+        if name:
+            return name
+        if not _is_supported(model):
+            raise _Unsupported(model.__name__)
+
+        # registered before the attributes are converted, models may refer to themselves
+        name = names[model] = f'_from_dict_{model.__name__}'
+        self.namespace[f'_cls_{model.__name__}'] = model
+        self.namespace[f'_known_{model.__name__}'] = frozenset(d['key'] for d in model._attribute_map.values())
+
+        lines = [f'def {name}(data):',
+                 '    if data.__class__ is not dict:',
+                 '        raise _Unsupported(data)',
+                 f'    obj = _new(_cls_{model.__name__})',
+                 f'    extra = data.keys() - _known_{model.__name__}',
+                 '    obj.additional_properties = {k: data[k] for k in extra} if extra else {}']
+
+        for attr in _attribute_order(model):
+            data_type = model._attribute_map[attr]['type']
+            lines.append(f"    value = data.get({model._attribute_map[attr]['key']!r})")
+            if data_type in ['str', 'int', 'bool', 'float']:
+                # inlined, by far the most common case
+                lines.append(f'    if value is not None and value.__class__ is not {data_type}:')
+                lines.append('        raise _Unsupported(value)')
+                lines.append(f'    obj.{attr} = value')
+            else:
+                lines.append(f'    obj.{attr} = None if value is None else {self._converter(data_type)}(value)')
+
+        lines.append('    return obj')
+        sources.append('\n'.join(lines))
+        return name
+
+
+def _get_compiler(dependencies):
+    global _compiler  # pylint: disable=global-statement
+    with _lock:
+        if _compiler is None:
+            _compiler = _Compiler(dependencies)
+        return _compiler
+
+
+def get_from_dict(model, dependencies):
+    """Returns a function that builds the model from a json dict the same way msrest's
+    Deserializer does, generated from the model's _attribute_map, or None if unsupported"""
+    if model not in _compiled:
+        from_dict = _get_compiler(dependencies).compile(model)
+        with _lock:
+            _compiled.setdefault(model, from_dict)
+    return _compiled[model]
+
+
+class FastDeserializer(Deserializer):
+    """msrest Deserializer using generated from_dict functions for the json the api
+    returns, and falling back to the reflective msrest implementation for anything else.
+    With compact=True the items of *ListDataResults are compact (__slots__) models."""
+
+    def __init__(self, classes=None, compact=False):
+        super().__init__(classes)
+        self.compact = compact
+
+    def __call__(self, target_obj, response_data, content_type=None):
+        # a response SingleFlightPolicy shares between identical requests is deserialized once
+        context = getattr(response_data, 'context', None)
+        shared = context.get(SHARED_RESULTS) if context is not None else None
+        if shared is None or not isinstance(target_obj, str):
+            return super().__call__(target_obj, response_data, content_type)
+        if target_obj not in shared:
+            # callers woken together may race here, they all copy the first result stored
+            shared.setdefault(target_obj, super().__call__(target_obj, response_data, content_type))
+        # every caller gets its own models, commands change the ones they get
+        return copy.deepcopy(shared[target_obj])
+
+    def _deserialize(self, target_obj, data):
+        if data.__class__ is dict:
+            model = self.dependencies.get(target_obj) if isinstance(target_obj, str) else target_obj
+            if isinstance(model, type) and issubclass(model, Model):
+                try:
+                    from_dict = get_from_dict(model, self.dependencies)
+                    if from_dict and self.compact and model.__name__.endswith('ListDataResult'):
+                        return self._compact_list(model, data, from_dict)
+                    if from_dict:
+                        return from_dict(data)
+                except (_Unsupported, ValueError, TypeError, AttributeError, KeyError) as ex:
+                    logger.debug('Falling back to msrest to deserialize %s: %r', model.__name__, ex)
+        return super()._deserialize(target_obj, data)
+
+    def _compact_list(self, model, data, from_dict):
+        from ._compact_models import get_compact_model
+
+        items = data.get('data')
+        item_type = model._attribute_map.get('data', {}).get('type', '')  # pylint: disable=protected-access
+        item_model = self.dependencies.get(item_type[1:-1]) if item_type.startswith('[') else None
+        compact = get_compact_model(item_model, self.dependencies) \
+            if items.__class__ is list and isinstance(item_model, type) and issubclass(item_model, Model) else None
+        if compact is None:
+            return from_dict(data)
+
+        result = from_dict({k: v for k, v in data.items() if k != 'data'})
+        result.data = [None if i is None else compact.from_json(i) for i in items]
+        return result
+
+
+class JsonDeserializer(Deserializer):
+    """Returns the json body the pipeline already decoded instead of building models"""
+
+    def __call__(self, target_obj, response_data, content_type=None):
+        return self._unpack_content(response_data, content_type)
+
+
+def raw_client(client):
+    """Returns a copy of the client sharing its pipeline (and so its token and http session)
+    whose operations return the decoded json body as plain dicts and lists"""
+    raw = copy.copy(client)
+    raw._deserialize = JsonDeserializer(client._deserialize.dependencies)  # pylint: disable=protected-access
+    return raw
+
+
+def get_client_models():
+    """Returns a read-only mapping of the sdk's model classes by name, the registry
+    the generated client otherwise rebuilds from models.__dict__ for every instance"""
+    global _client_models  # pylint: disable=global-statement
+    if _client_models is None:
+        from types import MappingProxyType
+        from .vendored_sdks.teamcloud import models
+        _client_models = MappingProxyType({k: v for k, v in models.__dict__.items() if isinstance(v, type)})
+    return _client_models
+
+
+def get_serializer():
+    """Returns the Serializer shared by all clients, configured like the generated client's"""
+    global _serializer  # pylint: disable=global-statement
+    if _serializer is None:
+        from msrest import Serializer
+        _serializer = Serializer(get_client_models())
+        _serializer.client_side_validation = False
+    return _serializer
+
+
+def get_deserializer(compact=False):
+    """Returns the FastDeserializer shared by all clients"""
+    if compact not in _deserializers:
+        _deserializers[compact] = FastDeserializer(get_client_models(), compact=compact)
+    return _deserializers[compact]
+
+
+def use_fast_deserializer(client, compact=False):
+    """Swaps the generated client's Serializer and Deserializer for the shared
+    Serializer and FastDeserializer, which hold the same models"""
+    client._serialize = get_serializer()  # pylint: disable=protected-access
+    client._deserialize = get_deserializer(compact)  # pylint: disable=protected-access
+    return client
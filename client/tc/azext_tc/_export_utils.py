@@ -0,0 +1,74 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import asyncio
+from collections import Counter
+
+from knack.log import get_logger
+
+from ._async_utils import DEFAULT_MAX_CONCURRENCY
+
+logger = get_logger(__name__)
+
+
+class NdjsonWriter:
+    """Writes typed records to a stream as newline-delimited json, one object per line"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.counts = Counter()
+
+    def write(self, kind, data, **parents):
+        if hasattr(data, 'serialize'):
+            data = data.serialize(keep_readonly=True)
+        record = {'type': kind}
+        record.update(parents)
+        record['data'] = data
+        self.stream.write(json.dumps(record, default=str) + '\n')
+        self.counts[kind] += 1
+
+
+async def export_org(client, org, writer, max_concurrency=None):
+    """Walks the org graph with an async client writing every object to writer
+    as soon as its page arrives, so only one page per resource is held in memory"""
+    semaphore = asyncio.Semaphore(max_concurrency or DEFAULT_MAX_CONCURRENCY)
+
+    async def emit(kind, func, *args, project=None):
+        async with semaphore:
+            result = await func(*args)
+
+        data = getattr(result, 'data', None)
+        if data is None:
+            logger.warning('Failed to export %s: %s', kind, getattr(result, 'status', result))
+            return []
+
+        items = data if isinstance(data, list) else [data]
+        for item in items:
+            writer.write(kind, item, org=org, project=project)
+        return items if isinstance(data, list) else []
+
+    async def export_component(project, component):
+        await emit('componentTask', client.get_component_tasks, org, project.id, component.id, project=project.id)
+
+    async def export_project(project):
+        components, *_ = await asyncio.gather(
+            emit('component', client.get_components, org, project.id, project=project.id),
+            emit('componentTemplate', client.get_component_templates, org, project.id, project=project.id),
+            emit('projectUser', client.get_project_users, org, project.id, project=project.id),
+            emit('projectIdentity', client.get_project_identities, org, project.id, project=project.id),
+            emit('projectTags', client.get_project_tags, org, project.id, project=project.id),
+            emit('schedule', client.get_schedules, org, project.id, project=project.id))
+
+        await asyncio.gather(*(export_component(project, c) for c in components))
+
+    projects, *_ = await asyncio.gather(
+        emit('project', client.get_projects, org),
+        emit('organization', client.get_organization, org),
+        emit('organizationUser', client.get_organization_users, org),
+        emit('projectTemplate', client.get_project_templates, org),
+        emit('deploymentScope', client.get_deployment_scopes, org))
+
+    await asyncio.gather(*(export_project(p) for p in projects))
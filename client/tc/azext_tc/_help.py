@@ -13,6 +13,11 @@ from knack.help_files import helps  # pylint: disable=unused-import
 helps['tc'] = """
 type: group
 short-summary: Manage TeamCloud instances.
+long-summary: >
+  Access tokens can be cached on disk and shared across commands with `az config set tc.token_cache=true`.
+  The key encrypting them is kept in the OS's encrypted storage (DPAPI, the macOS Keychain or libsecret) when
+  available. Otherwise it is stored in a file next to the tokens, which are then only protected by the
+  permissions of that directory.
 """
 
 helps['tc update'] = """
@@ -35,6 +40,94 @@ examples:
     text: az tc deploy --name myawesomeapp --location eastus --client-id myWebClientId --version v0.1.1
 """
 
+# ----------------
+# Batch
+# ----------------
+
+helps['tc batch'] = """
+type: command
+short-summary: Run a file of tc commands in a single process.
+long-summary: >
+  Each line is a tc command with the same syntax as on the command line, with or without the leading `az tc`.
+  All commands share one client, access token and http session. Commands run in order unless --parallel is set,
+  a line with only `wait` waits for all preceding commands to finish. Results are written as one json object
+  per line as each command completes. Blank lines and lines starting with # are ignored.
+  Commands can't prompt, pass --yes where needed.
+examples:
+  - name: Run a batch file, writing results to stdout.
+    text: az tc batch --file ops.txt
+  - name: Create scopes in parallel, then templates once all scopes exist.
+    text: |
+      cat > ops.txt <<EOF
+      scope create --org myorg --name Dev
+      scope create --org myorg --name Production
+      wait
+      template create --org myorg --name web --repo-url https://github.com/microsoft/TeamCloud-Project-Sample
+      EOF
+      az tc batch --file ops.txt --parallel 4 --results results.ndjson
+"""
+
+# ----------------
+# Sync
+# ----------------
+
+helps['tc sync'] = """
+type: command
+short-summary: Refresh the local mirror of organizations, projects, components, templates and scopes.
+long-summary: >
+  Fetches every organization and, for each organization (or only --org), its projects, components, project
+  templates and deployment scopes, and updates what the local mirror holds for them. Organizations synced within
+  the last day (`az config set tc.sync_delta_max_age=<seconds>`) only refetch the projects, components, templates
+  and scopes their audit entries show changed since. Others, and all with --full, are listed in full.
+  List and show commands read from the mirror with --offline, or with --max-staleness when it is recent enough.
+  An organization that fails to sync keeps its previously mirrored data.
+examples:
+  - name: Sync all organizations.
+    text: az tc sync --url url
+  - name: List everything again, ignoring audit entries.
+    text: az tc sync --url url --full
+  - name: Sync one organization, then list its templates from the mirror.
+    text: |
+      az tc sync --url url --org myorg
+      az tc template list --url url --org myorg --offline
+"""
+
+# ----------------
+# Daemon
+# ----------------
+
+helps['tc daemon'] = """
+type: group
+short-summary: Run tc commands through a long-lived background process.
+long-summary: >
+  The daemon keeps the az cli, the tc extension and its clients loaded and serves commands over a Unix
+  domain socket that only the current user can access, so scripts calling many tc commands don't pay the
+  az cli startup cost each time. Use the thin client printed by `az tc daemon start`, which falls back to
+  `az tc` when the daemon isn't running. Commands run one at a time with the AZURE_* environment variables of
+  the thin client and can't read stdin or prompt, pass --yes where needed. The daemon only serves the
+  AZURE_CONFIG_DIR it was started with.
+"""
+
+helps['tc daemon start'] = """
+type: command
+short-summary: Start the tc daemon in the background.
+examples:
+  - name: Start the daemon and list orgs through it.
+    text: |
+      az tc daemon start
+      python ~/.azure/cliextensions/tc/azext_tc/_daemon_client.py org list -o table
+"""
+
+helps['tc daemon stop'] = """
+type: command
+short-summary: Stop the tc daemon.
+"""
+
+helps['tc daemon status'] = """
+type: command
+short-summary: Show whether the tc daemon is running.
+"""
+
 # ----------------
 # TeamCloud Orgs
 # ----------------
@@ -70,6 +163,10 @@ examples:
     text: az tc org list --url url
   - name: List all organizations in table format.
     text: az tc org list --url url -o table
+  - name: List all organizations as the json the api returns, without building sdk models.
+    text: az tc org list --url url --raw
+  - name: List organizations from the local mirror if it was synced in the last 5 minutes.
+    text: az tc org list --url url --max-staleness 5m
 """
 
 helps['tc org show'] = """
@@ -80,6 +177,193 @@ examples:
     text: az tc org show --url url --name myorg
   - name: Get a organization by id.
     text: az tc org show --url url --name orgId
+  - name: Get a organization from the local mirror, without calling the api.
+    text: az tc org show --url url --name myorg --offline
+"""
+
+helps['tc org export'] = """
+type: command
+short-summary: Export a snapshot of an organization to newline-delimited json.
+long-summary: >
+  Writes the organization, its users, project templates, deployment scopes and every project with its
+  components, component tasks, component templates, users, identities, tags and schedules. Each line is a
+  json object with a type, the org and project ids and the data. Requests are issued concurrently.
+examples:
+  - name: Export an organization.
+    text: az tc org export --url url --name myorg --file myorg.ndjson
+"""
+
+helps['tc org apply'] = """
+type: command
+short-summary: Apply a declarative manifest to an organization.
+long-summary: >
+  Diffs a yaml or json manifest of project templates, deployment scopes, users and projects against the
+  organization and prints the plan. Then runs only the needed create, update and delete requests, concurrently
+  within each stage. Templates, scopes and users are applied before the projects that depend on them, and
+  pruned projects are deleted before the templates and scopes they use. Templates require a repoUrl, a
+  repoToken is only sent when the manifest sets one.
+  Deployment scope parameters use the same key=value format as `az tc scope create --parameters`.
+examples:
+  - name: Show the changes a manifest would make.
+    text: az tc org apply --url url --name myorg --file org.yaml --what-if
+  - name: Apply a manifest, deleting anything not declared in it.
+    text: az tc org apply --url url --name myorg --file org.yaml --prune
+  - name: Example manifest.
+    text: |
+      templates:
+        - name: myTemplate
+          repoUrl: https://github.com/microsoft/TeamCloud-Project-Sample
+          repoVersion: main
+      scopes:
+        - name: Sandbox
+          type: AzureResourceManager
+          parameters:
+            - subscriptionIds=["00000000-0000-0000-0000-000000000000"]
+      users:
+        - identifier: admin@contoso.com
+          role: Admin
+      projects:
+        - name: MyProject
+          template: myTemplate
+          input: {}
+          users:
+            - identifier: dev@contoso.com
+              role: Owner
+"""
+
+# ----------------
+# Audit
+# ----------------
+
+helps['tc audit'] = """
+type: group
+short-summary: Inspect an organization's command audit log.
+"""
+
+helps['tc audit export'] = """
+type: command
+short-summary: Export audit entries to a newline-delimited json or csv file.
+long-summary: >
+  Splits the export into one request per audit command, fetched concurrently and streamed to a part file that
+  is appended to the export as each one completes. Completed commands are tracked in a .state file next to the
+  export, so running the same command again after a failure resumes where it stopped, for the same time window.
+examples:
+  - name: Export the last 90 days of audit entries.
+    text: az tc audit export --url url --org org --time-range 90d --file audit.ndjson
+  - name: Export audit entries for two commands as csv.
+    text: |
+      az tc audit export --url url --org org --format csv --file audit.csv \\
+        --commands ProjectCreateCommand ProjectDeleteCommand
+"""
+
+helps['tc audit stats'] = """
+type: command
+short-summary: Show per-command volume, failure ratio and latency percentiles from the audit log.
+long-summary: >
+  Fetches audit entries one command at a time, concurrently, into an in-memory columnar table and aggregates
+  count, failures, runs per hour and p50, p90 and p99 duration in seconds for each command. Entries that
+  are still running are counted but excluded from the duration percentiles.
+examples:
+  - name: Show audit stats for the last 7 days as a table.
+    text: az tc audit stats --url url --org org --time-range 7d -o table
+"""
+
+# ----------------
+# Projects
+# ----------------
+
+helps['tc project'] = """
+type: group
+short-summary: Manage projects.
+"""
+
+helps['tc project bulk-create'] = """
+type: command
+short-summary: Create many projects from a csv, yaml or json file.
+long-summary: >
+  Every row is validated against its project template's input schema before any project is created, invalid
+  rows are reported and skipped. Valid rows are created concurrently, optionally rate limited, and each
+  result is reported as it completes. Csv files have name and template columns, input either as a json
+  object in an input column or as one input.<key> column per value, and users as semicolon-separated
+  identifier[:role] entries. Yaml and json files contain a list of objects with name, template, input
+  (an object) and users (a list of identifier and role).
+examples:
+  - name: Create projects from a csv file, at most 5 per second, and wait for them to finish.
+    text: az tc project bulk-create --url url --org org --file projects.csv --rate-limit 5 --wait
+  - name: Example csv file.
+    text: |
+      name,template,input.environment,users
+      Project A,dotnet,dev,alice@contoso.com:Owner;bob@contoso.com
+      Project B,dotnet,prod,
+"""
+
+# ----------------
+# Status
+# ----------------
+
+helps['tc status'] = """
+type: group
+short-summary: Track long-running operations.
+"""
+
+helps['tc status wait'] = """
+type: command
+short-summary: Wait for one or more long-running operations to finish.
+long-summary: >
+  Polls every tracking id concurrently on a shared schedule, backing off per operation while it is still
+  running, and shows a single progress bar. Returns the final status of each operation.
+examples:
+  - name: Wait for two operations.
+    text: az tc status wait --url url --org org --tracking-id id1 id2
+  - name: Wait for project operations for at most 10 minutes.
+    text: az tc status wait --url url --org org --project project --tracking-id id1 id2 --timeout 600
+"""
+
+# ----------------
+# Component Tasks
+# ----------------
+
+helps['tc task'] = """
+type: group
+short-summary: Work with component tasks.
+"""
+
+helps['tc task wait'] = """
+type: command
+short-summary: Wait for a component task to finish.
+long-summary: >
+  Subscribes to the project's SignalR hub and checks the task whenever a notification for it arrives,
+  falling back to polling with backoff if a connection can't be made (requires aiohttp). Fails if the
+  task does not succeed.
+examples:
+  - name: Wait up to 30 minutes for a task to finish.
+    text: az tc task wait --url url --org org -p project -c component --id task --timeout 1800
+"""
+
+helps['tc task run'] = """
+type: command
+short-summary: Run a component task on one component or on many at once.
+long-summary: >
+  With --all, lists the components of every project in the org (or of --project), filters them by
+  --component-type and --template, and starts the task on each concurrently, limited by --max-concurrency
+  and --rate-limit. With --wait, all tasks are tracked to completion together and a single report with the
+  final state of each task is returned.
+examples:
+  - name: Re-deploy every Environment component created from a template and wait for the results.
+    text: az tc task run --url url --org org --all --type Environment --template arm-env -n Create --wait -o table
+  - name: Run a task on a single component.
+    text: az tc task run --url url --org org -p project -c component -n Reset
+"""
+
+helps['tc task watch'] = """
+type: command
+short-summary: Stream a component task's state changes and output until it finishes.
+long-summary: >
+  Uses the same SignalR notifications and polling fallback as `az tc task wait`. Output is written to
+  stdout as it arrives, state changes to stderr. Fails if the task does not succeed.
+examples:
+  - name: Watch a task.
+    text: az tc task watch --url url --org org -p project -c component --id task
 """
 
 # ----------------
@@ -105,6 +389,8 @@ short-summary: Delete a deployment scope.
 examples:
   - name: Delete a deployment scope by name or id.
     text: az tc scope delete --url url --org org --name Sandbox
+  - name: Delete several deployment scopes concurrently.
+    text: az tc scope delete --url url --org org --name Sandbox Staging Production
 """
 
 helps['tc scope list'] = """
@@ -115,6 +401,12 @@ examples:
     text: az tc scope list --url url --org org
   - name: List all deployment scopes in table format.
     text: az tc scope list --url url --org org -o table
+  - name: List deployment scopes across all organizations.
+    text: az tc scope list --url url --all-orgs
+  - name: List deployment scopes across all organizations as the json the api returns.
+    text: az tc scope list --url url --all-orgs --raw
+  - name: List deployment scopes from the local mirror, without calling the api.
+    text: az tc scope list --url url --org org --offline
 """
 
 helps['tc scope show'] = """
@@ -154,6 +446,8 @@ short-summary: Delete a project template.
 examples:
   - name: Delete a project template.
     text: az tc template delete --url url --org org --name myTemplate
+  - name: Delete several project templates concurrently.
+    text: az tc template delete --url url --org org --name myTemplate otherTemplate
 """
 
 helps['tc template list'] = """
@@ -164,6 +458,10 @@ examples:
     text: az tc template list --url url --org org
   - name: List all project templates in table format.
     text: az tc template list --url url --org org -o table
+  - name: List project templates across all organizations.
+    text: az tc template list --url url --all-orgs
+  - name: List project templates from the local mirror if it was synced in the last hour.
+    text: az tc template list --url url --org org --max-staleness 1h
 """
 
 helps['tc template show'] = """
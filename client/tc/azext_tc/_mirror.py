@@ -0,0 +1,366 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import re
+import json
+import asyncio
+import sqlite3
+from contextlib import closing
+from math import ceil
+from time import time
+
+from knack.log import get_logger
+from knack.util import CLIError
+from azure.core.exceptions import HttpResponseError
+
+from ._async_utils import DEFAULT_MAX_CONCURRENCY
+from ._cache import get_cache_dir
+
+logger = get_logger(__name__)
+
+# mirrored kinds and the sdk model their json deserializes to
+MIRROR_MODELS = {
+    'organization': 'Organization',
+    'project': 'Project',
+    'component': 'Component',
+    'projectTemplate': 'ProjectTemplate',
+    'deploymentScope': 'DeploymentScope',
+}
+
+# org column of the sync row recording when the list of orgs was synced
+_ORGS = ''
+
+# seconds since an org was last synced after which `tc sync` lists all of it again instead of refetching
+# what its audit entries changed, `az config set tc.sync_delta_max_age=<seconds>` (0 always lists all)
+DEFAULT_DELTA_MAX_AGE = 86400
+
+# audit entries are read from this many seconds before the last sync, to cover clock skew
+# between the cli and the api and commands whose entries were written while it ran
+_WATERMARK_OVERLAP = 300
+
+# the project id of audit entries for commands without one
+_EMPTY_ID = '00000000-0000-0000-0000-000000000000'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    base_url TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    org TEXT NOT NULL,
+    project TEXT NOT NULL,
+    id TEXT NOT NULL,
+    slug TEXT,
+    display_name TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (base_url, kind, org, project, id));
+CREATE TABLE IF NOT EXISTS syncs (
+    base_url TEXT NOT NULL,
+    org TEXT NOT NULL,
+    synced REAL NOT NULL,
+    PRIMARY KEY (base_url, org));
+"""
+
+
+def parse_duration(value):
+    """Converts 30s, 5m, 12h, 1d or a number of seconds to seconds, returns None if invalid"""
+    shorthand = re.match(r'^(\d+(?:\.\d+)?)([smhd]?)$', str(value).strip().lower())
+    if shorthand is None:
+        return None
+    amount, unit = float(shorthand.group(1)), shorthand.group(2) or 's'
+    return amount * {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[unit]
+
+
+class Mirror:
+    """SQLite store of the organizations, projects, components, project templates and deployment
+    scopes of each TeamCloud url, as the json the api returns, with the time each org was synced.
+    Every call uses its own connection, so threads and processes can share the file."""
+
+    def __init__(self, file):
+        self.file = file
+
+    @staticmethod
+    def _url(base_url):
+        return (base_url or '').rstrip('/').lower()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.file), exist_ok=True)
+        conn = sqlite3.connect(self.file, timeout=30)
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def synced(self, base_url, org=None):
+        """Returns when org (or the list of orgs for '') was last synced. With no org, when the least
+        recently synced org or list of orgs was, or None if any of them was never synced."""
+        url = self._url(base_url)
+        with closing(self._connect()) as conn:
+            if org is not None:
+                row = conn.execute('SELECT synced FROM syncs WHERE base_url = ? AND org = ?', (url, org)).fetchone()
+                return row[0] if row else None
+            orgs, synced, oldest = conn.execute(
+                'SELECT count(*), count(s.synced), min(s.synced) FROM items i LEFT JOIN syncs s '
+                'ON s.base_url = i.base_url AND s.org = i.org '
+                "WHERE i.base_url = ? AND i.kind = 'organization'", (url,)).fetchone()
+        listed = self.synced(base_url, _ORGS)
+        if listed is None or synced < orgs:
+            return None
+        return min(listed, oldest) if oldest is not None else listed
+
+    def list(self, base_url, kind, org=None, project=None):
+        query = 'SELECT data FROM items WHERE base_url = ? AND kind = ?'
+        args = [self._url(base_url), kind]
+        for column, value in [('org', org), ('project', project)]:
+            if value is not None:
+                query += f' AND {column} = ?'
+                args.append(value)
+        with closing(self._connect()) as conn:
+            return [json.loads(row[0]) for row in conn.execute(query + ' ORDER BY rowid', args)]
+
+    def get(self, base_url, kind, item, org=None, project=None):
+        """Returns the item matching an id, slug or display name, or None"""
+        query = 'SELECT data FROM items WHERE base_url = ? AND kind = ? ' \
+                'AND (id = ? OR slug = lower(?) OR lower(display_name) = lower(?))'
+        args = [self._url(base_url), kind, item, item, item]
+        for column, value in [('org', org), ('project', project)]:
+            if value is not None:
+                query += f' AND {column} = ?'
+                args.append(value)
+        with closing(self._connect()) as conn:
+            row = conn.execute(query + ' ORDER BY id = ? DESC LIMIT 1', args + [item]).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def resolve_org(self, base_url, org):
+        data = self.get(base_url, 'organization', org)
+        return data.get('id') if data else None
+
+    def apply(self, base_url, orgs, org_changes, synced=None):
+        """Replaces the list of orgs and applies the OrgChanges of each org in org_changes, in one
+        transaction, recording them as synced. Orgs no longer listed are removed with their items."""
+        url = self._url(base_url)
+        synced = synced or time()
+        org_ids = [o['id'] for o in orgs]
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM items WHERE base_url = ? AND kind = 'organization'", (url,))
+            self._insert(conn, url, [('organization', o['id'], None, o) for o in orgs])
+            keep = [_ORGS] + org_ids
+            placeholders = ', '.join('?' * len(keep))
+            conn.execute(f'DELETE FROM items WHERE base_url = ? AND org NOT IN ({placeholders})', [url] + keep)
+            conn.execute(f'DELETE FROM syncs WHERE base_url = ? AND org NOT IN ({placeholders})', [url] + keep)
+            for org, changes in org_changes.items():
+                if changes.full:
+                    conn.execute("DELETE FROM items WHERE base_url = ? AND org = ? AND kind != 'organization'",
+                                 (url, org))
+                for kind, project in changes.scopes:
+                    conn.execute('DELETE FROM items WHERE base_url = ? AND org = ? AND kind = ?'
+                                 + (' AND project = ?' if project else ''),
+                                 (url, org, kind) + ((project,) if project else ()))
+                for project in changes.deleted_projects:
+                    conn.execute("DELETE FROM items WHERE base_url = ? AND org = ? "
+                                 "AND ((kind = 'project' AND id = ?) OR project = ?)", (url, org, project, project))
+                self._insert(conn, url, [(kind, org, project, data) for kind, project, data in changes.items])
+                self._set_synced(conn, url, org, synced)
+            self._set_synced(conn, url, _ORGS, synced)
+
+    @staticmethod
+    def _insert(conn, url, items):
+        conn.executemany(
+            'INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(url, kind, org, project or '', data['id'], (data.get('slug') or '').lower() or None,
+              data.get('displayName'), json.dumps(data)) for kind, org, project, data in items])
+
+    @staticmethod
+    def _set_synced(conn, url, org, synced):
+        conn.execute('INSERT OR REPLACE INTO syncs VALUES (?, ?, ?)', (url, org, synced))
+
+
+def get_mirror(cli_ctx):
+    return Mirror(get_cache_dir(cli_ctx, 'mirror.db'))
+
+
+def get_delta_max_age(cli_ctx):
+    return cli_ctx.config.getint('tc', 'sync_delta_max_age', fallback=DEFAULT_DELTA_MAX_AGE)
+
+
+class SyncError(Exception):
+    """Raised when an org can't be synced, the mirror keeps what it had for the org"""
+
+
+class OrgChanges:  # pylint: disable=too-few-public-methods
+    """What a sync writes to the mirror for one org. A full sync replaces everything mirrored for
+    the org. A delta sync replaces scopes, all items of a kind in the org or in one project, with
+    the items refetched for them and removes deleted projects along with their components."""
+
+    def __init__(self, full=False):
+        self.full = full
+        self.scopes = []
+        self.items = []
+        self.deleted_projects = []
+
+
+class _OrgFetcher:
+    """Calls a raw async client's get and list operations for one org within the sync's concurrency"""
+
+    def __init__(self, client, org, semaphore):
+        self.client = client
+        self.org = org
+        self.semaphore = semaphore
+
+    async def get(self, kind, func, *args):
+        """Returns the result's data, or None if it wasn't found"""
+        async with self.semaphore:
+            try:
+                result = await func(*args)
+            except HttpResponseError as ex:
+                raise SyncError(f'Failed to get {kind}s of org {self.org}: {ex.status_code} {ex.reason}') from ex
+        data = result.get('data') if isinstance(result, dict) else None
+        if data is None:
+            if isinstance(result, dict) and result.get('code') == 404:
+                return None
+            status = result.get('status') if isinstance(result, dict) else result
+            raise SyncError(f'Failed to get {kind}s of org {self.org}: {status}')
+        return data
+
+    async def list(self, kind, func, *args, project=None):
+        """Returns a list of (kind, project, data) tuples, or None if the parent wasn't found"""
+        data = await self.get(kind, func, *args)
+        return None if data is None else [(kind, project, item) for item in data]
+
+
+async def fetch_org(fetcher):
+    """Gets all of the org's projects, components, project templates and deployment scopes"""
+    client, org = fetcher.client, fetcher.org
+
+    async def fetch(kind, func, *args, project=None):
+        items = await fetcher.list(kind, func, *args, project=project)
+        if items is None:
+            raise SyncError(f'Failed to get {kind}s of org {org}: NotFound')
+        return items
+
+    projects, templates, scopes = await asyncio.gather(
+        fetch('project', client.get_projects, org),
+        fetch('projectTemplate', client.get_project_templates, org),
+        fetch('deploymentScope', client.get_deployment_scopes, org))
+
+    components = await asyncio.gather(*(fetch('component', client.get_components, org, p['id'], project=p['id'])
+                                        for _, _, p in projects))
+
+    changes = OrgChanges(full=True)
+    changes.items = projects + templates + scopes + [c for project in components for c in project]
+    return changes
+
+
+def _changed(rows):
+    """Returns the kinds whose lists and the projects (with their components) or just project
+    components the audited commands may have changed, or None if a command doesn't say which"""
+    kinds, projects, components = set(), set(), set()
+    for row in rows:
+        command = row.get('command') or ''
+        project = row.get('projectId') if row.get('projectId') != _EMPTY_ID else None
+        if command.startswith('ProjectTemplate'):
+            kinds.add('projectTemplate')
+        elif command.startswith('DeploymentScope'):
+            kinds.add('deploymentScope')
+        elif command.startswith('Project') or command.startswith('Component'):
+            # project users and identities are part of the project, component tasks change components
+            if not project:
+                return None
+            (projects if command.startswith('Project') else components).add(project)
+    return kinds, projects, components - projects
+
+
+async def fetch_org_delta(fetcher, since):
+    """Refetches only what the org's audit entries since the last sync say changed, returns
+    None if they can't tell, so the org needs a full sync"""
+    from ._audit_utils import get_audit_rows, to_timespan
+    client, org = fetcher.client, fetcher.org
+
+    age = time() - since + _WATERMARK_OVERLAP
+    try:
+        async with fetcher.semaphore:
+            rows = await get_audit_rows(client, org, time_range=to_timespan(f'{ceil(age / 60)}m'))
+    except (CLIError, HttpResponseError) as ex:
+        logger.warning('Failed to get audit entries of org %s, syncing all of it: %s', org, ex)
+        return None
+
+    changed = _changed(rows)
+    if changed is None:
+        return None
+    kinds, projects, components = changed
+    logger.info('Org %s: %d audit entries since the last sync, refetching %d projects, the components of %d more '
+                'and %s', org, len(rows), len(projects), len(components), ', '.join(sorted(kinds)) or 'no lists')
+
+    changes = OrgChanges()
+    lists = {'projectTemplate': client.get_project_templates, 'deploymentScope': client.get_deployment_scopes}
+
+    async def refetch_list(kind):
+        changes.scopes.append((kind, None))
+        changes.items.extend(await fetcher.list(kind, lists[kind], org) or [])
+
+    async def refetch_components(project):
+        items = await fetcher.list('component', client.get_components, org, project, project=project)
+        if items is None:
+            changes.deleted_projects.append(project)
+            return
+        changes.scopes.append(('component', project))
+        changes.items.extend(items)
+
+    async def refetch_project(project):
+        data = await fetcher.get('project', client.get_project, project, org)
+        if data is None:
+            changes.deleted_projects.append(project)
+            return
+        changes.items.append(('project', None, data))
+        await refetch_components(project)
+
+    await asyncio.gather(*[refetch_list(k) for k in kinds], *[refetch_project(p) for p in projects],
+                         *[refetch_components(p) for p in components])
+    return changes
+
+
+async def sync_mirror(client, mirror, base_url, org=None, full=False, max_age=DEFAULT_DELTA_MAX_AGE,
+                      max_concurrency=None):
+    """Refreshes the mirror of base_url (or just org) with a raw async client. Orgs synced within
+    max_age seconds only refetch what their audit entries say changed since, others are listed in
+    full. An org that fails keeps what was mirrored before. Returns the counts and failed orgs."""
+    synced = time()
+    result = await client.get_organizations()
+    orgs = result.get('data') if isinstance(result, dict) else None
+    if orgs is None:
+        raise CLIError(f"Failed to get orgs: {result.get('status') if isinstance(result, dict) else result}")
+
+    targets = [o['id'] for o in orgs if org is None or o['id'] == org]
+    if org is not None and not targets:
+        raise CLIError(f'--org no org found matching {org}')
+
+    semaphore = asyncio.Semaphore(max_concurrency or DEFAULT_MAX_CONCURRENCY)
+
+    async def sync_org(target):
+        fetcher = _OrgFetcher(client, target, semaphore)
+        since = None if full or max_age <= 0 else mirror.synced(base_url, target)
+        if since is not None and synced - since <= max_age:
+            changes = await fetch_org_delta(fetcher, since)
+            if changes is not None:
+                return changes
+        return await fetch_org(fetcher)
+
+    results = await asyncio.gather(*(sync_org(t) for t in targets), return_exceptions=True)
+
+    org_changes, failed = {}, []
+    for target, changes in zip(targets, results):
+        if isinstance(changes, SyncError):
+            logger.warning('%s', changes)
+            failed.append(target)
+        elif isinstance(changes, BaseException):
+            raise changes
+        else:
+            org_changes[target] = changes
+
+    mirror.apply(base_url, orgs, org_changes, synced=synced)
+
+    counts = {'organization': len(orgs)}
+    for changes in org_changes.values():
+        for kind, _, _ in changes.items:
+            counts[kind] = counts.get(kind, 0) + 1
+    full_syncs = sum(1 for c in org_changes.values() if c.full)
+    return {'counts': counts, 'full': full_syncs, 'incremental': len(org_changes) - full_syncs, 'failed': failed}
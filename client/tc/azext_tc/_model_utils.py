@@ -0,0 +1,29 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+from knack.util import CLIError
+
+
+def find_item(items, name):
+    """Returns the first sdk model whose display name, slug or id matches name (ignoring case), or None"""
+    name = str(name).lower()
+    return next((i for i in items if name in [(getattr(i, a, None) or '').lower()
+                                              for a in ['display_name', 'slug', 'id']]), None)
+
+
+def find_user(users, identifier):
+    """Returns the first user whose login name, email, id or display name matches identifier, or None"""
+    identifier = str(identifier).lower()
+    return next((u for u in users if identifier in [(getattr(u, a, None) or '').lower()
+                                                    for a in ['login_name', 'mail_address', 'id', 'display_name']]),
+                None)
+
+
+def result_data(result, what):
+    """Returns the data of an api result, raising a CLIError with its status if it has none"""
+    data = getattr(result, 'data', None)
+    if data is None:
+        raise CLIError(f'Failed to get {what}: {getattr(result, "status", result)}')
+    return data
@@ -12,7 +12,8 @@ from azure.cli.core.commands.parameters import (tags_type, get_enum_type, file_t
 
 from ._validators import (
     org_name_or_id_validator, org_name_validator, base_url_validator,
-    teamcloud_cli_source_version_validator, repo_url_validator)
+    teamcloud_cli_source_version_validator, repo_url_validator, time_range_validator,
+    max_staleness_validator)
 
 from ._completers import (get_org_completion_list)
 
@@ -33,6 +34,13 @@ def load_arguments(self, _):
         configured_default='tc-org',
         validator=org_name_or_id_validator)
 
+    max_concurrency_type = CLIArgumentType(
+        options_list=['--max-concurrency'],
+        type=int,
+        help='Maximum number of concurrent requests. Use `az configure -d tc-max-concurrency=<n>` '
+             'to configure a default.',
+        configured_default='tc-max-concurrency')
+
     parameters_type = CLIArgumentType(
         options_list=['--parameters', '-p'],
         action='append',
@@ -42,18 +50,58 @@ def load_arguments(self, _):
     # Global
 
     # ignore global az arg --subscription and requre base_url for everything except `tc deploy`
-    for scope in ['tc org', 'tc template', 'tc scope']:
+    for scope in ['tc sync', 'tc org', 'tc template', 'tc scope', 'tc audit', 'tc task', 'tc status', 'tc project']:
         with self.argument_context(scope, arg_group='TeamCloud') as c:
             c.argument('base_url', tc_url_type)
 
-    for scope in ['tc update', 'tc org delete', 'tc org list', 'tc org show', 'tc template', 'tc scope']:
+    for scope in ['tc update', 'tc batch', 'tc sync', 'tc org delete', 'tc org list', 'tc org show', 'tc org export',
+                  'tc org apply', 'tc template', 'tc scope', 'tc audit', 'tc task', 'tc status', 'tc project']:
         with self.argument_context(scope, arg_group='TeamCloud') as c:
             c.ignore('_subscription')
 
-    for scope in ['tc template', 'tc scope']:
+    for scope in ['tc template', 'tc scope', 'tc audit', 'tc task', 'tc status', 'tc project']:
         with self.argument_context(scope, arg_group='TeamCloud') as c:
             c.argument('org', org_name_or_id_type)
 
+    for scope in ['tc org list', 'tc scope create', 'tc scope list', 'tc template list']:
+        with self.argument_context(scope, arg_group='TeamCloud') as c:
+            c.extra('no_cache', options_list=['--no-cache'], action='store_true',
+                    help='Bypass the local response cache. Enable the cache with `az config set tc.cache=true`.')
+
+    for scope in ['tc org list', 'tc org show', 'tc scope list', 'tc scope show', 'tc template list',
+                  'tc template show']:
+        with self.argument_context(scope, arg_group='TeamCloud') as c:
+            # azure-cli drops handler parameters named raw
+            c.argument('raw_output', options_list=['--raw'], action='store_true', default=None,
+                       help='Return the json the api sends without building sdk models, faster for large listings. '
+                            'Timestamps and missing properties are returned as sent. '
+                            'Enable by default with `az config set tc.raw_output=true`.')
+            c.argument('offline', action='store_true',
+                       help='Read from the local mirror without calling the api or logging in. '
+                            'Update the mirror with `az tc sync`.')
+            c.argument('max_staleness', options_list=['--max-staleness'], configured_default='tc-max-staleness',
+                       validator=max_staleness_validator,
+                       help='Read from the local mirror if it was synced within this long, e.g. 30s, 5m or 1h, '
+                            'otherwise call the api. Use `az configure -d tc-max-staleness=<age>` '
+                            'to configure a default.')
+
+    for scope in ['tc scope list', 'tc template list']:
+        with self.argument_context(scope) as c:
+            c.argument('all_orgs', options_list=['--all-orgs'], action='store_true',
+                       help='List across all organizations. Ignores --org.')
+
+    for scope in ['tc sync', 'tc org export', 'tc org apply', 'tc scope list', 'tc scope delete',
+                  'tc template list', 'tc template delete', 'tc audit export', 'tc audit stats',
+                  'tc status wait', 'tc project bulk-create', 'tc task run']:
+        with self.argument_context(scope, arg_group='TeamCloud') as c:
+            c.argument('max_concurrency', max_concurrency_type)
+
+    for scope in ['tc org create', 'tc org delete', 'tc scope create', 'tc scope delete',
+                  'tc template create', 'tc template delete', 'tc project bulk-create']:
+        with self.argument_context(scope) as c:
+            c.argument('wait', action='store_true',
+                       help='Wait for the operation to finish instead of returning its tracking status.')
+
     # TeamCloud CLI
 
     with self.argument_context('tc update') as c:
@@ -86,6 +134,32 @@ def load_arguments(self, _):
                    type=str, help='Client ID for the Managed Application used for user authentication. '
                    'See https://aka.ms/tcwebclientid for instructions.')
 
+    with self.argument_context('tc batch') as c:
+        c.argument('file', options_list=['--file', '-f'], completer=FilesCompleter(), type=file_type,
+                   help='Path to a file of tc commands, one per line. A line with only `wait` waits for all '
+                        'preceding commands to finish.')
+        c.argument('parallel', type=int,
+                   help='Maximum number of commands to run at once. Default: 1, one after the other.')
+        c.argument('continue_on_error', action='store_true',
+                   help='Keep running the remaining commands after a command fails.')
+        c.argument('results_file', options_list=['--results'], completer=FilesCompleter(),
+                   help='Path of the newline-delimited json file to write results to. Default: stdout.')
+
+    with self.argument_context('tc sync') as c:
+        c.argument('org', options_list=['--org'], type=str,
+                   help='Organization id (uuid) or name to sync. Default: all organizations.',
+                   validator=org_name_or_id_validator,
+                   completer=get_org_completion_list)
+        c.argument('full', action='store_true',
+                   help='List everything again instead of refetching only what audit entries show changed '
+                        'since the last sync.')
+
+    # Daemon
+
+    with self.argument_context('tc daemon start') as c:
+        c.argument('idle_timeout', type=int,
+                   help='Seconds without requests before the daemon exits, 0 to never exit. Default: 3600.')
+
     # Orgs
 
     with self.argument_context('tc org create') as c:
@@ -93,13 +167,83 @@ def load_arguments(self, _):
                    type=str, help='Organization name.',
                    validator=org_name_validator)
 
-    for scope in ['tc org show', 'tc org delete']:
+    for scope in ['tc org show', 'tc org delete', 'tc org export', 'tc org apply']:
         with self.argument_context(scope) as c:
             c.argument('org', options_list=['--name', '--org', '-n'],
                        type=str, help='Organization name or id (uuid).',
                        validator=org_name_or_id_validator,
                        completer=get_org_completion_list)
 
+    with self.argument_context('tc org export') as c:
+        c.argument('file', options_list=['--file', '-f'], completer=FilesCompleter(),
+                   help='Path of the newline-delimited json file to write.')
+
+    with self.argument_context('tc org apply') as c:
+        c.argument('file', options_list=['--file', '-f'], completer=FilesCompleter(), type=file_type,
+                   help='Path to a yaml or json manifest of templates, scopes, users and projects.')
+        c.argument('what_if', options_list=['--what-if'], action='store_true',
+                   help='Print the plan without making any changes.')
+        c.argument('prune', action='store_true',
+                   help='Delete templates, scopes, users and projects not in the manifest. '
+                        'Only applies to sections present in the manifest.')
+
+    # Audit
+
+    with self.argument_context('tc audit') as c:
+        c.argument('time_range', options_list=['--time-range', '-t'],
+                   help='How far back to include entries, e.g. 30d, 12h, 90m or a timespan (d.hh:mm:ss).',
+                   validator=time_range_validator)
+        c.argument('commands', nargs='+', help='Space-separated command names to include.')
+
+    with self.argument_context('tc audit export') as c:
+        c.argument('file', options_list=['--file', '-f'], completer=FilesCompleter(),
+                   help='Path of the file to write. An interrupted export to the same file is resumed.')
+        c.argument('output_format', get_enum_type(['ndjson', 'csv'], default='ndjson'),
+                   options_list=['--format'], help='Format of the export file.')
+
+    # Projects
+
+    with self.argument_context('tc project bulk-create') as c:
+        c.argument('file', options_list=['--file', '-f'], completer=FilesCompleter(), type=file_type,
+                   help='Path to a csv file or a yaml or json list of projects with name, template, input and users.')
+        c.argument('rate_limit', type=float, arg_group='TeamCloud',
+                   help='Maximum number of projects to create per second. Default: no limit.')
+
+    # Status
+
+    with self.argument_context('tc status wait') as c:
+        c.argument('tracking_ids', options_list=['--tracking-id', '--ids'], nargs='+',
+                   help='Space-separated tracking ids returned by create or delete commands.')
+        c.argument('project', options_list=['--project', '-p'], type=str,
+                   help='Project id, for operations on project resources.')
+        c.argument('timeout', type=int, help='Maximum number of seconds to wait. Default: no timeout.')
+
+    # Component Tasks
+
+    with self.argument_context('tc task') as c:
+        c.argument('project', options_list=['--project', '-p'], type=str, help='Project name or id.')
+        c.argument('component', options_list=['--component', '-c'], type=str, help='Component name or id.')
+        c.argument('task', options_list=['--id', '--task'], type=str, help='Component task id.')
+        c.argument('timeout', type=int, help='Maximum number of seconds to wait. Default: no timeout.')
+        c.argument('interval', type=int,
+                   help='Initial polling interval in seconds when push notifications are unavailable. '
+                        'Backs off while the task is unchanged. Default: 5.')
+
+    with self.argument_context('tc task run') as c:
+        c.argument('task', options_list=['--name', '-n'], type=str,
+                   help='Task to run, as defined by the component template, e.g. Create or Delete.')
+        c.argument('project', options_list=['--project', '-p'], type=str,
+                   help='Project name or id. With --all, limits the run to this project\'s components.')
+        c.argument('all_components', options_list=['--all'], action='store_true',
+                   help='Run the task on every matching component in the org (or project).')
+        c.argument('component_type', get_enum_type(['Environment', 'Repository', 'Namespace']),
+                   options_list=['--component-type', '--type'], help='With --all, only run on components of this type.')
+        c.argument('template', help='With --all, only run on components created from this component template.')
+        c.argument('input_json', options_list=['--input'], help='Task input as a json string.')
+        c.argument('wait', action='store_true', help='Wait for all tasks to finish and report their final state.')
+        c.argument('rate_limit', type=float, arg_group='TeamCloud',
+                   help='Maximum number of tasks to start per second. Default: no limit.')
+
     # Deployment Scopes
 
     with self.argument_context('tc scope create') as c:
@@ -110,10 +254,13 @@ def load_arguments(self, _):
                    options_list=['--type', '-t'], help='Deployment scope name.')
         c.argument('parameters', arg_type=parameters_type)
 
-    for scope in ['tc scope show', 'tc scope delete']:
-        with self.argument_context(scope) as c:
-            c.argument('scope', options_list=['--name', '-n'],
-                       type=str, help='Deployment scope name or id (uuid).')
+    with self.argument_context('tc scope show') as c:
+        c.argument('scope', options_list=['--name', '-n'],
+                   type=str, help='Deployment scope name or id (uuid).')
+
+    with self.argument_context('tc scope delete') as c:
+        c.argument('scope', options_list=['--name', '-n'], nargs='+',
+                   help='Space-separated deployment scope names or ids (uuid).')
 
     # Project Templates
 
@@ -128,7 +275,10 @@ def load_arguments(self, _):
         c.argument('repo_token', options_list=['--repo-token', '-t'],
                    help='Personal access token.')
 
-    for scope in ['tc template show', 'tc template delete']:
-        with self.argument_context(scope) as c:
-            c.argument('template', options_list=['--name', '-n'],
-                       type=str, help='Project template name or id (uuid).')
+    with self.argument_context('tc template show') as c:
+        c.argument('template', options_list=['--name', '-n'],
+                   type=str, help='Project template name or id (uuid).')
+
+    with self.argument_context('tc template delete') as c:
+        c.argument('template', options_list=['--name', '-n'], nargs='+',
+                   help='Space-separated project template names or ids (uuid).')
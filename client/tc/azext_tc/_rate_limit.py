@@ -0,0 +1,179 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import asyncio
+import threading
+from time import monotonic, sleep
+
+from knack.events import EVENT_CLI_POST_EXECUTE
+from knack.log import get_logger
+from knack.util import CLIError
+from azure.core.pipeline.policies import HTTPPolicy, AsyncHTTPPolicy
+
+logger = get_logger(__name__)
+
+# how often async tasks check for a free slot when max concurrency is reached
+_ASYNC_POLL_SECONDS = 0.01
+
+# (rate, max_concurrency) -> RequestLimiter, clients configured the same way share one
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class RequestLimiter:
+    """Token bucket allowing rate requests per second on average (with bursts of up to one
+    second's worth), and at most max_concurrency requests in flight. Threads and async tasks
+    share it: they take a slot and a token under the lock and wait outside of it."""
+
+    def __init__(self, rate=None, max_concurrency=None):
+        self.rate = rate
+        self.capacity = max(rate, 1) if rate else None
+        self.tokens = self.capacity
+        self.updated = monotonic()
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+
+        # metrics
+        self.requests = 0
+        self.waited = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    def _reserve(self):
+        # called with the lock held, returns how long to wait for the token taken
+        if not self.rate:
+            return 0
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def _has_slot(self):
+        return not self.max_concurrency or self.in_flight < self.max_concurrency
+
+    def acquire(self):
+        """Blocks until the request may be sent, the caller must release() once it completes"""
+        started = monotonic()
+        with self._released:
+            while not self._has_slot():
+                self._released.wait()
+            self.in_flight += 1
+            delay = self._reserve()
+        if delay:
+            try:
+                sleep(delay)
+            except BaseException:
+                # interrupted before the caller could take over the slot
+                self.release()
+                raise
+        self._record(monotonic() - started)
+
+    async def acquire_async(self):
+        """Waits without blocking the event loop until the request may be sent,
+        the caller must release() once it completes"""
+        started = monotonic()
+        while True:
+            with self._lock:
+                if self._has_slot():
+                    self.in_flight += 1
+                    delay = self._reserve()
+                    break
+            await asyncio.sleep(_ASYNC_POLL_SECONDS)
+        if delay:
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:
+                # cancelled before the caller could take over the slot
+                self.release()
+                raise
+        self._record(monotonic() - started)
+
+    def release(self):
+        with self._released:
+            self.in_flight -= 1
+            self._released.notify()
+
+    def _record(self, waited):
+        with self._lock:
+            self.requests += 1
+            if waited >= 0.001:
+                self.waited += 1
+                self.wait_time += waited
+                self.max_wait = max(self.max_wait, waited)
+
+
+class RateLimitPolicy(HTTPPolicy):
+    """Sends each request (and each retry) through the process-wide RequestLimiter"""
+
+    def __init__(self, limiter):
+        super().__init__()
+        self.limiter = limiter
+
+    def send(self, request):
+        self.limiter.acquire()
+        try:
+            return self.next.send(request)
+        finally:
+            self.limiter.release()
+
+
+class AsyncRateLimitPolicy(AsyncHTTPPolicy):
+    """Sends each request (and each retry) through the process-wide RequestLimiter"""
+
+    def __init__(self, limiter):
+        super().__init__()
+        self.limiter = limiter
+
+    async def send(self, request):
+        await self.limiter.acquire_async()
+        try:
+            return await self.next.send(request)
+        finally:
+            self.limiter.release()
+
+
+def _get_default(cli_ctx, name, convert, description):
+    value = cli_ctx.config.get('defaults', name, fallback=None)
+    if not value:
+        return None
+    try:
+        value = convert(value)
+    except ValueError:
+        value = 0
+    if value <= 0:
+        raise CLIError(f'The configured default {name} should be a positive number of {description}. '
+                       f'Use `az configure -d {name}=` to remove it.')
+    return value
+
+
+def _log_limiter_stats(_, **__):
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    for limiter in limiters:
+        if limiter.requests:
+            logger.debug('TeamCloud rate limit (%s/s, %s in flight): %d requests, %d waited %.2fs in total '
+                         '(longest %.2fs)', limiter.rate or '-', limiter.max_concurrency or '-', limiter.requests,
+                         limiter.waited, limiter.wait_time, limiter.max_wait)
+
+
+def get_rate_limiter(cli_ctx):
+    """Returns the process-wide RequestLimiter configured with `az configure -d tc-rate-limit=<requests
+    per second>` and `az configure -d tc-rate-limit-concurrency=<n>`, or None if neither is set.
+    The configuration is read on every call, so a changed configuration gets its own limiter."""
+    rate = _get_default(cli_ctx, 'tc-rate-limit', float, 'requests per second')
+    max_concurrency = _get_default(cli_ctx, 'tc-rate-limit-concurrency', int, 'requests')
+    if not rate and not max_concurrency:
+        return None
+    with _limiters_lock:
+        limiter = _limiters.get((rate, max_concurrency))
+        if limiter is None:
+            limiter = _limiters[(rate, max_concurrency)] = RequestLimiter(rate, max_concurrency)
+    # a cli instance runs several commands in tc batch and the daemon, register the handler once
+    cli_ctx.unregister_event(EVENT_CLI_POST_EXECUTE, _log_limiter_stats)
+    cli_ctx.register_event(EVENT_CLI_POST_EXECUTE, _log_limiter_stats)
+    return limiter
@@ -0,0 +1,243 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import random
+import threading
+from time import monotonic, sleep
+from urllib.parse import urlparse
+
+from knack.log import get_logger
+from knack.util import CLIError
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+from azure.core.pipeline.policies import RetryPolicy, AsyncRetryPolicy
+
+logger = get_logger(__name__)
+
+DEFAULT_BACKOFF = 0.8
+DEFAULT_MAX_BACKOFF = 60
+DEFAULT_RETRIES = 3
+
+# retries allowed per request sent, on top of a reserve, so under sustained failures
+# the process as a whole can add at most ~20% more load instead of multiplying it
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_RESERVE = 10
+
+# consecutive failed requests to a host before further requests fail fast, and for how long
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30
+
+RETRY_STATUS_CODES = [408, 429, 500, 502, 503, 504]
+
+
+class CircuitOpenError(ServiceRequestError):
+    """Raised instead of sending a request to a host whose circuit breaker is open"""
+
+
+class RetryBudget:
+    """Token bucket shared by everything in the process: each request adds RETRY_BUDGET_RATIO
+    tokens, each retry takes one, and retries stop when the bucket is empty"""
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, reserve=RETRY_BUDGET_RESERVE):
+        self.ratio = ratio
+        self.capacity = reserve
+        self.tokens = float(reserve)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.tokens + self.ratio, self.capacity)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """Opens after threshold consecutive failures. While open, requests fail without being
+    sent. After reset_seconds one request (the probe) is let through while all others keep
+    failing, and its outcome closes the breaker or opens it again."""
+
+    def __init__(self, threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def check(self, host):
+        """Raises CircuitOpenError if the request can't be sent, returns whether it is the probe"""
+        with self._lock:
+            if self.opened is None:
+                return False
+            if self.probing:
+                raise CircuitOpenError(f'Requests to {host} failed {self.failures} times in a row, '
+                                       'waiting for a request checking whether it recovered')
+            remaining = self.opened + self.reset_seconds - monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(f'Requests to {host} failed {self.failures} times in a row, '
+                                       f'not sending requests for another {remaining:.0f}s')
+            self.probing = True
+            return True
+
+    def record(self, host, success, probe=False):
+        with self._lock:
+            if probe:
+                self.probing = False
+            if success:
+                self.failures = 0
+                if probe:
+                    self.opened = None
+                return
+            self.failures += 1
+            if probe or (self.failures >= self.threshold and self.opened is None):
+                logger.warning('Requests to %s failed %d times in a row, pausing requests for %ds',
+                               host, self.failures, self.reset_seconds)
+                self.opened = monotonic()
+
+    def release(self, probe):
+        """Lets another request probe the host when the probe ended without an outcome, e.g. cancelled"""
+        if probe:
+            with self._lock:
+                self.probing = False
+
+
+_budget = RetryBudget()
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(host):
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker()
+        return _breakers[host]
+
+
+def decorrelated_jitter(previous, base=DEFAULT_BACKOFF, cap=DEFAULT_MAX_BACKOFF):
+    """Next delay between base and three times the previous one, so parallel clients that
+    fail together don't retry together"""
+    return min(cap, random.uniform(base, max(previous, base) * 3))
+
+
+class _AdaptiveRetryMixin:
+
+    def get_backoff_time(self, settings):
+        # the delay when there's no Retry-After header, which azure.core honors first
+        delay = decorrelated_jitter(settings.get('jitter', 0), settings['backoff'], settings['max_backoff'])
+        settings['jitter'] = delay
+        return delay
+
+    def increment(self, settings, response=None, error=None):
+        if not super().increment(settings, response=response, error=error):
+            return False
+        if not _budget.withdraw():
+            logger.debug('Retry budget exhausted, not retrying')
+            return False
+        return True
+
+    @staticmethod
+    def _start(request):
+        host = urlparse(request.http_request.url).netloc
+        breaker = get_circuit_breaker(host)
+        probe = breaker.check(host)
+        _budget.deposit()
+        return host, breaker, probe
+
+
+class AdaptiveRetryPolicy(_AdaptiveRetryMixin, RetryPolicy):
+    """RetryPolicy with decorrelated jitter, the process retry budget and a circuit breaker per host"""
+
+    def send(self, request):
+        host, breaker, probe = self._start(request)
+        try:
+            response = super().send(request)
+        except (ServiceRequestError, ServiceResponseError):
+            breaker.record(host, False, probe)
+            raise
+        except BaseException:
+            # cancelled, or failed in a way that says nothing about the host
+            breaker.release(probe)
+            raise
+        breaker.record(host, response.http_response.status_code < 500, probe)
+        return response
+
+
+class AsyncAdaptiveRetryPolicy(_AdaptiveRetryMixin, AsyncRetryPolicy):
+    """AsyncRetryPolicy with decorrelated jitter, the process retry budget and a circuit breaker per host"""
+
+    async def send(self, request):
+        host, breaker, probe = self._start(request)
+        try:
+            response = await super().send(request)
+        except (ServiceRequestError, ServiceResponseError):
+            breaker.record(host, False, probe)
+            raise
+        except BaseException:
+            # cancelled, or failed in a way that says nothing about the host
+            breaker.release(probe)
+            raise
+        breaker.record(host, response.http_response.status_code < 500, probe)
+        return response
+
+
+def _retry_after(response):
+    from email.utils import parsedate_to_datetime
+    from datetime import datetime, timezone
+
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_get(url, retries=DEFAULT_RETRIES, **kwargs):
+    """requests.get with the same retry behavior as the TeamCloud client: retries connection
+    errors and RETRY_STATUS_CODES honoring Retry-After, with decorrelated jitter otherwise,
+    within the retry budget and the host's circuit breaker"""
+    import requests
+
+    host = urlparse(url).netloc
+    breaker = get_circuit_breaker(host)
+    try:
+        probe = breaker.check(host)
+    except CircuitOpenError as e:
+        raise CLIError(str(e)) from e
+    _budget.deposit()
+
+    delay = 0
+    recorded = False
+    try:
+        for attempt in range(retries + 1):
+            try:
+                response = requests.get(url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == retries or not _budget.withdraw():
+                    recorded = True
+                    breaker.record(host, False, probe)
+                    raise
+                delay = decorrelated_jitter(delay)
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == retries or not _budget.withdraw():
+                    recorded = True
+                    breaker.record(host, response.status_code < 500, probe)
+                    return response
+                retry_after = _retry_after(response)
+                delay = retry_after if retry_after is not None else decorrelated_jitter(delay)
+            logger.debug('Retrying %s in %.1fs', url, delay)
+            sleep(delay)
+    finally:
+        if not recorded:
+            breaker.release(probe)
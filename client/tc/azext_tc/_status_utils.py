@@ -0,0 +1,117 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import re
+import asyncio
+from collections import namedtuple
+from time import monotonic
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+from ._async_utils import gather_bounded
+
+logger = get_logger(__name__)
+
+DEFAULT_STATUS_INTERVAL = 2
+MAX_STATUS_INTERVAL = 30
+STATUS_BACKOFF = 2
+
+FAILED_STATES = ['failed', 'canceled', 'terminated']
+
+# accepted results point to the status endpoint, i.e. orgs/{org}/status/{id} or orgs/{org}/projects/{p}/status/{id}
+_STATUS_LOCATION = re.compile(r'/orgs/(?P<org>[^/]+)/(?:projects/(?P<project>[^/]+)/)?status/(?P<tracking_id>[^/?#]+)',
+                              re.IGNORECASE)
+
+StatusTarget = namedtuple('StatusTarget', ['tracking_id', 'org', 'project'])
+
+
+def is_pending(result):
+    return getattr(result, 'code', None) == 202 or getattr(result, 'status', None) == 'Accepted'
+
+
+def is_failed(result):
+    from .vendored_sdks.teamcloud.models import ErrorResult
+    return isinstance(result, ErrorResult) or bool(getattr(result, 'errors', None)) \
+        or (getattr(result, 'state', None) or '').lower() in FAILED_STATES
+
+
+def get_status_target(result, org=None, project=None):
+    """Returns the StatusTarget to poll for a pending StatusResult, or None if it has completed"""
+    if not is_pending(result):
+        return None
+    location = _STATUS_LOCATION.search(getattr(result, 'location', None) or '')
+    if location:
+        return StatusTarget(location.group('tracking_id'), location.group('org'), location.group('project'))
+    if result.tracking_id and org:
+        return StatusTarget(result.tracking_id, org, project)
+    logger.warning('Unable to track operation %s, no status location returned', result.tracking_id)
+    return None
+
+
+class StatusPoller:
+    """Tracks many operations at once. Each target has its own exponential backoff
+    but all due targets are fetched together on a shared schedule, concurrently.
+    Subclasses can poll other resources by overriding _get, is_pending and is_failed."""
+
+    is_pending = staticmethod(is_pending)
+    is_failed = staticmethod(is_failed)
+
+    def __init__(self, client, interval=DEFAULT_STATUS_INTERVAL, max_interval=MAX_STATUS_INTERVAL,
+                 max_concurrency=None, on_progress=None):
+        self.client = client
+        self.interval = interval
+        self.max_interval = max_interval
+        self.max_concurrency = max_concurrency
+        self.on_progress = on_progress
+        self.results = {}
+
+    async def _get(self, target):
+        if target.project:
+            return await self.client.get_project_status(target.project, target.tracking_id, target.org)
+        return await self.client.get_status(target.tracking_id, target.org)
+
+    async def wait(self, targets, timeout=None):
+        """Polls until no target is pending, returns a dict of target to final result"""
+        started = monotonic()
+        delays = {t: self.interval for t in targets}
+        due = {t: started + self.interval for t in targets}
+
+        self._progress(len(targets))
+
+        while due:
+            now = monotonic()
+            if timeout and now - started >= timeout:
+                raise CLIError(f'Timed out after {timeout} seconds with {len(due)} of {len(targets)} '
+                               'operations still running')
+
+            wake = min(due.values())
+            if timeout:
+                wake = min(wake, started + timeout)
+            if wake > now:
+                await asyncio.sleep(wake - now)
+                continue
+
+            batch = [t for t, d in due.items() if d <= now]
+            results = await gather_bounded([self._get(t) for t in batch], self.max_concurrency)
+
+            for target, result in zip(batch, results):
+                self.results[target] = result
+                if self.is_pending(result):
+                    delays[target] = min(delays[target] * STATUS_BACKOFF, self.max_interval)
+                    due[target] = monotonic() + delays[target]
+                else:
+                    del due[target]
+                    logger.info('Operation %s completed', target[0])
+
+            self._progress(len(targets))
+
+        return self.results
+
+    def _progress(self, total):
+        if self.on_progress:
+            done = sum(1 for r in self.results.values() if not self.is_pending(r))
+            failed = sum(1 for r in self.results.values() if not self.is_pending(r) and self.is_failed(r))
+            self.on_progress(done, failed, total)
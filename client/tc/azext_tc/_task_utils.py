@@ -0,0 +1,325 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import asyncio
+from collections import namedtuple
+from time import monotonic
+from urllib.parse import urlsplit, urlunsplit, urlencode
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+from ._async_utils import gather_bounded
+from ._model_utils import find_item, result_data
+from ._status_utils import StatusPoller
+
+logger = get_logger(__name__)
+
+TERMINAL_TASK_STATES = ['succeeded', 'failed', 'canceled']
+
+DEFAULT_POLL_INTERVAL = 5
+MAX_POLL_INTERVAL = 60
+POLL_BACKOFF = 1.5
+
+# SignalR json hub protocol
+_RECORD_SEPARATOR = '\x1e'
+_INVOCATION, _PING, _CLOSE = 1, 6, 7
+
+
+def is_terminal(task):
+    return (task.task_state or '').lower() in TERMINAL_TASK_STATES
+
+
+async def negotiate_hub(client, org, project):
+    """Returns the SignalR service url and access token for the project hub,
+    or None if the caller is not allowed to connect"""
+    def _cls(pipeline_response, *_):
+        response = pipeline_response.http_response
+        return json.loads(response.text()) if response.status_code == 200 else None
+
+    return await client.negotiate_signal_r(org, project, cls=_cls)
+
+
+class TaskHub:
+    """Minimal SignalR client for the Azure SignalR service using the json hub
+    protocol over a websocket. Requires aiohttp, callers fall back to polling
+    when connecting fails."""
+
+    def __init__(self, url, access_token):
+        self.url = url
+        self.access_token = access_token
+        self.notifications = asyncio.Queue()
+        self._session = None
+        self._socket = None
+        self._reader = None
+
+    def _endpoint(self, path, **query):
+        parts = urlsplit(self.url)
+        query_string = '&'.join(q for q in [parts.query, urlencode(query)] if q)
+        return urlunsplit((parts.scheme, parts.netloc, parts.path.rstrip('/') + path, query_string, ''))
+
+    async def open(self):
+        import aiohttp
+
+        self._session = aiohttp.ClientSession(headers={'Authorization': f'Bearer {self.access_token}'})
+        try:
+            async with self._session.post(self._endpoint('/negotiate', negotiateVersion=1)) as response:
+                response.raise_for_status()
+                negotiation = await response.json(content_type=None)
+
+            token = negotiation.get('connectionToken') or negotiation['connectionId']
+            url = self._endpoint('/', id=token, access_token=self.access_token)
+            # https -> wss, http -> ws
+            self._socket = await self._session.ws_connect('ws' + url[len('http'):], heartbeat=15)
+
+            await self._socket.send_str(json.dumps({'protocol': 'json', 'version': 1}) + _RECORD_SEPARATOR)
+            handshake = json.loads((await self._socket.receive_str()).split(_RECORD_SEPARATOR)[0] or '{}')
+            if handshake.get('error'):
+                raise CLIError(f"SignalR handshake failed: {handshake['error']}")
+        except Exception:
+            await self.close()
+            raise
+
+        self._reader = asyncio.ensure_future(self._read())
+        return self
+
+    async def _read(self):
+        from aiohttp import WSMsgType
+        try:
+            async for message in self._socket:
+                if message.type in [WSMsgType.CLOSE, WSMsgType.CLOSING, WSMsgType.CLOSED, WSMsgType.ERROR]:
+                    logger.debug('SignalR connection lost: %r', message.data or self._socket.exception())
+                    return
+                if message.type != WSMsgType.TEXT:
+                    continue
+                for record in message.data.split(_RECORD_SEPARATOR):
+                    if not record:
+                        continue
+                    data = json.loads(record)
+                    if data.get('type') == _INVOCATION:
+                        for argument in data.get('arguments') or []:
+                            self.notifications.put_nowait(argument)
+                    elif data.get('type') == _CLOSE:
+                        logger.debug('SignalR connection closed by server: %s', data.get('error'))
+                        return
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.debug('SignalR connection failed: %s', ex)
+        finally:
+            # wake up waiters so they fall back to polling
+            self.notifications.put_nowait(None)
+
+    @property
+    def connected(self):
+        return self._reader is not None and not self._reader.done()
+
+    async def close(self):
+        if self._reader:
+            self._reader.cancel()
+        if self._socket:
+            await self._socket.close()
+        if self._session:
+            await self._session.close()
+
+
+async def open_task_hub(client, org, project):
+    """Connects to the project hub, returning None if push notifications are unavailable"""
+    try:
+        import aiohttp  # noqa: F401 pylint: disable=unused-import
+    except ImportError:
+        logger.debug('aiohttp not installed, polling for task updates')
+        return None
+
+    try:
+        negotiation = await negotiate_hub(client, org, project)
+        if not negotiation:
+            return None
+        return await TaskHub(negotiation['url'], negotiation['accessToken']).open()
+    except Exception as ex:  # pylint: disable=broad-except
+        logger.debug('Failed to connect to SignalR, polling for task updates: %s', ex)
+        return None
+
+
+def _mentions(notification, task_id):
+    items = (notification or {}).get('items') or []
+    return any(i.get('id') == task_id for i in items if isinstance(i, dict))
+
+
+async def _next_update(hub, task_id, timeout):
+    """Waits up to timeout seconds for a push notification about the task.
+    Returns True if one arrived, False if the wait timed out or the hub dropped."""
+    deadline = monotonic() + timeout
+    while hub and hub.connected:
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            return False
+        try:
+            notification = await asyncio.wait_for(hub.notifications.get(), remaining)
+        except asyncio.TimeoutError:
+            return False
+        if notification is None:
+            return False
+        if _mentions(notification, task_id):
+            return True
+    await asyncio.sleep(max(deadline - monotonic(), 0))
+    return False
+
+
+async def watch_task(client, org, project, component, task_id, timeout=None,
+                     interval=DEFAULT_POLL_INTERVAL, on_update=None):
+    """Gets the task until it reaches a terminal state, calling on_update with
+    each changed version. Waits on SignalR push notifications for the project
+    when available, polling with backoff otherwise (and as a safety net)."""
+    started = monotonic()
+    task = await client.get_component_task(task_id, org, project, component)
+    task = getattr(task, 'data', None)
+    if task is None:
+        raise CLIError(f"Component task '{task_id}' not found")
+
+    if on_update:
+        on_update(task)
+    if is_terminal(task):
+        return task
+
+    hub = await open_task_hub(client, org, project)
+    logger.info('Waiting for task %s using %s', task_id, 'SignalR' if hub else 'polling')
+
+    delay = interval
+    try:
+        while True:
+            wait = MAX_POLL_INTERVAL if hub and hub.connected else delay
+            if timeout:
+                remaining = timeout - (monotonic() - started)
+                if remaining <= 0:
+                    raise CLIError(f"Timed out after {timeout} seconds waiting for task '{task_id}' "
+                                   f"(state: {task.task_state})")
+                wait = min(wait, remaining)
+
+            pushed = await _next_update(hub, task_id, wait)
+
+            result = await client.get_component_task(task_id, org, project, component)
+            current = getattr(result, 'data', None) or task
+
+            changed = (current.task_state, current.output) != (task.task_state, task.output)
+            task = current
+            if changed and on_update:
+                on_update(task)
+            if is_terminal(task):
+                return task
+
+            delay = interval if changed or pushed else min(delay * POLL_BACKOFF, MAX_POLL_INTERVAL)
+    finally:
+        if hub:
+            await hub.close()
+
+
+TaskTarget = namedtuple('TaskTarget', ['task_id', 'org', 'project', 'component'])
+
+
+def _task_pending(result):
+    task = getattr(result, 'data', None)
+    return task is not None and not is_terminal(task)
+
+
+def _task_failed(result):
+    task = getattr(result, 'data', None)
+    return task is None or (task.task_state or '').lower() != 'succeeded'
+
+
+class TaskPoller(StatusPoller):
+    """Polls many component tasks to a terminal state on a shared schedule"""
+
+    is_pending = staticmethod(_task_pending)
+    is_failed = staticmethod(_task_failed)
+
+    async def _get(self, target):
+        return await self.client.get_component_task(target.task_id, target.org, target.project, target.component)
+
+
+class TaskRun:  # pylint: disable=too-few-public-methods
+
+    def __init__(self, component):
+        self.component = component
+        self.task = None
+        self.status = None
+        self.state = 'planned'
+        self.error = None
+
+    def update(self, result):
+        from .vendored_sdks.teamcloud.models import ErrorResult, StatusResult
+        if isinstance(result, ErrorResult):
+            self.state = 'Failed'
+            self.error = '; '.join(e.message for e in result.errors or []) or result.status
+        elif isinstance(result, StatusResult):
+            self.status = result
+            self.state = 'Accepted'
+        elif getattr(result, 'data', None) is not None:
+            self.task = result.data
+            self.state = self.task.task_state
+
+    @property
+    def target(self):
+        return TaskTarget(self.task.id, self.component.organization, self.component.project_id, self.component.id) \
+            if self.task else None
+
+    def to_dict(self):
+        result = {
+            'project': self.component.project_name or self.component.project_id,
+            'component': self.component.display_name,
+            'type': self.component.type,
+            'taskId': self.task.id if self.task else None,
+            'state': self.state,
+            'exitCode': self.task.exit_code if self.task else None
+        }
+        if self.error:
+            result['error'] = self.error
+        return result
+
+
+async def find_components(client, org, project=None, component_type=None, template=None, max_concurrency=None):
+    """Lists components of one or all projects in the org, filtered by type and component template"""
+    if project:
+        projects = [project]
+    else:
+        projects = [p.id for p in result_data(await client.get_projects(org), 'projects')]
+
+    results = await gather_bounded([client.get_components(org, p) for p in projects], max_concurrency)
+    components = [c for p, r in zip(projects, results) for c in result_data(r, f"components of project '{p}'")]
+
+    if component_type:
+        components = [c for c in components if (c.type or '').lower() == component_type.lower()]
+
+    if template:
+        template_ids = {template.lower()}
+        results = await gather_bounded([client.get_component_templates(org, p)
+                                        for p in {c.project_id for c in components}], max_concurrency)
+        for result in results:
+            match = find_item(getattr(result, 'data', None) or [], template)
+            if match:
+                template_ids.add(match.id.lower())
+        components = [c for c in components if (c.template_id or '').lower() in template_ids]
+
+    return components
+
+
+async def run_tasks(client, components, task, input_json=None, max_concurrency=None, rate_limit=None,
+                    on_result=None):
+    """Creates a task on every component concurrently, calling on_result as each one is submitted"""
+    from .vendored_sdks.teamcloud.models import ComponentTaskDefinition
+
+    definition = ComponentTaskDefinition(task_id=task, input_json=input_json)
+
+    async def _run(run):
+        try:
+            run.update(await client.create_component_task(run.component.organization, run.component.project_id,
+                                                          run.component.id, definition))
+        except Exception as ex:  # pylint: disable=broad-except
+            run.state = 'Failed'
+            run.error = str(ex)
+        if on_result:
+            on_result(run)
+        return run
+
+    return await gather_bounded([_run(TaskRun(c)) for c in components], max_concurrency, rate_limit=rate_limit)
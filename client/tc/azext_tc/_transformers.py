@@ -5,22 +5,33 @@
 
 from collections import OrderedDict
 from knack.log import get_logger
-from .vendored_sdks.teamcloud.models import (ErrorResult, StatusResult)
 
 logger = get_logger(__name__)
 
 
 def transform_output(result):
+    # the sdk models are imported on first use so loading the command table doesn't import the sdk
+    from .vendored_sdks.teamcloud.models import (ErrorResult, StatusResult)
 
     if result is None:
         logger.warning('Consider raising exception')
 
+    if isinstance(result, list):
+        return [transform_output(r) for r in result]
+
     if isinstance(result, ErrorResult):
         return transform_error(result)
 
     if isinstance(result, StatusResult):
         return transform_status(result)
 
+    # --raw returns the json body, DataResults have data and ErrorResults have errors
+    if isinstance(result, dict):
+        if 'data' not in result:
+            logger.error('Error: %s', result.get('status'))
+            return result
+        return result['data']
+
     # assume DataResult
     try:
         return result.data
@@ -56,13 +67,13 @@ def transform_org_table_output(result):
 
     for item in result:
         resultList.append(OrderedDict([
-            ('Name', item['displayName']),
-            ('Slug', item['slug']),
-            ('ID', item['id']),
-            ('Location', item['location']),
-            ('State', item['resourceState']),
-            ('Subscription', item['subscriptionId']),
-            ('Tags', str(item['tags'])),
+            ('Name', item.get('displayName')),
+            ('Slug', item.get('slug')),
+            ('ID', item.get('id')),
+            ('Location', item.get('location')),
+            ('State', item.get('resourceState')),
+            ('Subscription', item.get('subscriptionId')),
+            ('Tags', str(item.get('tags'))),
         ]))
 
     return resultList
@@ -76,12 +87,12 @@ def transform_scope_table_output(result):
 
     for item in result:
         resultList.append(OrderedDict([
-            ('Name', item['displayName']),
-            ('Slug', item['slug']),
-            ('Type', item['type']),
-            ('ID', item['id']),
-            ('Authorized', item['authorized']),
-            ('Component Types', ','.join(item['componentTypes'])),
+            ('Name', item.get('displayName')),
+            ('Slug', item.get('slug')),
+            ('Type', item.get('type')),
+            ('ID', item.get('id')),
+            ('Authorized', item.get('authorized')),
+            ('Component Types', ','.join(item.get('componentTypes') or [])),
         ]))
 
     return resultList
@@ -94,21 +105,42 @@ def transform_template_table_output(result):
     resultList = []
 
     for item in result:
-        repo = item['repository']
+        repo = item.get('repository') or {}
         # components = item['components']
         resultList.append(OrderedDict([
-            ('Name', item['displayName']),
-            ('Slug', item['slug']),
-            ('ID', item['id']),
-            ('Default', item['isDefault']),
-            ('Repository', '' if repo is None or repo['url'] is None else repo['url']),
-            ('Version', '' if repo is None or repo['version'] is None else repo['version'])
+            ('Name', item.get('displayName')),
+            ('Slug', item.get('slug')),
+            ('ID', item.get('id')),
+            ('Default', item.get('isDefault')),
+            ('Repository', repo.get('url') or ''),
+            ('Version', repo.get('version') or '')
             # ('Components', '' if components is None else '\n'.join(components))
         ]))
 
     return resultList
 
 
+def transform_audit_stats_table_output(result):
+    if not isinstance(result, list):
+        result = [result]
+
+    resultList = []
+
+    for item in result:
+        resultList.append(OrderedDict([
+            ('Command', item['command']),
+            ('Count', item['count']),
+            ('Failed', item['failed']),
+            ('Failure %', round(item['failureRatio'] * 100, 2)),
+            ('Per Hour', item['perHour']),
+            ('P50 (s)', '' if item['p50'] is None else item['p50']),
+            ('P90 (s)', '' if item['p90'] is None else item['p90']),
+            ('P99 (s)', '' if item['p99'] is None else item['p99'])
+        ]))
+
+    return resultList
+
+
 def transform_tag_table_output(result):
     if not isinstance(result, dict):
         result = {}
@@ -0,0 +1,76 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import threading
+
+from knack.events import EVENT_CLI_POST_EXECUTE
+from knack.log import get_logger
+from azure.core.pipeline.transport import RequestsTransport
+
+logger = get_logger(__name__)
+
+# connections kept alive per host, `az config set tc.pool_size=<n>` to change
+DEFAULT_POOL_SIZE = 10
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+class PooledTransport(RequestsTransport):
+    """RequestsTransport with a configurable connection pool, shared by all TeamCloud
+    clients in the process so requests reuse kept-alive connections across clients"""
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, **kwargs):
+        super().__init__(**kwargs)
+        self.pool_size = pool_size
+
+    def _init_session(self, session):
+        super()._init_session(session)
+        # same adapter (and retry settings) as azure.core mounts, with a larger pool
+        adapter = session.get_adapter('https://')
+        adapter = type(adapter)(max_retries=adapter.max_retries, pool_maxsize=self.pool_size)
+        for protocol in self._protocols:
+            session.mount(protocol, adapter)
+
+    def close(self):
+        # clients closing (or leaving a with block) must not close the shared session
+        pass
+
+    def get_pool_stats(self):
+        """Returns the connections opened, requests sent and idle connections per host"""
+        if not self.session:
+            return []
+        stats = []
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    # the pool's queue is padded with None for the connections it hasn't opened
+                    idle = sum(1 for c in list(pool.pool.queue) if c is not None) if pool.pool else 0
+                    stats.append({'host': f'{pool.scheme}://{pool.host}:{pool.port}',
+                                  'connections': pool.num_connections, 'requests': pool.num_requests,
+                                  'idle': idle, 'size': self.pool_size})
+        return stats
+
+
+def _log_pool_stats(_, **__):
+    for stats in _transport.get_pool_stats() if _transport else []:
+        logger.debug('TeamCloud connection pool %(host)s: %(connections)d connections opened, '
+                     '%(requests)d requests, %(idle)d idle of %(size)d', stats)
+
+
+def get_shared_transport(cli_ctx):
+    """Returns the process-wide transport, logging its pool statistics under --debug
+    when each command invoked on cli_ctx finishes"""
+    global _transport  # pylint: disable=global-statement
+    with _transport_lock:
+        if _transport is None:
+            pool_size = cli_ctx.config.getint('tc', 'pool_size', fallback=DEFAULT_POOL_SIZE)
+            _transport = PooledTransport(pool_size=max(pool_size, 1))
+    # a cli instance runs several commands in tc batch and the daemon, register the handler once
+    cli_ctx.unregister_event(EVENT_CLI_POST_EXECUTE, _log_pool_stats)
+    cli_ctx.register_event(EVENT_CLI_POST_EXECUTE, _log_pool_stats)
+    return _transport
@@ -10,20 +10,14 @@ from knack.log import get_logger
 from azure.cli.core.util import CLIError
 from azure.cli.core.commands.validators import validate_tags
 
-from ._client_factory import web_client_factory, teamcloud_client_factory
-from ._deploy_utils import github_release_version_exists
-
-from .vendored_sdks.teamcloud.models import ErrorResult
-
 
 logger = get_logger(__name__)
 
 
-def _ensure_base_url(client, base_url):
-    client._client._base_url = base_url
-
-
 def tc_deploy_validator(cmd, ns):
+    from ._client_factory import web_client_factory
+    from ._deploy_utils import github_release_version_exists
+
     if ns.principal_name is not None:
         if ns.principal_password is None:
             raise CLIError(
@@ -86,6 +80,10 @@ def org_name_validator(cmd, ns):
 
 
 def org_name_or_id_validator(cmd, ns):
+    from ._cache import get_org_id_cache
+    from ._client_factory import teamcloud_client_factory
+    from .vendored_sdks.teamcloud.models import ErrorResult
+
     if ns.org:
         if _is_valid_uuid(ns.org):
             return
@@ -93,14 +91,32 @@ def org_name_or_id_validator(cmd, ns):
             raise CLIError(
                 '--org should be a valid uuid or a org name string with length [2,31]')
 
-        client = teamcloud_client_factory(cmd.cli_ctx)
-        _ensure_base_url(client, ns.base_url)
+        org_cache = get_org_id_cache(cmd.cli_ctx)
+        org_id = org_cache.get(ns.base_url, ns.org)
+        if org_id:
+            ns.org = org_id
+            return
+
+        # --offline and --max-staleness resolve names from the local mirror when they can
+        offline = getattr(ns, 'offline', False)
+        if offline or getattr(ns, 'max_staleness', None):
+            from ._mirror import get_mirror
+            org_id = get_mirror(cmd.cli_ctx).resolve_org(ns.base_url, ns.org)
+            if org_id:
+                ns.org = org_id
+                return
+            if offline:
+                raise CLIError(
+                    '--org no org found in the local mirror matching provided org name or id, run `az tc sync` first')
+
+        client = teamcloud_client_factory(cmd.cli_ctx, {'base_url': ns.base_url})
         result = client.get_organization(ns.org)
 
         if result is None or isinstance(result, ErrorResult):
             raise CLIError(
                 '--org no org found matching provided org name or id')
         try:
+            org_cache.set(ns.base_url, ns.org, result.data.id)
             ns.org = result.data.id
         except AttributeError:
             pass
@@ -183,6 +199,8 @@ def source_version_validator(cmd, ns):
 
 
 def teamcloud_source_version_validator(cmd, ns):
+    from ._deploy_utils import github_release_version_exists
+
     if ns.version:
         if ns.prerelease or ns.index_url:
             raise CLIError(
@@ -199,6 +217,8 @@ def teamcloud_source_version_validator(cmd, ns):
 
 
 def teamcloud_cli_source_version_validator(cmd, ns):
+    from ._deploy_utils import github_release_version_exists
+
     if ns.version:
         if ns.prerelease:
             raise CLIError(
@@ -214,6 +234,25 @@ def teamcloud_cli_source_version_validator(cmd, ns):
             raise CLIError(f'--version/-v {ns.version} does not exist')
 
 
+def time_range_validator(cmd, ns):
+    if ns.time_range:
+        from ._audit_utils import to_timespan
+        time_range = to_timespan(ns.time_range)
+        if time_range is None:
+            raise CLIError(
+                '--time-range should be a number followed by d, h or m (e.g. 30d) or a timespan (d.hh:mm:ss)')
+        ns.time_range = time_range
+
+
+def max_staleness_validator(cmd, ns):
+    if ns.max_staleness:
+        from ._mirror import parse_duration
+        max_staleness = parse_duration(ns.max_staleness)
+        if max_staleness is None:
+            raise CLIError('--max-staleness should be a number followed by s, m, h or d (e.g. 5m) or seconds')
+        ns.max_staleness = max_staleness
+
+
 def properties_validator(cmd, ns):
     if isinstance(ns.properties, list):
         properties_dict = {}
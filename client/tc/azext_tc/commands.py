@@ -3,9 +3,11 @@
 # Licensed under the MIT License. See License.txt in the project root for license information.
 # --------------------------------------------------------------------------------------------
 
+from azure.cli.core.commands import CliCommandType
+
 from ._client_factory import teamcloud_client_factory
 from ._transformers import (transform_output, transform_org_table_output, transform_template_table_output,
-                            transform_scope_table_output)
+                            transform_scope_table_output, transform_audit_stats_table_output)
 from ._validators import tc_deploy_validator
 
 
@@ -19,6 +21,18 @@ def load_command_table(self, _):  # pylint: disable=too-many-statements
     with self.command_group('tc') as g:
         g.custom_command('update', 'teamcloud_update')
         g.custom_command('deploy', 'teamcloud_deploy', validator=tc_deploy_validator)
+        g.custom_command('batch', 'teamcloud_batch')
+        g.custom_command('sync', 'teamcloud_sync')
+
+    # Daemon
+
+    # the daemon commands don't call the api, so they don't need a client (or a login)
+    tc_daemon_custom = CliCommandType(operations_tmpl='azext_tc.custom#{}')
+
+    with self.command_group('tc daemon', custom_command_type=tc_daemon_custom, is_experimental=True) as g:
+        g.custom_command('start', 'daemon_start')
+        g.custom_command('stop', 'daemon_stop')
+        g.custom_command('status', 'daemon_status')
 
     # Orgs
 
@@ -30,6 +44,31 @@ def load_command_table(self, _):  # pylint: disable=too-many-statements
         g.custom_command('list', 'org_list', transform=transform_output,
                          table_transformer=transform_org_table_output)
         g.custom_show_command('show', 'org_get', transform=transform_output)
+        g.custom_command('export', 'org_export')
+        g.custom_command('apply', 'org_apply')
+
+    # Audit
+
+    with self.command_group('tc audit', client_factory=teamcloud_client_factory) as g:
+        g.custom_command('export', 'audit_export')
+        g.custom_command('stats', 'audit_stats', table_transformer=transform_audit_stats_table_output)
+
+    # Component Tasks
+
+    with self.command_group('tc task', client_factory=teamcloud_client_factory) as g:
+        g.custom_command('wait', 'task_wait')
+        g.custom_command('watch', 'task_watch')
+        g.custom_command('run', 'task_run')
+
+    # Projects
+
+    with self.command_group('tc project', client_factory=teamcloud_client_factory) as g:
+        g.custom_command('bulk-create', 'project_bulk_create')
+
+    # Status
+
+    with self.command_group('tc status', client_factory=teamcloud_client_factory) as g:
+        g.custom_command('wait', 'status_wait', transform=transform_output)
 
     # Deployment Scopes
 
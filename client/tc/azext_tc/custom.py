@@ -7,6 +7,7 @@
 
 from knack.util import CLIError
 from knack.log import get_logger
+from ._cache import get_org_id_cache
 
 logger = get_logger(__name__)
 
@@ -144,9 +145,138 @@ def teamcloud_deploy(cmd, name, client_id, location=None, resource_group_name='T
     return result
 
 
+def teamcloud_batch(cmd, client, file, parallel=None, continue_on_error=False, results_file=None):
+    import sys
+    import json
+    from ._batch_utils import load_operations, BatchRunner
+
+    groups = load_operations(file)
+    total = sum(len(g) for g in groups)
+
+    out = open(results_file, 'w', encoding='utf-8') if results_file else sys.stdout  # pylint: disable=R1732
+
+    def _on_result(operation):
+        out.write(json.dumps(operation.to_dict(), default=str) + '\n')
+        out.flush()
+        if operation.status == 'failed':
+            logger.warning('line %d: %s failed: %s', operation.line, operation.text, operation.error or 'error')
+
+    # the clients cached for this command are shared by every operation in the batch
+    runner = BatchRunner(cmd.cli_ctx.data['tc_clients'], parallel=parallel, continue_on_error=continue_on_error,
+                         on_result=_on_result)
+    try:
+        operations = runner.run(groups)
+    finally:
+        if results_file:
+            out.close()
+
+    failed = sum(1 for o in operations if o.status == 'failed')
+    skipped = sum(1 for o in operations if o.status == 'skipped')
+    if failed:
+        raise CLIError(f'{failed} of {total} commands failed' + (f', {skipped} skipped' if skipped else ''))
+
+
+# Mirror
+
+def teamcloud_sync(cmd, client, base_url, org=None, full=False, max_concurrency=None):
+    from datetime import datetime, timezone
+    from ._async_utils import run_async
+    from ._client_factory import teamcloud_async_client_factory
+    from ._deserializer import raw_client
+    from ._mirror import get_mirror, get_delta_max_age, sync_mirror
+
+    async def _sync():
+        async with teamcloud_async_client_factory(cmd.cli_ctx, base_url) as async_client:
+            return await sync_mirror(raw_client(async_client), get_mirror(cmd.cli_ctx), base_url, org=org, full=full,
+                                     max_age=get_delta_max_age(cmd.cli_ctx), max_concurrency=max_concurrency)
+
+    result = run_async(_sync())
+    result['synced'] = datetime.now(timezone.utc).isoformat()
+    if result['failed']:
+        raise CLIError(f"Failed to sync {len(result['failed'])} orgs, they keep their previously mirrored data")
+    return result
+
+
+# Daemon
+
+def daemon_start(cmd, idle_timeout=None):
+    import os
+    import sys
+    import subprocess
+    from time import sleep
+    from ._cache import get_cache_dir
+    from ._daemon import DEFAULT_IDLE_TIMEOUT
+    from ._daemon_client import request
+
+    status = daemon_status(cmd)
+    if status['running']:
+        logger.warning('The tc daemon is already running (pid %s)', status['pid'])
+        return status
+
+    path = status['socket']
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+
+    # run the daemon with the same python and extension path as this cli
+    env = dict(os.environ)
+    extension_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(p for p in [extension_path, env.get('PYTHONPATH')] if p)
+
+    args = [sys.executable, '-m', 'azext_tc._daemon', '--socket', path,
+            '--idle-timeout', str(DEFAULT_IDLE_TIMEOUT if idle_timeout is None else idle_timeout)]
+    with open(get_cache_dir(cmd.cli_ctx, 'daemon', 'daemon.log'), 'a', encoding='utf-8') as log:
+        subprocess.Popen(args, env=env, stdin=subprocess.DEVNULL, stdout=log, stderr=log,  # pylint: disable=R1732
+                         start_new_session=True)
+
+    for _ in range(120):
+        sleep(0.5)
+        try:
+            request({'command': 'ping'}, path, timeout=5)
+            break
+        except OSError:
+            continue
+    else:
+        raise CLIError(f"The tc daemon didn't start, see {get_cache_dir(cmd.cli_ctx, 'daemon', 'daemon.log')}")
+
+    status = daemon_status(cmd)
+    logger.warning('Run tc commands through the daemon with: python %s <command> [args]', status['client'])
+    return status
+
+
+def daemon_stop(cmd):
+    from ._daemon_client import request
+
+    status = daemon_status(cmd)
+    if not status['running']:
+        logger.warning('The tc daemon is not running')
+        return status
+
+    request({'command': 'shutdown'}, status['socket'], timeout=30)
+    return daemon_status(cmd)
+
+
+def daemon_status(cmd):
+    import os
+    from ._cache import get_cache_dir
+    from ._daemon_client import request, __file__ as client
+
+    path = get_cache_dir(cmd.cli_ctx, 'daemon', 'daemon.sock')
+    try:
+        status = request({'command': 'ping'}, path, timeout=5) or {}
+    except OSError:
+        status = {}
+
+    return {
+        'running': bool(status),
+        'pid': status.get('pid'),
+        'requests': status.get('requests'),
+        'socket': path,
+        'client': os.path.abspath(client)
+    }
+
+
 # Orgs
 
-def org_create(cmd, client, base_url, name, location=None):
+def org_create(cmd, client, base_url, name, location=None, wait=False):
     from .vendored_sdks.teamcloud.models import OrganizationDefinition
     from azure.cli.core.commands.client_factory import get_subscription_id
 
@@ -154,24 +284,275 @@ def org_create(cmd, client, base_url, name, location=None):
 
     payload = OrganizationDefinition(display_name=name, subscription_id=subscription_id, location=location)
 
-    return _create(cmd, client, base_url, client.create_organization, payload)
+    get_org_id_cache(cmd.cli_ctx).invalidate(base_url, name=name)
 
+    result = _create(cmd, client, base_url, client.create_organization, payload)
+    return _wait_for_status(cmd, base_url, result) if wait else result
 
-def org_delete(cmd, client, base_url, org):
-    return _delete(cmd, client, base_url, client.delete_organization, org)
 
+def org_delete(cmd, client, base_url, org, wait=False):
+    get_org_id_cache(cmd.cli_ctx).invalidate(base_url, name=org, org_id=org)
+    result = _delete(cmd, client, base_url, client.delete_organization, org)
+    return _wait_for_status(cmd, base_url, result, org=org) if wait else result
 
-def org_list(cmd, client, base_url):
+
+def org_list(cmd, client, base_url, raw_output=None, offline=False, max_staleness=None):
+    mirrored = _from_mirror(cmd, base_url, 'organization', offline, max_staleness, raw=raw_output)
+    if mirrored is not None:
+        return mirrored
+    client = _raw_client(cmd, client, raw_output)
     return _list(cmd, client, base_url, client.get_organizations)
 
 
-def org_get(cmd, client, base_url, org):
+def org_get(cmd, client, base_url, org, raw_output=None, offline=False, max_staleness=None):
+    mirrored = _from_mirror(cmd, base_url, 'organization', offline, max_staleness, item=org, raw=raw_output)
+    if mirrored is not None:
+        return mirrored
+    client = _raw_client(cmd, client, raw_output)
     return _get(cmd, client, base_url, client.get_organization, org)
 
 
+def org_export(cmd, client, base_url, org, file, max_concurrency=None):
+    from ._async_utils import run_async
+    from ._client_factory import teamcloud_async_client_factory
+    from ._export_utils import NdjsonWriter, export_org
+
+    async def _export(writer):
+        async with teamcloud_async_client_factory(cmd.cli_ctx, base_url) as async_client:
+            await export_org(async_client, org, writer, max_concurrency=max_concurrency)
+
+    with open(file, 'w', encoding='utf-8') as f:
+        writer = NdjsonWriter(f)
+        run_async(_export(writer))
+
+    return {'file': file, 'counts': dict(writer.counts)}
+
+
+def org_apply(cmd, client, base_url, org, file, what_if=False, prune=False, max_concurrency=None):
+    from ._async_utils import run_async
+    from ._client_factory import teamcloud_async_client_factory
+    from ._apply_utils import load_manifest, plan_apply, execute_plan
+
+    manifest = load_manifest(file)
+
+    async def _apply():
+        async with teamcloud_async_client_factory(cmd.cli_ctx, base_url) as async_client:
+            plan = await plan_apply(async_client, org, manifest, prune=prune)
+
+            logger.warning('Plan: %d to create, %d to update, %d to delete',
+                           *(sum(1 for a in plan if a.action == x) for x in ['create', 'update', 'delete']))
+            for action in plan:
+                logger.warning('  %s', action)
+
+            if not what_if and plan:
+                await execute_plan(async_client, org, plan, max_concurrency=max_concurrency)
+            return plan
+
+    return [a.to_dict() for a in run_async(_apply())]
+
+
+# Audit
+
+def audit_export(cmd, client, base_url, org, file, output_format='ndjson', time_range=None, commands=None,
+                 max_concurrency=None):
+    import os
+    from ._async_utils import run_async
+    from ._client_factory import teamcloud_async_client_factory
+    from ._audit_utils import AuditExportState, AuditRowWriter, export_audit
+
+    state = AuditExportState(file, time_range, commands, output_format)
+    resume = state.load() and os.path.exists(file)
+
+    async def _export(writer):
+        async with teamcloud_async_client_factory(cmd.cli_ctx, base_url) as async_client:
+            await export_audit(async_client, org, writer, state, commands=commands, max_concurrency=max_concurrency)
+
+    with open(file, 'r+' if resume else 'w', encoding='utf-8', newline='') as f:
+        if resume:
+            # drop rows of a shard that was written but not recorded as complete
+            f.truncate(state.size)
+            f.seek(0, os.SEEK_END)
+        writer = AuditRowWriter(f, output_format, write_header=not resume)
+        run_async(_export(writer))
+
+    state.remove()
+    return {'file': file, 'count': writer.count, 'resumed': resume}
+
+
+def audit_stats(cmd, client, base_url, org, time_range=None, commands=None, max_concurrency=None):
+    from ._async_utils import run_async
+    from ._client_factory import teamcloud_async_client_factory
+    from ._audit_utils import AuditTable, load_audit_table
+
+    async def _load():
+        async with teamcloud_async_client_factory(cmd.cli_ctx, base_url) as async_client:
+            return await load_audit_table(async_client, org, AuditTable(), time_range=time_range,
+                                          commands=commands, max_concurrency=max_concurrency)
+
+    table = run_async(_load())
+    logger.info('Computed audit stats over %d entries', len(table))
+    return table.stats()
+
+
+# Component Tasks
+
+def task_wait(cmd, client, base_url, org, project, component, task, timeout=None, interval=None):
+    return _watch_task(cmd, base_url, org, project, component, task, timeout=timeout, interval=interval)
+
+
+def task_watch(cmd, client, base_url, org, project, component, task, timeout=None, interval=None):
+    import sys
+
+    state = {'state': None, 'output': ''}
+
+    def _on_update(current):
+        if current.task_state != state['state']:
+            logger.warning('Task %s: %s', current.id, current.task_state)
+            state['state'] = current.task_state
+        output = current.output or ''
+        # output is the full log so far, only write what is new
+        sys.stdout.write(output[len(state['output']):] if output.startswith(state['output']) else output)
+        sys.stdout.flush()
+        state['output'] = output
+
+    _watch_task(cmd, base_url, org, project, component, task, timeout=timeout, interval=interval,
+                on_update=_on_update)
+
+
+def task_run(cmd, client, base_url, org, task, project=None, component=None, all_components=False,
+             component_type=None, template=None, input_json=None, max_concurrency=None, rate_limit=None,
+             wait=False, timeout=None):
+    from collections import Counter
+    from ._async_utils import run_async
+    from ._client_factory import teamcloud_async_client_factory
+    from ._model_utils import result_data
+    from ._task_utils import find_components, run_tasks, is_terminal, TaskPoller
+
+    if all_components == bool(component):
+        raise CLIError('usage error: specify either --component or --all')
+    if component and not project:
+        raise CLIError('usage error: --project is required with --component')
+
+    def _on_result(run):
+        logger.warning('%s/%s: %s%s', run.component.project_name or run.component.project_id,
+                       run.component.display_name, run.state, f' ({run.error})' if run.error else '')
+
+    async def _run():
+        async with teamcloud_async_client_factory(cmd.cli_ctx, base_url) as async_client:
+            if component:
+                components = [result_data(await async_client.get_component(component, org, project), 'component')]
+            else:
+                components = await find_components(async_client, org, project=project, component_type=component_type,
+                                                   template=template, max_concurrency=max_concurrency)
+            if not components:
+                logger.warning('No matching components found')
+            return await run_tasks(async_client, components, task, input_json=input_json,
+                                   max_concurrency=max_concurrency, rate_limit=rate_limit, on_result=_on_result)
+
+    runs = run_async(_run())
+
+    if wait:
+        from .vendored_sdks.teamcloud.models import ComponentTask
+
+        accepted = [r for r in runs if r.status is not None and r.task is None]
+        if accepted:
+            results = _wait_for_status(cmd, base_url, [r.status for r in accepted], org=org,
+                                       max_concurrency=max_concurrency)
+            for run, result in zip(accepted, results):
+                data = (getattr(result, 'additional_properties', None) or {}).get('data')
+                if data:
+                    run.task = ComponentTask.from_dict(data)
+                    run.state = run.task.task_state
+
+        targets = {r.target: r for r in runs if r.task and not is_terminal(r.task)}
+        results = _poll_status(cmd, base_url, list(targets), timeout=timeout, max_concurrency=max_concurrency,
+                               poller_type=TaskPoller)
+        for target, result in results.items():
+            targets[target].update(result)
+
+    summary = Counter(r.state for r in runs)
+    logger.warning('%d tasks: %s', len(runs), ', '.join(f'{count} {state}' for state, count in summary.items()))
+    if wait and any((r.state or '').lower() != 'succeeded' for r in runs):
+        logger.error('%d of %d tasks did not succeed', sum(1 for r in runs if (r.state or '').lower() != 'succeeded'),
+                     len(runs))
+
+    return [r.to_dict() for r in runs]
+
+
+def _watch_task(cmd, base_url, org, project, component, task, timeout=None, interval=None, on_update=None):
+    from ._async_utils import run_async
+    from ._client_factory import teamcloud_async_client_factory
+    from ._task_utils import watch_task, DEFAULT_POLL_INTERVAL
+
+    async def _watch():
+        async with teamcloud_async_client_factory(cmd.cli_ctx, base_url) as async_client:
+            return await watch_task(async_client, org, project, component, task, timeout=timeout,
+                                    interval=interval or DEFAULT_POLL_INTERVAL, on_update=on_update)
+
+    result = run_async(_watch())
+    if (result.task_state or '').lower() != 'succeeded':
+        raise CLIError(f"Task '{result.id}' finished with state {result.task_state} (exit code {result.exit_code})")
+    return result
+
+
+# Projects
+
+def project_bulk_create(cmd, client, base_url, org, file, max_concurrency=None, rate_limit=None, wait=False):
+    from ._async_utils import run_async
+    from ._client_factory import teamcloud_async_client_factory
+    from ._bulk_utils import load_project_rows, prepare_projects, create_projects
+    from ._status_utils import is_failed
+
+    rows = load_project_rows(file)
+
+    def _on_result(project):
+        logger.warning('[%d/%d] %s: %s%s', project.index, len(rows), project.name, project.state,
+                       f" ({'; '.join(project.errors)})" if project.errors else '')
+
+    async def _create():
+        async with teamcloud_async_client_factory(cmd.cli_ctx, base_url) as async_client:
+            templates = await async_client.get_project_templates(org)
+            if getattr(templates, 'data', None) is None:
+                raise CLIError(f"Failed to get project templates: {getattr(templates, 'status', templates)}")
+
+            projects = prepare_projects(rows, templates.data)
+            for project in projects:
+                if project.state == 'invalid':
+                    _on_result(project)
+
+            return await create_projects(async_client, org, projects, max_concurrency=max_concurrency,
+                                         rate_limit=rate_limit, on_result=_on_result)
+
+    projects = run_async(_create())
+
+    accepted = [p for p in projects if p.state == 'accepted']
+    if wait and accepted:
+        for project, result in zip(accepted, _wait_for_status(cmd, base_url, [p.result for p in accepted], org=org,
+                                                              max_concurrency=max_concurrency)):
+            project.state = 'failed' if is_failed(result) else 'created'
+            project.errors.extend(e.message for e in getattr(result, 'errors', None) or [])
+            project.id = ((getattr(result, 'additional_properties', None) or {}).get('data') or {}).get('id')
+
+    failed = sum(1 for p in projects if p.state in ['invalid', 'failed'])
+    if failed:
+        logger.error('%d of %d projects failed', failed, len(projects))
+
+    return [p.to_dict() for p in projects]
+
+
+# Status
+
+def status_wait(cmd, client, base_url, org, tracking_ids, project=None, timeout=None, max_concurrency=None):
+    from ._status_utils import StatusTarget
+    targets = [StatusTarget(t, org, project) for t in tracking_ids]
+    results = _poll_status(cmd, base_url, targets, timeout=timeout, max_concurrency=max_concurrency)
+    return [results[t] for t in targets]
+
+
 # Deployment Scopes
 
-def deployment_scope_create(cmd, client, base_url, org, scope, scope_type='AzureResourceManager', parameters=None):
+def deployment_scope_create(cmd, client, base_url, org, scope, scope_type='AzureResourceManager', parameters=None,
+                            wait=False):
     _ensure_base_url(client, base_url)
 
     import json
@@ -202,39 +583,84 @@ def deployment_scope_create(cmd, client, base_url, org, scope, scope_type='Azure
 
     payload = DeploymentScopeDefinition(display_name=scope, type=scope_type, input_data=parameters)
 
-    return _create(cmd, client, base_url, client.create_deployment_scope, payload, org=org)
-
-
-def deployment_scope_delete(cmd, client, base_url, org, scope):
-    return _delete(cmd, client, base_url, client.delete_deployment_scope, scope, org=org)
+    result = _create(cmd, client, base_url, client.create_deployment_scope, payload, org=org)
+    return _wait_for_status(cmd, base_url, result, org=org) if wait else result
 
 
-def deployment_scope_list(cmd, client, base_url, org):
+def deployment_scope_delete(cmd, client, base_url, org, scope, max_concurrency=None, wait=False):
+    if len(scope) > 1:
+        result = _delete_many(cmd, base_url, 'delete_deployment_scope', scope, org=org,
+                              max_concurrency=max_concurrency)
+    else:
+        result = _delete(cmd, client, base_url, client.delete_deployment_scope, scope[0], org=org)
+    return _wait_for_status(cmd, base_url, result, org=org, max_concurrency=max_concurrency) if wait else result
+
+
+def deployment_scope_list(cmd, client, base_url, org=None, all_orgs=False, max_concurrency=None,
+                          raw_output=None, offline=False, max_staleness=None):
+    if not org and not all_orgs:
+        raise CLIError('usage error: --org is required unless --all-orgs is specified')
+    mirrored = _from_mirror(cmd, base_url, 'deploymentScope', offline, max_staleness,
+                            org=None if all_orgs else org, raw=raw_output)
+    if mirrored is not None:
+        return mirrored
+    if all_orgs:
+        return _list_all_orgs(cmd, base_url, 'get_deployment_scopes', max_concurrency=max_concurrency,
+                              raw=raw_output)
+    client = _raw_client(cmd, client, raw_output)
     return _list(cmd, client, base_url, client.get_deployment_scopes, org=org)
 
 
-def deployment_scope_get(cmd, client, base_url, org, scope):
+def deployment_scope_get(cmd, client, base_url, org, scope, raw_output=None, offline=False, max_staleness=None):
+    mirrored = _from_mirror(cmd, base_url, 'deploymentScope', offline, max_staleness, org=org, item=scope,
+                            raw=raw_output)
+    if mirrored is not None:
+        return mirrored
+    client = _raw_client(cmd, client, raw_output)
     return _get(cmd, client, base_url, client.get_deployment_scope, scope, org=org)
 
 
 # Project Templates
 
-def project_template_create(cmd, client, base_url, org, template, repo_url, repo_version=None, repo_token=None):
+def project_template_create(cmd, client, base_url, org, template, repo_url, repo_version=None, repo_token=None,
+                            wait=False):
     from .vendored_sdks.teamcloud.models import ProjectTemplateDefinition, RepositoryDefinition
     repository = RepositoryDefinition(url=repo_url, version=repo_version, token=repo_token)
     payload = ProjectTemplateDefinition(display_name=template, repository=repository)
-    return _create(cmd, client, base_url, client.create_project_template, payload, org=org)
-
-
-def project_template_delete(cmd, client, base_url, org, template):
-    return _delete(cmd, client, base_url, client.delete_project_template, template, org=org)
+    result = _create(cmd, client, base_url, client.create_project_template, payload, org=org)
+    return _wait_for_status(cmd, base_url, result, org=org) if wait else result
 
 
-def project_template_list(cmd, client, base_url, org):
+def project_template_delete(cmd, client, base_url, org, template, max_concurrency=None, wait=False):
+    if len(template) > 1:
+        result = _delete_many(cmd, base_url, 'delete_project_template', template, org=org,
+                              max_concurrency=max_concurrency)
+    else:
+        result = _delete(cmd, client, base_url, client.delete_project_template, template[0], org=org)
+    return _wait_for_status(cmd, base_url, result, org=org, max_concurrency=max_concurrency) if wait else result
+
+
+def project_template_list(cmd, client, base_url, org=None, all_orgs=False, max_concurrency=None,
+                          raw_output=None, offline=False, max_staleness=None):
+    if not org and not all_orgs:
+        raise CLIError('usage error: --org is required unless --all-orgs is specified')
+    mirrored = _from_mirror(cmd, base_url, 'projectTemplate', offline, max_staleness,
+                            org=None if all_orgs else org, raw=raw_output)
+    if mirrored is not None:
+        return mirrored
+    if all_orgs:
+        return _list_all_orgs(cmd, base_url, 'get_project_templates', max_concurrency=max_concurrency,
+                              raw=raw_output)
+    client = _raw_client(cmd, client, raw_output)
     return _list(cmd, client, base_url, client.get_project_templates, org=org)
 
 
-def project_template_get(cmd, client, base_url, org, template):
+def project_template_get(cmd, client, base_url, org, template, raw_output=None, offline=False, max_staleness=None):
+    mirrored = _from_mirror(cmd, base_url, 'projectTemplate', offline, max_staleness, org=org, item=template,
+                            raw=raw_output)
+    if mirrored is not None:
+        return mirrored
+    client = _raw_client(cmd, client, raw_output)
     return _get(cmd, client, base_url, client.get_project_template, template, org=org)
 
 
@@ -266,3 +692,138 @@ def _get(cmd, client, base_url, func, item, org=None, project=None, component=No
     return func(item, org, project, component) if org and project and component \
         else func(item, org, project) if org and project \
         else func(item, org) if org else func(item)
+
+
+def _use_raw(cmd, raw=None):
+    # --raw (or `az config set tc.raw_output=true`) returns the api's json without building models
+    if raw is None:
+        raw = cmd.cli_ctx.config.getboolean('tc', 'raw_output', fallback=False)
+    return raw
+
+
+def _raw_client(cmd, client, raw=None):
+    if not _use_raw(cmd, raw):
+        return client
+    from ._deserializer import raw_client
+    return raw_client(client)
+
+
+def _from_mirror(cmd, base_url, kind, offline=False, max_staleness=None, org=None, item=None, raw=None):
+    """Returns the list (or item) from the local mirror with --offline, or when it was synced within
+    --max-staleness seconds. Returns None to call the api instead."""
+    if not offline and not max_staleness:
+        return None
+    from time import time
+    from ._mirror import get_mirror, MIRROR_MODELS
+
+    mirror = get_mirror(cmd.cli_ctx)
+    # org lists and items are as fresh as the list of orgs, an org's scopes and templates as the org
+    synced = mirror.synced(base_url, org='' if kind == 'organization' else org)
+    if synced is None or (not offline and time() - synced > max_staleness):
+        if offline:
+            synced_what = f'Org {org}' if org and kind != 'organization' else base_url
+            raise CLIError(f"{synced_what} hasn't been synced to the local mirror, run `az tc sync` first")
+        return None
+    logger.info('Reading %ss from the local mirror synced %.0fs ago', kind, time() - synced)
+
+    if item is None:
+        body, result_type = mirror.list(base_url, kind, org=org), f'{MIRROR_MODELS[kind]}ListDataResult'
+    else:
+        body, result_type = mirror.get(base_url, kind, item, org=org), f'{MIRROR_MODELS[kind]}DataResult'
+        if body is None:
+            if not offline:
+                # created since the last sync
+                return None
+            raise CLIError(f'No {kind} matching {item} in the local mirror')
+
+    body = {'code': 200, 'status': 'Ok', 'data': body}
+    if _use_raw(cmd, raw):
+        return body
+    from ._client_factory import _compact_models
+    from ._deserializer import get_deserializer
+    return get_deserializer(compact=_compact_models(cmd.cli_ctx))(result_type, body)
+
+
+# Common (async)
+
+async def _list_async(func, org=None, project=None, component=None):
+    return await (func(org, project, component) if org and project and component
+                  else func(org, project) if org and project
+                  else func(org) if org else func())
+
+
+async def _delete_async(func, item, org=None, project=None, component=None):
+    return await (func(item, org, project, component) if org and project and component
+                  else func(item, org, project) if org and project
+                  else func(item, org) if org else func(item))
+
+
+def _list_all_orgs(cmd, base_url, operation, max_concurrency=None, raw=None):
+    from ._async_utils import run_async, fan_out
+
+    async def _lists(client):
+        orgs = await client.get_organizations()
+        lister = _raw_client(cmd, client, raw)
+        return [_list_async(getattr(lister, operation), org=o.id) for o in getattr(orgs, 'data', None) or []]
+
+    results = run_async(fan_out(cmd.cli_ctx, base_url, _lists, max_concurrency=max_concurrency))
+
+    items = []
+    for result in results:
+        status, data = (result.get('status'), result.get('data')) if isinstance(result, dict) \
+            else (getattr(result, 'status', result), getattr(result, 'data', None))
+        if data is None:
+            logger.warning('Error: %s', status)
+            continue
+        items.extend(data)
+    return items
+
+
+def _delete_many(cmd, base_url, operation, items, org=None, project=None, max_concurrency=None):
+    from ._async_utils import run_async, fan_out
+
+    async def _deletes(client):
+        return [_delete_async(getattr(client, operation), item, org=org, project=project) for item in items]
+
+    return run_async(fan_out(cmd.cli_ctx, base_url, _deletes, max_concurrency=max_concurrency))
+
+
+def _wait_for_status(cmd, base_url, result, org=None, project=None, max_concurrency=None):
+    """Waits for pending StatusResults in result (a single result or a list)
+    and replaces them with their final status"""
+    from ._status_utils import get_status_target
+
+    results = result if isinstance(result, list) else [result]
+    targets = [get_status_target(r, org=org, project=project) for r in results]
+
+    final = _poll_status(cmd, base_url, [t for t in targets if t], max_concurrency=max_concurrency)
+    results = [final[t] if t else r for r, t in zip(results, targets)]
+
+    return results if isinstance(result, list) else results[0]
+
+
+def _poll_status(cmd, base_url, targets, timeout=None, max_concurrency=None, poller_type=None):
+    from ._async_utils import run_async
+    from ._client_factory import teamcloud_async_client_factory
+    from ._status_utils import StatusPoller
+
+    if not targets:
+        return {}
+
+    hook = cmd.cli_ctx.get_progress_controller(det=True)
+    hook.begin()
+
+    def _on_progress(done, failed, total):
+        hook.add(message=f'{done}/{total} operations complete' + (f', {failed} failed' if failed else ''),
+                 value=done, total_val=total)
+
+    async def _poll():
+        async with teamcloud_async_client_factory(cmd.cli_ctx, base_url) as async_client:
+            poller = (poller_type or StatusPoller)(async_client, max_concurrency=max_concurrency,
+                                                   on_progress=_on_progress)
+            return await poller.wait(targets, timeout=timeout)
+
+    try:
+        return run_async(_poll())
+    finally:
+        hook.end()
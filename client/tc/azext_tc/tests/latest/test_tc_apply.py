@@ -0,0 +1,168 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+from types import SimpleNamespace as Item
+
+from knack.util import CLIError
+
+from azext_tc._apply_utils import (STAGE_PREREQUISITES as PRE, STAGE_PROJECTS as PROJ, load_manifest, plan_apply,
+                                   execute_plan)
+
+SCHEMA = json.dumps({'type': 'object', 'required': ['subscriptionIds'], 'properties': {
+    'subscriptionIds': {'type': 'array', 'items': {'type': 'string'}}}})
+
+TEMPLATE = {'name': 'Web', 'repoUrl': 'https://github.com/contoso/web', 'repoVersion': 'main'}
+SCOPE = {'name': 'Sandbox', 'parameters': ['subscriptionIds=["a"]'], 'isDefault': True}
+USER = {'identifier': 'admin@contoso.com', 'role': 'Admin'}
+PROJECT = {'name': 'Alpha', 'template': 'Web', 'users': [{'identifier': 'dev@contoso.com', 'role': 'Member'}]}
+
+MANIFEST = {'templates': [TEMPLATE], 'scopes': [SCOPE], 'users': [USER], 'projects': [PROJECT]}
+
+
+def _live():
+    return {
+        'get_project_templates': [Item(id='t1', display_name='Web', slug='web', repository=Item(
+            url='https://github.com/contoso/web', version='main', token='****'))],
+        'get_deployment_scopes': [Item(id='s1', display_name='Sandbox', slug='sandbox', type='AzureResourceManager',
+                                       input_data='{"subscriptionIds": ["a"]}', is_default=True)],
+        'get_organization_users': [Item(id='u1', login_name='admin@contoso.com', mail_address=None,
+                                        display_name='Admin', role='Admin')],
+        'get_projects': [Item(id='p1', display_name='Alpha', slug='alpha')],
+        'get_adapters': [Item(type='AzureResourceManager', input_data_schema=SCHEMA)],
+        'get_project_users': [Item(id='u2', login_name='dev@contoso.com', mail_address=None, display_name='Dev',
+                                   project_memberships=[Item(project_id='p1', role='Member')])],
+    }
+
+
+class FakeClient:
+    """Async client returning the given lists for get_* operations and results for
+    the others, recording the operations called in order"""
+
+    def __init__(self, live, results=None):
+        self.live = live
+        self.results = results or {}
+        self.calls = []
+
+    def __getattr__(self, operation):
+        async def _call(*args, **kwargs):
+            self.calls.append(operation)
+            if operation in self.live:
+                return Item(data=self.live[operation])
+            result = self.results.get(operation)
+            return result.pop(0) if isinstance(result, list) else result or Item(data=None)
+        return _call
+
+
+def _plan(manifest, live=None, prune=False):
+    plan = asyncio.run(plan_apply(FakeClient(live or _live()), 'org', manifest, prune=prune))
+    return [(a.stage, a.action, a.kind, a.name) for a in plan], plan
+
+
+def _with(item, **changes):
+    return dict(item, **changes)
+
+
+class TeamCloudApplyPlanTest(unittest.TestCase):
+
+    def test_plan(self):
+        cases = [
+            ('unchanged', MANIFEST, False, []),
+            ('unchanged pruned', MANIFEST, True, []),
+            ('template repo version', {'templates': [_with(TEMPLATE, repoVersion='dev')]}, False,
+             [(PRE, 'update', 'projectTemplate', 'Web')]),
+            ('template repo version omitted', {'templates': [{'name': 'web', 'repoUrl': TEMPLATE['repoUrl']}]},
+             False, []),
+            ('template repo url', {'templates': [_with(TEMPLATE, repoUrl='https://github.com/contoso/api')]}, False,
+             [(PRE, 'update', 'projectTemplate', 'Web')]),
+            ('scope default', {'scopes': [_with(SCOPE, isDefault=False)]}, False,
+             [(PRE, 'update', 'deploymentScope', 'Sandbox')]),
+            ('scope parameters', {'scopes': [_with(SCOPE, parameters=['subscriptionIds=["b"]'])]}, False,
+             [(PRE, 'update', 'deploymentScope', 'Sandbox')]),
+            ('user role', {'users': [_with(USER, role='Member')]}, False,
+             [(PRE, 'update', 'user', 'admin@contoso.com')]),
+            ('new user', {'users': [{'identifier': 'new@contoso.com'}]}, False,
+             [(PRE, 'create', 'user', 'new@contoso.com')]),
+            ('project user role', {'projects': [_with(PROJECT, users=[_with(PROJECT['users'][0], role='Owner')])]},
+             False,
+             [(PROJ, 'update', 'projectUser', 'Alpha/dev@contoso.com')]),
+            ('new project user', {'projects': [_with(PROJECT, users=[{'identifier': 'ops@contoso.com'}])]}, False,
+             [(PROJ, 'create', 'projectUser', 'Alpha/ops@contoso.com')]),
+            ('new template and project', {'templates': [_with(TEMPLATE, name='Api')],
+                                          'projects': [_with(PROJECT, name='Beta', template='Api')]}, False,
+             [(PRE, 'create', 'projectTemplate', 'Api'), (PROJ, 'create', 'project', 'Beta')]),
+            ('undeclared kinds are not pruned', {'projects': [PROJECT]}, True, []),
+            ('prune', {'templates': [], 'scopes': [], 'users': [], 'projects': []}, True,
+             [(PRE, 'delete', 'project', 'Alpha'), (PROJ, 'delete', 'projectTemplate', 'Web'),
+              (PROJ, 'delete', 'deploymentScope', 'Sandbox'), (PROJ, 'delete', 'user', 'admin@contoso.com')]),
+        ]
+        for name, manifest, prune, expected in cases:
+            with self.subTest(name):
+                actions, _ = _plan(manifest, prune=prune)
+                self.assertEqual(actions, expected)
+
+    def test_project_depends_on_created_template(self):
+        _, plan = _plan({'templates': [_with(TEMPLATE, name='Api')],
+                         'projects': [_with(PROJECT, name='Beta', template='api')]})
+        self.assertIs(plan[1].depends_on, plan[0])
+        self.assertIsNone(plan[1].kwargs['body'].template)
+
+    def test_project_with_unknown_template(self):
+        with self.assertRaisesRegex(CLIError, "Project template 'Api'"):
+            _plan({'projects': [_with(PROJECT, name='Beta', template='Api')]})
+
+    def test_template_update_keeps_stored_token(self):
+        _, plan = _plan({'templates': [_with(TEMPLATE, repoUrl='https://github.com/contoso/api')]})
+        repository = plan[0].kwargs['body'].repository
+        self.assertEqual(repository.url, 'https://github.com/contoso/api')
+        self.assertIsNone(repository.token)
+
+        _, plan = _plan({'templates': [_with(TEMPLATE, repoUrl='https://github.com/contoso/api', repoToken='new')]})
+        self.assertEqual(plan[0].kwargs['body'].repository.token, 'new')
+
+    def test_manifest_requires_repo_url(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump({'templates': [{'name': 'Web'}]}, f)
+        self.addCleanup(os.remove, f.name)
+        with self.assertRaisesRegex(CLIError, "'Web' requires a repoUrl"):
+            load_manifest(f.name)
+
+
+class TeamCloudApplyExecuteTest(unittest.TestCase):
+
+    @staticmethod
+    def _accepted(tracking_id):
+        return Item(code=202, status='Accepted', tracking_id=tracking_id, errors=None, state='Pending',
+                    location=f'https://teamcloud.example.com/orgs/org/status/{tracking_id}')
+
+    def _execute(self, status):
+        _, plan = _plan({'templates': [], 'projects': []}, prune=True)
+        client = FakeClient({}, {
+            'delete_project': [self._accepted('delete-alpha')],
+            'get_status': status,
+            'delete_project_template': [Item(code=204, status='NoContent', data=None)]
+        })
+        asyncio.run(execute_plan(client, 'org', plan, status_interval=0.01))
+        return client.calls, plan
+
+    def test_stage_waits_for_accepted_deletes(self):
+        calls, plan = self._execute([self._accepted('delete-alpha'),
+                                     Item(code=200, status='Ok', state='Completed', errors=None)])
+        self.assertEqual(calls, ['delete_project', 'get_status', 'get_status', 'delete_project_template'])
+        self.assertEqual([a.state for a in plan], ['succeeded', 'succeeded'])
+
+    def test_failed_operation_fails_action(self):
+        calls, plan = self._execute([Item(code=200, status='Ok', state='Failed', state_message='in use',
+                                          errors=None)])
+        self.assertEqual(calls, ['delete_project', 'get_status', 'delete_project_template'])
+        self.assertEqual((plan[0].state, plan[0].error), ('failed', 'in use'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import io
+import os
+import csv
+import json
+import shutil
+import tempfile
+import unittest
+
+from azext_tc._audit_utils import JsonRowStream, AuditExportState, AuditRowWriter, AuditTable
+
+ROWS = [{'commandId': 'a', 'command': 'ProjectCreateCommand', 'errors': [{'code': 'x', 'message': 'ä "quoted"'}]},
+        {'commandId': 'b', 'command': 'OrganizationDeployCommand', 'errors': [], 'customStatus': None, 'code': 7}]
+
+
+def _stream(body, size):
+    stream, rows = JsonRowStream(), []
+    data = body.encode('utf-8')
+    for i in range(0, len(data), size):
+        rows.extend(stream.feed(data[i:i + size]))
+    stream.close()
+    return rows
+
+
+class TeamCloudAuditStreamTest(unittest.TestCase):
+
+    def test_chunked(self):
+        body = json.dumps({'code': 200, 'status': 'Ok', 'data': ROWS, 'location': None}, indent=2)
+        for size in [1, 2, 3, 7, 64, len(body)]:
+            with self.subTest(size=size):
+                self.assertEqual(_stream(body, size), ROWS)
+
+    def test_data_position_and_empty(self):
+        cases = [('{"data": [], "code": 200}', []),
+                 ('{"data": null}', []),
+                 ('{"status": "Ok", "meta": {"data": [1]}, "data": [{"a": 1}, 2, "three"]}', [{'a': 1}, 2, 'three']),
+                 ('{}', [])]
+        for body, expected in cases:
+            with self.subTest(body):
+                self.assertEqual(_stream(body, 1), expected)
+
+    def test_invalid(self):
+        for body in ['{"data": [1, 2', '{"data": [1,]}', '[1, 2]', '{"data" [1]}']:
+            with self.subTest(body), self.assertRaises(ValueError):
+                _stream(body, 3)
+
+
+class TeamCloudAuditExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.file = os.path.join(self.path, 'audit.csv')
+
+    def test_csv_json_columns(self):
+        stream = io.StringIO(newline='')
+        writer = AuditRowWriter(stream, 'csv')
+        writer.write(ROWS)
+        rows = list(csv.DictReader(io.StringIO(stream.getvalue(), newline='')))
+        self.assertEqual([json.loads(r['errors']) for r in rows], [r['errors'] for r in ROWS])
+        self.assertEqual(rows[1]['customStatus'], '')
+
+    def test_state_keeps_window(self):
+        state = AuditExportState(self.file, '1.00:00:00', ['B', 'A'], 'csv')
+        self.assertAlmostEqual(state.end - state.start, 86400)
+        state.complete('A', 120)
+
+        resumed = AuditExportState(self.file, '1.00:00:00', ['A', 'B'], 'csv')
+        resumed.end += 3600
+        self.assertTrue(resumed.load())
+        self.assertEqual((resumed.start, resumed.end, resumed.completed, resumed.size),
+                         (state.start, state.end, ['A'], 120))
+        self.assertEqual(resumed.time_range(), '1.00:01:00')
+
+        self.assertFalse(AuditExportState(self.file, '2.00:00:00', ['A', 'B'], 'csv').load())
+        self.assertFalse(AuditExportState(self.file, '1.00:00:00', ['A', 'B'], 'ndjson').load())
+
+    def test_state_includes(self):
+        state = AuditExportState(self.file, '0.01:00', None, 'ndjson')
+        state.start, state.end = 1600000000, 1600003600
+        cases = [('2020-09-13T12:26:40Z', True), ('2020-09-13T13:26:40.0000000Z', True),
+                 ('2020-09-13T12:26:39.9Z', False), ('2020-09-13T13:26:40.1+00:00', False), (None, True)]
+        for created, expected in cases:
+            with self.subTest(created):
+                self.assertEqual(state.includes({'created': created}), expected)
+
+        state.start = None
+        self.assertTrue(state.includes({'created': '2000-01-01T00:00:00Z'}))
+
+
+class TeamCloudAuditStatsTest(unittest.TestCase):
+
+    def test_timestamps(self):
+        table = AuditTable()
+        table.append([{'command': 'A', 'runtimeStatus': 'Completed', 'created': created, 'updated': updated}
+                      for created, updated in [('2021-06-01T12:00:00Z', '2021-06-01T12:00:01.5Z'),
+                                               ('2021-06-01T12:00:00.1Z', '2021-06-01T12:00:02.1234567Z'),
+                                               ('2021-06-01T12:00:00.12+00:00', '2021-06-01T12:00:03.1234+00:00'),
+                                               ('2021-06-01T12:00:00Z', 'not a timestamp')]])
+        stats = table.stats()[0]
+        self.assertEqual((stats['count'], stats['p50'], stats['p99']), (4, 2.023, 2.984))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from azext_tc._bulk_utils import load_project_rows, prepare_projects
+
+TEMPLATES = [SimpleNamespace(id='t1', display_name='Web', slug='web', is_default=True, input_json_schema=(
+    '{"type": "object", "required": ["size"], "properties": {"size": {"type": "integer"}}}'))]
+
+CSV = '''name,template,input,input.size,users
+good,Web,{},2,dev@contoso.com:Owner
+invalid json,Web,"{size: 2}",,
+not an object,Web,"[2]",,
+wrong type,,,two,
+'''
+
+
+class TeamCloudBulkCreateTest(unittest.TestCase):
+
+    def test_invalid_rows(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='') as f:
+            f.write(CSV)
+        self.addCleanup(os.remove, f.name)
+
+        projects = prepare_projects(load_project_rows(f.name), TEMPLATES)
+
+        self.assertEqual([(p.name, p.state) for p in projects],
+                         [('good', 'planned'), ('invalid json', 'invalid'), ('not an object', 'invalid'),
+                          ('wrong type', 'invalid')])
+        self.assertEqual(projects[0].definition.template_input, '{"size": 2}')
+        self.assertEqual(projects[0].definition.users[0].role, 'Owner')
+        self.assertRegex(projects[1].errors[0], '^input is not valid json: ')
+        self.assertEqual(projects[2].errors, ['input must be an object'])
+        self.assertEqual(projects[3].errors, ["input 'size' must be of type integer", 'missing required input: size'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from azure.core.pipeline import PipelineContext, PipelineRequest, PipelineResponse
+from azure.core.pipeline.transport import HttpRequest, HttpResponse
+from azure.core.utils import case_insensitive_dict
+
+from azext_tc._cache import ResponseCache, ResponseCachePolicy
+
+ORGS_URL = 'https://teamcloud.example.com/orgs'
+
+
+class StubResponse(HttpResponse):
+
+    def __init__(self, request, status, body, headers):
+        super().__init__(request, None)
+        self.status_code = status
+        self.headers = case_insensitive_dict(headers)
+        self.content_type = 'application/json'
+        self._body = body.encode('utf-8')
+
+    def body(self):
+        return self._body
+
+
+class StubPolicy:  # pylint: disable=too-few-public-methods
+    """Next policy answering each request with the next of the given (status, etag, body)"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def send(self, request):
+        self.requests.append(dict(request.http_request.headers))
+        status, etag, body = self.responses.pop(0)
+        response = StubResponse(request.http_request, status, body, {'ETag': etag} if etag else {})
+        return PipelineResponse(request.http_request, response, request.context)
+
+
+def _get(policy, url=ORGS_URL, method='GET'):
+    request = HttpRequest(method, url, headers={'Authorization': 'Bearer token'})
+    return policy.send(PipelineRequest(request, PipelineContext(None))).http_response
+
+
+class TeamCloudResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.cache = ResponseCache(self.path)
+
+    def _policy(self, *responses):
+        policy = ResponseCachePolicy(self.cache)
+        policy.next = StubPolicy(*responses)
+        return policy
+
+    def test_etag_round_trip(self):
+        policy = self._policy((200, '"v1"', '{"data": [1]}'), (304, '"v1"', ''))
+
+        self.assertEqual(_get(policy).text(), '{"data": [1]}')
+        self.assertNotIn('If-None-Match', policy.next.requests[0])
+
+        cached = _get(policy)
+        self.assertEqual(policy.next.requests[1]['If-None-Match'], '"v1"')
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(cached.text(), '{"data": [1]}')
+
+    def test_changed_response_replaces_entry(self):
+        policy = self._policy((200, '"v1"', '{"data": [1]}'), (200, '"v2"', '{"data": [2]}'),
+                              (304, '"v2"', ''))
+        _get(policy)
+        self.assertEqual(_get(policy).text(), '{"data": [2]}')
+        self.assertEqual(_get(policy).text(), '{"data": [2]}')
+        self.assertEqual(policy.next.requests[2]['If-None-Match'], '"v2"')
+
+    def test_error_removes_entry(self):
+        policy = self._policy((200, '"v1"', '{"data": [1]}'), (404, None, '{"status": "NotFound"}'),
+                              (200, '"v2"', '{"data": [2]}'))
+        _get(policy)
+        self.assertEqual(_get(policy).status_code, 404)
+        self.assertEqual(os.listdir(self.path), [])
+
+        _get(policy)
+        self.assertNotIn('If-None-Match', policy.next.requests[2])
+
+    def test_uncacheable_requests(self):
+        policy = self._policy((200, '"v1"', '{}'), (200, '"v1"', '{}'))
+        _get(policy, url=ORGS_URL + '/org/projects')
+        _get(policy, method='POST')
+        self.assertEqual(os.listdir(self.path), [])
+
+    def test_lru_eviction(self):
+        entry = {'etag': '"v1"', 'body': 'x' * 100}
+        self.cache.set('a', entry)
+        self.cache.max_size = 3 * os.path.getsize(os.path.join(self.path, 'a.json'))
+        for i, key in enumerate(['a', 'b', 'c']):
+            self.cache.set(key, entry)
+            os.utime(os.path.join(self.path, key + '.json'), (1000 + i, 1000 + i))
+
+        # reading a refreshes its access time, so b is the least recently used
+        self.assertIsNotNone(self.cache.get('a'))
+        self.cache.set('d', entry)
+
+        self.assertEqual(sorted(os.listdir(self.path)), ['a.json', 'c.json', 'd.json'])
+        self.assertIsNone(self.cache.get('b'))
+
+
+if __name__ == '__main__':
+    unittest.main()
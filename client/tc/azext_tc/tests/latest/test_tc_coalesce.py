@@ -0,0 +1,109 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import time
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from azure.core.pipeline import PipelineContext, PipelineRequest, PipelineResponse
+from azure.core.pipeline.transport import HttpRequest, HttpResponse
+
+from azext_tc.vendored_sdks.teamcloud import models
+from azext_tc._coalesce import SHARED_RESULTS, SingleFlightPolicy
+from azext_tc._deserializer import FastDeserializer
+
+ORGS_URL = 'https://teamcloud.example.com/orgs'
+
+
+class StubPolicy:  # pylint: disable=too-few-public-methods
+    """Next policy answering every request with status, optionally waiting for release first"""
+
+    def __init__(self, status=200, release=None):
+        self.status = status
+        self.release = release
+        self.sent = []
+
+    def send(self, request):
+        self.sent.append(request.http_request.method)
+        if self.release:
+            self.release.wait(5)
+        response = HttpResponse(request.http_request, None)
+        response.status_code = self.status
+        return PipelineResponse(request.http_request, response, request.context)
+
+
+def _send(policy, method='GET', url=ORGS_URL, **options):
+    request = HttpRequest(method, url, headers={'Authorization': 'Bearer token'})
+    return policy.send(PipelineRequest(request, PipelineContext(None, **options)))
+
+
+class TeamCloudSingleFlightTest(unittest.TestCase):
+
+    def _policy(self, window=60, **kwargs):
+        policy = SingleFlightPolicy(window)
+        policy.next = StubPolicy(**kwargs)
+        return policy
+
+    def test_inside_window(self):
+        policy = self._policy()
+        first = _send(policy)
+        self.assertIs(_send(policy), first)
+        self.assertEqual((policy.next.sent, policy.shared), (['GET'], 1))
+        self.assertEqual(first.context[SHARED_RESULTS], {})
+
+    def test_outside_window(self):
+        policy = self._policy(window=0.05)
+        first = _send(policy)
+        time.sleep(0.1)
+        self.assertIsNot(_send(policy), first)
+        self.assertEqual((policy.next.sent, policy.shared), (['GET', 'GET'], 0))
+
+    def test_overlapping(self):
+        release = threading.Event()
+        policy = self._policy(window=0, release=release)
+        with ThreadPoolExecutor(4) as pool:
+            futures = [pool.submit(_send, policy) for _ in range(4)]
+            time.sleep(0.1)
+            release.set()
+            responses = [f.result() for f in futures]
+        self.assertTrue(all(r is responses[0] for r in responses))
+        self.assertEqual(policy.next.sent, ['GET'])
+
+    def test_not_shared(self):
+        cases = [('different url', {'url': ORGS_URL + '/a'}, ['GET', 'GET']),
+                 ('write', {'method': 'POST'}, ['GET', 'POST', 'GET']),
+                 ('stream', {'stream': True}, ['GET', 'GET'])]
+        for name, kwargs, sent in cases:
+            with self.subTest(name):
+                policy = self._policy()
+                _send(policy)
+                _send(policy, **kwargs)
+                _send(policy)
+                self.assertEqual(policy.next.sent, sent)
+
+    def test_error_not_shared(self):
+        policy = self._policy(status=500)
+        _send(policy)
+        _send(policy)
+        self.assertEqual(policy.next.sent, ['GET', 'GET'])
+
+
+class TeamCloudSharedResultsTest(unittest.TestCase):
+
+    def test_callers_get_own_models(self):
+        class _Response:  # pylint: disable=too-few-public-methods
+            context = {SHARED_RESULTS: {}, 'deserialized_data': {'data': [{'id': 'a', 'slug': 'a', 'tags': {}}]}}
+
+        deserializer = FastDeserializer({k: v for k, v in models.__dict__.items() if isinstance(v, type)})
+        first = deserializer('OrganizationListDataResult', _Response())
+        first.data[0].tags['changed'] = 'yes'
+        second = deserializer('OrganizationListDataResult', _Response())
+        self.assertIsNot(second.data[0], first.data[0])
+        self.assertEqual((second.data[0].id, second.data[0].tags), ('a', {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import unittest
+from timeit import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+from msrest import Deserializer, Serializer
+from msrest.serialization import Model
+from azure.cli.core.util import todict
+from azure.cli.core.commands import AzCliCommandInvoker
+
+from azext_tc.vendored_sdks.teamcloud import models
+from azext_tc._deserializer import FastDeserializer, _Compiler
+from azext_tc._compact_models import CompactRecord
+
+MODELS = {k: v for k, v in models.__dict__.items() if isinstance(v, type)}
+
+# timing comparisons are noisy on shared ci agents, they only run when asked for
+BENCHMARK = os.environ.get('TC_BENCHMARK', '').lower() in ['1', 'true']
+
+
+class _Leaf(Model):
+    _attribute_map = {'name': {'key': 'name', 'type': 'str'}, 'parent': {'key': 'parent', 'type': '_Leaf'}}
+
+
+class _Node(Model):
+    _attribute_map = {'leaves': {'key': 'leaves', 'type': '[_Leaf]'}, 'other': {'key': 'other', 'type': 'Missing'}}
+
+
+SAMPLES = {
+    'str': 'value',
+    'int': 42,
+    'bool': True,
+    'float': 1.5,
+    'object': {'nested': [1, 'two', {'three': 3.0}]},
+    'iso-8601': '2021-06-01T12:34:56.1234567Z'
+}
+
+
+def _sample(data_type, depth=0):
+    if data_type in SAMPLES:
+        return SAMPLES[data_type]
+    if data_type.startswith('['):
+        return [_sample(data_type[1:-1], depth), None]
+    if data_type.startswith('{'):
+        return {'a': _sample(data_type[1:-1], depth), 'b': None}
+    return _payload(MODELS[data_type], depth + 1) if depth < 3 else None
+
+
+def _payload(model, depth=0):
+    data = {d['key']: _sample(d['type'], depth) for d in model._attribute_map.values()}
+    data['unknownProperty'] = 'kept in additional_properties'
+    return data
+
+
+def _shape(value):
+    """Attribute names in order, recursively, so output built from __dict__ matches too"""
+    if isinstance(value, Model):
+        return [(k, _shape(v)) for k, v in value.__dict__.items()]
+    if isinstance(value, list):
+        return [_shape(v) for v in value]
+    return type(value).__name__
+
+
+def _tasks(count):
+    return {'code': 200, 'status': 'Ok', 'location': None, 'data': [{
+        'organization': '00000000-0000-0000-0000-000000000000', 'organizationName': 'org',
+        'componentId': f'component{i}', 'componentName': 'web', 'projectId': 'project', 'projectName': 'proj',
+        'requestedBy': 'user', 'scheduleId': None, 'type': 'Custom', 'typeName': 'Deploy',
+        'created': '2021-06-01T12:00:00.1234567Z', 'started': '2021-06-01T12:00:05Z',
+        'finished': '2021-06-01T12:03:00.5+00:00', 'inputJson': '{}', 'output': 'log ' * 20,
+        'resourceId': None, 'taskState': 'Succeeded', 'exitCode': 0, 'id': f'task{i}'
+    } for i in range(count)]}
+
+
+class TeamCloudDeserializerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.msrest = Deserializer(MODELS)
+        self.fast = FastDeserializer(MODELS)
+
+    def assertParity(self, target, data):
+        expected = self.msrest(target, data)
+        actual = self.fast(target, data)
+        self.assertIs(type(actual), type(expected))
+        self.assertEqual(actual, expected)
+        self.assertEqual(_shape(actual), _shape(expected))
+
+    def test_parity_all_models(self):
+        for name, model in MODELS.items():
+            if issubclass(model, Model):
+                with self.subTest(model=name):
+                    self.assertParity(name, _payload(model))
+                    self.assertParity(name, {})
+
+    def test_parity_fallback(self):
+        # values the generated functions don't handle go through msrest
+        data = _tasks(2)
+        data['code'] = '200'
+        data['data'][0]['exitCode'] = True
+        data['data'][1]['created'] = '2021-06-01t12:00:00z'
+        self.assertParity('ComponentTaskListDataResult', data)
+        self.assertParity('ComponentTaskListDataResult', None)
+
+    def test_compact_list_parity(self):
+        compact = FastDeserializer(MODELS, compact=True)
+        serializer = Serializer(MODELS)
+        for name, model in MODELS.items():
+            if name.endswith('ListDataResult'):
+                with self.subTest(model=name):
+                    data = _payload(model)
+                    expected = self.msrest(name, data)
+                    actual = compact(name, data)
+                    self.assertEqual(actual, expected)
+                    self.assertEqual(todict(actual, AzCliCommandInvoker.remove_additional_prop_layer),
+                                     todict(expected, AzCliCommandInvoker.remove_additional_prop_layer))
+                    item, expected_item = actual.data[0], expected.data[0]
+                    if isinstance(item, CompactRecord):
+                        self.assertIsInstance(item, type(expected_item))
+                        self.assertFalse(hasattr(item, '__dict__') and item.__dict__)
+                        self.assertEqual(serializer.body(item, name[:-len('ListDataResult')]),
+                                         serializer.body(expected_item, name[:-len('ListDataResult')]))
+
+    def test_compact_lazy_attributes(self):
+        task = FastDeserializer(MODELS, compact=True)('ComponentTaskListDataResult', _tasks(1)).data[0]
+        self.assertIsInstance(task, CompactRecord)
+        self.assertEqual(task._created_json, '2021-06-01T12:00:00.1234567Z')
+        self.assertEqual(task.created.microsecond, 123456)
+        self.assertIs(task.created, task.created)
+        task.finished = None
+        self.assertIsNone(task.finished)
+
+    def test_compile_unsupported_rolls_back(self):
+        compiler = _Compiler({'_Leaf': _Leaf, '_Node': _Node})
+        self.assertIsNone(compiler.compile(_Node))
+        self.assertEqual(compiler.names, {})
+
+        leaf = compiler.compile(_Leaf)({'name': 'a', 'parent': {'name': 'b'}})
+        self.assertEqual((leaf.name, leaf.parent.name, leaf.parent.parent), ('a', 'b', None))
+
+    def test_compile_concurrently(self):
+        compiler = _Compiler(MODELS)
+        with ThreadPoolExecutor(8) as pool:
+            compiled = list(pool.map(compiler.compile, [MODELS['ComponentTaskListDataResult']] * 16))
+        self.assertIsNotNone(compiled[0])
+        self.assertTrue(all(c is compiled[0] for c in compiled))
+
+    def test_parity_large_list(self):
+        self.assertParity('ComponentTaskListDataResult', _tasks(500))
+
+    @unittest.skipUnless(BENCHMARK, 'set TC_BENCHMARK=1 to compare with msrest')
+    def test_faster_than_msrest(self):
+        data = _tasks(500)
+        msrest = timeit(lambda: self.msrest('ComponentTaskListDataResult', data), number=5)
+        fast = timeit(lambda: self.fast('ComponentTaskListDataResult', data), number=5)
+        self.assertLess(fast, msrest, f'ComponentTaskListDataResult x500: msrest {msrest / 5 * 1000:.1f}ms, '
+                        f'generated {fast / 5 * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    unittest.main()
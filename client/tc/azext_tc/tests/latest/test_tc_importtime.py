@@ -0,0 +1,56 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import sys
+import subprocess
+import unittest
+
+# what az cli has already imported by the time it loads the extension for `az tc --help`
+CLI_MODULES = ['azure.cli.core', 'azure.cli.core.commands', 'azure.cli.core.commands.parameters',
+               'azure.cli.core.commands.validators', 'azure.cli.core.commands.client_factory',
+               'azure.cli.core.decorators', 'azure.cli.core.profiles', 'argcomplete.completers']
+
+# the loader, command table and arguments, everything `az tc --help` imports from the extension
+EXTENSION_MODULES = ['azext_tc', 'azext_tc.commands', 'azext_tc._params', 'azext_tc._help']
+
+# only imported when a command runs
+DEFERRED_MODULES = ['azext_tc.vendored_sdks', 'msrest', 'azure.core.pipeline', 'requests']
+
+# about 15ms on a dev box, the budget leaves room for slow ci agents
+IMPORT_BUDGET_MS = int(os.environ.get('TC_IMPORT_BUDGET_MS', '100'))
+
+TC_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+
+def _importtime(statement):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=TC_ROOT,
+                            capture_output=True, text=True, check=True)
+    # import time: self [us] | cumulative | imported package
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+class TeamCloudImportTimeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.times = _importtime(f"import {', '.join(CLI_MODULES)}; import {', '.join(EXTENSION_MODULES)}")
+
+    def test_deferred_imports(self):
+        imported = [m for m in self.times if any(m == d or m.startswith(d + '.') for d in DEFERRED_MODULES)]
+        self.assertEqual(imported, [], 'loading the command table should not import the sdk')
+
+    def test_import_budget(self):
+        total = self.times['azext_tc'] / 1000
+        self.assertLess(total, IMPORT_BUDGET_MS, f'azext_tc import time {total:.1f}ms')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import os
+import shutil
+import asyncio
+import tempfile
+import unittest
+from time import time
+from unittest import mock
+
+from azext_tc._audit_utils import timespan_seconds
+from azext_tc._mirror import Mirror, OrgChanges, _OrgFetcher, _changed, fetch_org_delta
+
+BASE_URL = 'https://teamcloud.example.com'
+EMPTY_ID = '00000000-0000-0000-0000-000000000000'
+
+
+def _entry(command, project=EMPTY_ID):
+    return {'command': command, 'projectId': project, 'organizationId': 'o1'}
+
+
+def _item(item_id, **data):
+    return dict(data, id=item_id, slug=item_id, displayName=item_id.upper())
+
+
+class FakeClient:
+    """Raw async client serving the projects and components given, 404 for anything else"""
+
+    def __init__(self, projects, components):
+        self.projects = projects
+        self.components = components
+        self.calls = []
+
+    async def get_project(self, project, org):
+        self.calls.append(('project', project))
+        return {'code': 200, 'data': self.projects[project]} if project in self.projects else {'code': 404}
+
+    async def get_components(self, org, project):
+        self.calls.append(('components', project))
+        return {'code': 200, 'data': self.components[project]} if project in self.components else {'code': 404}
+
+    async def get_project_templates(self, org):
+        self.calls.append(('templates', None))
+        return {'code': 200, 'data': [_item('t2')]}
+
+    async def get_deployment_scopes(self, org):
+        self.calls.append(('scopes', None))
+        return {'code': 200, 'data': []}
+
+
+class TeamCloudMirrorChangedTest(unittest.TestCase):
+
+    def test_changed(self):
+        cases = [
+            ('template before project', [_entry('ProjectTemplateUpdateCommand')], ({'projectTemplate'}, set(), set())),
+            ('scope', [_entry('DeploymentScopeCreateCommand')], ({'deploymentScope'}, set(), set())),
+            ('project', [_entry('ProjectUpdateCommand', 'p1'), _entry('ProjectUserCreateCommand', 'p1')],
+             (set(), {'p1'}, set())),
+            ('component', [_entry('ComponentCreateCommand', 'p1'), _entry('ComponentTaskRunCommand', 'p2')],
+             (set(), set(), {'p1', 'p2'})),
+            ('component of refetched project', [_entry('ComponentCreateCommand', 'p1'),
+                                                _entry('ProjectUpdateCommand', 'p1')], (set(), {'p1'}, set())),
+            ('broadcast skipped', [_entry('BroadcastProjectUpdateCommand'), _entry('BroadcastComponentCommand')],
+             (set(), set(), set())),
+            ('project without id', [_entry('ProjectTemplateCreateCommand'), _entry('ProjectCreateCommand')], None),
+            ('component without id', [_entry('ComponentDeleteCommand', None)], None),
+            ('none', [], (set(), set(), set())),
+        ]
+        for name, rows, expected in cases:
+            with self.subTest(name):
+                self.assertEqual(_changed(rows), expected)
+
+
+class TeamCloudMirrorDeltaTest(unittest.TestCase):
+
+    def _delta(self, rows, since, client):
+        async def _get_audit_rows(_, org, time_range=None):
+            self.time_range = time_range
+            return rows
+
+        with mock.patch('azext_tc._audit_utils.get_audit_rows', _get_audit_rows):
+            return asyncio.run(fetch_org_delta(_OrgFetcher(client, 'o1', asyncio.Semaphore(2)), since))
+
+    def test_watermark_overlap(self):
+        client = FakeClient({}, {})
+        # the entries since the last sync plus 300s, rounded up to whole minutes
+        for ago, minutes in [(10, 6), (590, 15), (3590, 65)]:
+            with self.subTest(ago=ago):
+                self._delta([], time() - ago, client)
+                self.assertEqual(timespan_seconds(self.time_range), minutes * 60)
+
+    def test_refetch(self):
+        client = FakeClient({'p1': _item('p1')}, {'p1': [_item('c1')], 'p3': [_item('c3')]})
+        rows = [_entry('ProjectUpdateCommand', 'p1'), _entry('ProjectDeleteCommand', 'p2'),
+                _entry('ComponentCreateCommand', 'p3'), _entry('ProjectTemplateCreateCommand')]
+        changes = self._delta(rows, time() - 60, client)
+
+        self.assertFalse(changes.full)
+        self.assertEqual(sorted(changes.scopes, key=str),
+                         sorted([('projectTemplate', None), ('component', 'p1'), ('component', 'p3')], key=str))
+        self.assertEqual(changes.deleted_projects, ['p2'])
+        self.assertEqual(sorted((k, p, d['id']) for k, p, d in changes.items),
+                         [('component', 'p1', 'c1'), ('component', 'p3', 'c3'), ('project', None, 'p1'),
+                          ('projectTemplate', None, 't2')])
+        self.assertNotIn(('scopes', None), client.calls)
+
+    def test_needs_full_sync(self):
+        self.assertIsNone(self._delta([_entry('ProjectCreateCommand')], time() - 60, FakeClient({}, {})))
+
+
+class TeamCloudMirrorApplyTest(unittest.TestCase):
+
+    def setUp(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        self.mirror = Mirror(os.path.join(path, 'mirror.db'))
+
+        full = OrgChanges(full=True)
+        full.items = [('project', None, _item('p1')), ('project', None, _item('p2')),
+                      ('component', 'p1', _item('c1')), ('component', 'p2', _item('c2')),
+                      ('projectTemplate', None, _item('t1')), ('deploymentScope', None, _item('s1'))]
+        other = OrgChanges(full=True)
+        other.items = [('project', None, _item('p9')), ('component', 'p9', _item('c9'))]
+        self.mirror.apply(BASE_URL, [_item('o1'), _item('o2')], {'o1': full, 'o2': other}, synced=100)
+
+    def _ids(self, kind, org='o1', project=None):
+        return [i['id'] for i in self.mirror.list(BASE_URL, kind, org=org, project=project)]
+
+    def test_scoped_delete_then_insert(self):
+        delta = OrgChanges()
+        delta.scopes = [('component', 'p1'), ('projectTemplate', None)]
+        delta.items = [('component', 'p1', _item('c1b')), ('projectTemplate', None, _item('t2'))]
+        self.mirror.apply(BASE_URL, [_item('o1'), _item('o2')], {'o1': delta}, synced=200)
+
+        self.assertEqual(self._ids('component', project='p1'), ['c1b'])
+        self.assertEqual(self._ids('component', project='p2'), ['c2'])
+        self.assertEqual(self._ids('projectTemplate'), ['t2'])
+        self.assertEqual(self._ids('project'), ['p1', 'p2'])
+        self.assertEqual(self._ids('deploymentScope'), ['s1'])
+        self.assertEqual(self._ids('component', org='o2'), ['c9'])
+        self.assertEqual((self.mirror.synced(BASE_URL, 'o1'), self.mirror.synced(BASE_URL, 'o2')), (200, 100))
+
+    def test_deleted_project(self):
+        delta = OrgChanges()
+        delta.deleted_projects = ['p2']
+        self.mirror.apply(BASE_URL, [_item('o1'), _item('o2')], {'o1': delta}, synced=200)
+
+        self.assertEqual(self._ids('project'), ['p1'])
+        self.assertEqual(self._ids('component'), ['c1'])
+
+    def test_org_removed(self):
+        self.mirror.apply(BASE_URL, [_item('o1')], {}, synced=200)
+
+        self.assertEqual(self._ids('organization', org=None), ['o1'])
+        self.assertEqual(self._ids('project', org='o2'), [])
+        self.assertIsNone(self.mirror.synced(BASE_URL, 'o2'))
+        self.assertEqual(self._ids('project'), ['p1', 'p2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import asyncio
+import unittest
+from unittest import mock
+
+from azext_tc._async_utils import gather_bounded
+from azext_tc._rate_limit import RequestLimiter, get_rate_limiter
+
+
+class _Config:  # pylint: disable=too-few-public-methods
+
+    def __init__(self, values):
+        self.values = values
+
+    def get(self, section, name, fallback=None):
+        return self.values.get(name, fallback) if section == 'defaults' else fallback
+
+
+class _Cli:
+
+    def __init__(self, **values):
+        self.config = _Config(values)
+
+    def register_event(self, *_):
+        pass
+
+    def unregister_event(self, *_):
+        pass
+
+
+class TeamCloudRateLimitTest(unittest.TestCase):
+
+    def test_interrupted_acquire_releases_slot(self):
+        limiter = RequestLimiter(rate=1, max_concurrency=2)
+        limiter.acquire()
+        with mock.patch('azext_tc._rate_limit.sleep', side_effect=KeyboardInterrupt), \
+                self.assertRaises(KeyboardInterrupt):
+            limiter.acquire()
+        self.assertEqual(limiter.in_flight, 1)
+
+    def test_cancelled_acquire_async_releases_slot(self):
+        limiter = RequestLimiter(rate=1, max_concurrency=2)
+
+        async def _cancel():
+            await limiter.acquire_async()
+            task = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(_cancel())
+        self.assertEqual(limiter.in_flight, 1)
+
+    def test_limiter_per_config(self):
+        self.assertIsNone(get_rate_limiter(_Cli()))
+        limiter = get_rate_limiter(_Cli(**{'tc-rate-limit': '5'}))
+        self.assertIs(get_rate_limiter(_Cli(**{'tc-rate-limit': '5.0'})), limiter)
+
+        other = get_rate_limiter(_Cli(**{'tc-rate-limit': '5', 'tc-rate-limit-concurrency': '2'}))
+        self.assertIsNot(other, limiter)
+        self.assertEqual((other.rate, other.max_concurrency), (5, 2))
+
+    def test_gather_bounded_rate_limit(self):
+        clock, delays = [1000.0], []
+
+        async def _sleep(delay):
+            delays.append(round(delay, 6))
+            clock[0] += delay
+
+        async def _value(i):
+            return i
+
+        with mock.patch('azext_tc._rate_limit.monotonic', lambda: clock[0]), \
+                mock.patch('azext_tc._rate_limit.asyncio.sleep', _sleep):
+            result = asyncio.run(gather_bounded([_value(i) for i in range(14)], max_concurrency=20, rate_limit=10))
+
+        # one second's worth start at once, the other four 100ms apart
+        self.assertEqual(result, list(range(14)))
+        self.assertEqual(delays, [0.1] * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import unittest
+
+from azext_tc._retry import CircuitBreaker, CircuitOpenError
+
+HOST = 'teamcloud.example'
+
+
+class TeamCloudCircuitBreakerTest(unittest.TestCase):
+
+    def _opened(self, reset_seconds=0):
+        breaker = CircuitBreaker(threshold=2, reset_seconds=reset_seconds)
+        for _ in range(2):
+            self.assertFalse(breaker.check(HOST))
+            breaker.record(HOST, False)
+        return breaker
+
+    def test_open(self):
+        breaker = self._opened(reset_seconds=60)
+        with self.assertRaises(CircuitOpenError):
+            breaker.check(HOST)
+
+    def test_single_probe(self):
+        breaker = self._opened()
+        self.assertTrue(breaker.check(HOST))
+        for _ in range(3):
+            with self.assertRaisesRegex(CircuitOpenError, 'waiting for a request'):
+                breaker.check(HOST)
+        # requests sent before the breaker opened don't end the probe
+        breaker.record(HOST, True)
+        with self.assertRaises(CircuitOpenError):
+            breaker.check(HOST)
+
+        breaker.record(HOST, True, probe=True)
+        self.assertFalse(breaker.check(HOST))
+        self.assertFalse(breaker.check(HOST))
+
+    def test_probe_fails(self):
+        breaker = self._opened(reset_seconds=60)
+        breaker.opened -= 60
+        self.assertTrue(breaker.check(HOST))
+        breaker.record(HOST, False, probe=True)
+        with self.assertRaisesRegex(CircuitOpenError, 'another'):
+            breaker.check(HOST)
+
+    def test_probe_released(self):
+        breaker = self._opened()
+        self.assertTrue(breaker.check(HOST))
+        breaker.release(True)
+        self.assertTrue(breaker.check(HOST))
+        breaker.release(False)
+        with self.assertRaises(CircuitOpenError):
+            breaker.check(HOST)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# --------------------------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for license information.
+# --------------------------------------------------------------------------------------------
+
+import json
+import asyncio
+import unittest
+
+from aiohttp import WSMessage, WSMsgType
+
+from azext_tc._task_utils import TaskHub
+
+SEPARATOR = '\x1e'
+
+
+def _invocation(*arguments):
+    return WSMessage(WSMsgType.TEXT, json.dumps({'type': 1, 'target': 'update', 'arguments': arguments}) + SEPARATOR,
+                     None)
+
+
+class FakeSocket:
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for message in self.messages:
+            yield message
+
+    def exception(self):  # pylint: disable=no-self-use
+        return None
+
+
+def _read(*messages):
+    async def read():
+        hub = TaskHub('https://signalr.example.com/client/?hub=project', 'token')
+        hub._socket = FakeSocket(messages)  # pylint: disable=protected-access
+        await hub._read()  # pylint: disable=protected-access
+        notifications = []
+        while not hub.notifications.empty():
+            notifications.append(hub.notifications.get_nowait())
+        return notifications
+    return asyncio.run(read())
+
+
+class TeamCloudTaskHubTest(unittest.TestCase):
+
+    def test_notifications(self):
+        self.assertEqual(_read(_invocation({'id': 'a'}), WSMessage(WSMsgType.TEXT, '{"type": 6}' + SEPARATOR, None),
+                               _invocation({'id': 'b'}, {'id': 'c'})),
+                         [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}, None])
+
+    def test_disconnects(self):
+        for message in [WSMessage(WSMsgType.ERROR, ConnectionResetError(), None),
+                        WSMessage(WSMsgType.CLOSE, 1006, 'abnormal closure'),
+                        WSMessage(WSMsgType.CLOSED, None, None),
+                        WSMessage(WSMsgType.TEXT, '{"type": 7, "error": "shutting down"}' + SEPARATOR, None),
+                        WSMessage(WSMsgType.TEXT, 'not json', None)]:
+            with self.subTest(message.type):
+                self.assertEqual(_read(_invocation({'id': 'a'}), message, _invocation({'id': 'b'})),
+                                 [{'id': 'a'}, None])
+
+    def test_binary_ignored(self):
+        self.assertEqual(_read(WSMessage(WSMsgType.BINARY, b'\x00', None), WSMessage(WSMsgType.PING, b'', None),
+                               _invocation({'id': 'a'})),
+                         [{'id': 'a'}, None])
+
+
+if __name__ == '__main__':
+    unittest.main()